@@ -1,20 +1,60 @@
 from sqlalchemy.ext.asyncio import create_async_engine
 import asyncio
 from alembic import context
+from app.core.config import settings
+from app.db.models import Base
 
 config = context.config
 
+# Метаданные моделей нужны для autogenerate
+target_metadata = Base.metadata
+
+# DATABASE_URL из окружения имеет приоритет над значением из alembic.ini
+database_url = settings.SQLALCHEMY_DATABASE_URL or config.get_main_option("sqlalchemy.url")
+
+
+def run_migrations_offline():
+    # Генерация SQL-скрипта без подключения к базе (alembic upgrade head --sql)
+    context.configure(
+        url=database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=database_url.startswith("sqlite"),
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
 
 def run_migrations_online():
 
     connectable = create_async_engine(
-        config.get_main_option("sqlalchemy.url"),
+        database_url,
         echo=True,
     )
 
     async def do_migrations():
         async with connectable.connect() as connection:
             # This is where Alembic actually runs the migrations
-            await connection.run_sync(context.run_migrations)
+            await connection.run_sync(do_run_migrations)
+        await connectable.dispose()
 
     asyncio.run(do_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
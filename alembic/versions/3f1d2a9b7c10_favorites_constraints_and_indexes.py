@@ -0,0 +1,37 @@
+"""Favorites constraints and indexes
+
+Revision ID: 3f1d2a9b7c10
+Revises: ceb4eae3c8c0
+Create Date: 2026-10-19 09:12:44.310582
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1d2a9b7c10'
+down_revision = 'ceb4eae3c8c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Удаляем дубликаты, накопившиеся до появления ограничения уникальности
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN "
+        "(SELECT MIN(id) FROM favorites GROUP BY user_id, kinopoisk_id)"
+    )
+
+    # Составной уникальный ключ покрывает оба запроса crud:
+    # выборку по user_id и поиск по паре (user_id, kinopoisk_id)
+    with op.batch_alter_table('favorites') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_favorites_user_id_kinopoisk_id',
+            ['user_id', 'kinopoisk_id']
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('favorites') as batch_op:
+        batch_op.drop_constraint('uq_favorites_user_id_kinopoisk_id', type_='unique')
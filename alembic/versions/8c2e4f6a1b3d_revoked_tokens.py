@@ -0,0 +1,37 @@
+"""Revoked tokens
+
+Revision ID: 8c2e4f6a1b3d
+Revises: 3f1d2a9b7c10
+Create Date: 2026-10-19 12:40:18.527306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2e4f6a1b3d'
+down_revision = '3f1d2a9b7c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Денилист jti вышедших из системы токенов; воркеры строят по нему фильтр Блума в памяти
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('jti', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+    op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_tokens_revoked_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
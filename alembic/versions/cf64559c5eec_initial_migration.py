@@ -17,8 +17,48 @@ depends_on = None
 
 
 def upgrade() -> None:
-    pass
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=255), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'movies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kinopoisk_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('poster_url', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_movies_id', 'movies', ['id'])
+    op.create_index('ix_movies_kinopoisk_id', 'movies', ['kinopoisk_id'], unique=True)
+    op.create_index('ix_movies_title', 'movies', ['title'])
+    op.create_index('ix_movies_year', 'movies', ['year'])
+
+    op.create_table(
+        'favorites',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kinopoisk_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_favorites_id', 'favorites', ['id'])
+    op.create_index('ix_favorites_kinopoisk_id', 'favorites', ['kinopoisk_id'])
+    op.create_index('ix_favorites_year', 'favorites', ['year'])
 
 
 def downgrade() -> None:
-    pass
+    op.drop_table('favorites')
+    op.drop_table('movies')
+    op.drop_table('users')
@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from app.api.dependencies import get_admin_user
+from app.core.profiling import list_profiles, profile_path
+from app.core.tracing import trace_buffer
+
+router = APIRouter(prefix="/admin")
+
+
+# Эндпойнт для просмотра сохранённых профилей
+@router.get("/profiles")
+async def get_profiles(admin: dict = Depends(get_admin_user)):
+    """
+    Description:
+    ------------
+        Endpoint listing saved profiles: per-request profiles taken with the X-Profile header and
+        periodic dumps of the continuous sampler.
+
+    Parameters:
+    -----------
+        admin (dict):
+            The administrator's token payload, provided by Depends(get_admin_user).
+
+    Returns:
+    --------
+        A list of profile names, newest first.
+    """
+    return list_profiles()
+
+
+# Эндпойнт для скачивания профиля
+@router.get("/profiles/{name}")
+async def get_profile(name: str, admin: dict = Depends(get_admin_user)):
+    """
+    Description:
+    ------------
+        Endpoint returning a saved profile. Open .speedscope.json files in https://www.speedscope.app,
+        .collapsed files in speedscope or flamegraph.pl.
+
+    Parameters:
+    -----------
+        name (str):
+            The profile name from the X-Profile-Id header or the profile list.
+        admin (dict):
+            The administrator's token payload, provided by Depends(get_admin_user).
+
+    Returns:
+    --------
+        The profile file.
+
+    Exceptions:
+    -----------
+        Raises HTTPException with status code 404 if there is no such profile.
+    """
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
+# Эндпойнт для просмотра последних трасс
+@router.get("/traces")
+async def get_traces(admin: dict = Depends(get_admin_user)):
+    """
+    Description:
+    ------------
+        Endpoint listing the sampled traces kept in the in-memory ring buffer (TRACE_BUFFER_SIZE).
+
+    Parameters:
+    -----------
+        admin (dict):
+            The administrator's token payload, provided by Depends(get_admin_user).
+
+    Returns:
+    --------
+        A list of traces, newest first, with the root span name, duration and span count.
+    """
+    return [
+        {
+            "trace_id": spans[0].trace_id,
+            "name": spans[0].name,
+            "start_ns": spans[0].start_ns,
+            "duration_ms": round(spans[0].duration_ms, 3),
+            "spans": len(spans),
+        }
+        for spans in reversed(trace_buffer.traces)
+    ]
+
+
+# Эндпойнт для просмотра spans одной трассы
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str, admin: dict = Depends(get_admin_user)):
+    """
+    Description:
+    ------------
+        Endpoint returning all spans of a trace from the ring buffer.
+
+    Parameters:
+    -----------
+        trace_id (str):
+            The trace id from the X-Trace-Id header or the trace list.
+        admin (dict):
+            The administrator's token payload, provided by Depends(get_admin_user).
+
+    Returns:
+    --------
+        A list of spans in the order they were started.
+
+    Exceptions:
+    -----------
+        Raises HTTPException with status code 404 if the trace is not in the buffer.
+    """
+    spans = trace_buffer.find(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+
+    return [item.to_dict() for item in sorted(spans, key=lambda item: item.start_ns)]
@@ -0,0 +1,97 @@
+import asyncio
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from app.api.dependencies import rate_limit
+from app.api.movie import load_movie_entry
+from app.core.config import settings
+from app.core.serialization import favorite_list_adapter
+from app.core.tracing import traced
+from app.db.crud import get_favorite_rows_with_user_id, get_user_by_id
+from app.db.session import get_sessionmaker
+from app.db.writebehind import favorite_writes
+from schemas import Dashboard, UserOut
+
+router = APIRouter()
+
+
+# Каждая параллельная задача работает в своей сессии: AsyncSession не допускает одновременных запросов
+@traced("dashboard.profile")
+async def load_profile(user_id: int) -> bytes:
+    async with get_sessionmaker()() as db:
+        user = await get_user_by_id(db, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return UserOut.model_validate(user).model_dump_json().encode()
+
+
+@traced("dashboard.favorites")
+async def load_favorites(user_id: int) -> list[dict]:
+    overlay = favorite_writes.overlay(user_id)
+    async with get_sessionmaker()() as db:
+        return favorite_writes.merge(await get_favorite_rows_with_user_id(db, user_id=user_id), overlay)
+
+
+# Недоступные детали фильма не должны ронять весь ответ
+async def load_movie_body(kinopoisk_id: int) -> bytes | None:
+    try:
+        entry = await load_movie_entry(kinopoisk_id)
+    except HTTPException:
+        return None
+    return entry.body
+
+
+@router.get("/me/dashboard", response_model=Dashboard)
+async def get_dashboard(limit: int = Query(settings.DASHBOARD_MOVIES, ge=0, le=settings.DASHBOARD_MAX_MOVIES,
+                                           description="Number of most recent favorites to return details for"),
+                        token: dict = Depends(rate_limit)):
+    """
+    Description:
+    ------------
+        Endpoint returning everything the home screen needs in one response: the user's profile,
+        the favorites list and the details of the most recently added favorites.
+
+    Parameters:
+    -----------
+        limit (int, optional):
+            Number of most recent favorites to return details for. Defaults to DASHBOARD_MOVIES.
+        token (dict):
+            User's authentication token, decoded once for all the parts.
+
+    Returns:
+    --------
+        A JSON response with the Dashboard object: profile, favorites, movies (MovieDetail of the
+            most recent favorites, newest first) and unavailable (ids whose details could not be fetched).
+
+    Exceptions:
+    -----------
+        Raises an HTTPException with status code 404 if the user is not found.
+        Raises an HTTPException with status code 429 if the user exceeds the rate limit (RATE_LIMIT_RATE).
+
+    Notes:
+    ------
+        The profile lookup, the favorites query and the detail fetches run concurrently in an
+        asyncio.TaskGroup; detail fetches start as soon as the favorites are known and are served
+        from the movie cache when possible. Cached details are embedded as ready JSON bytes.
+    """
+    user_id = token["id"]
+    try:
+        async with asyncio.TaskGroup() as tg:
+            profile_task = tg.create_task(load_profile(user_id))
+            favorites = await load_favorites(user_id)
+            recent = [row["kinopoisk_id"] for row in reversed(favorites)][:limit]
+            movie_tasks = [tg.create_task(load_movie_body(kinopoisk_id)) for kinopoisk_id in recent]
+    except* HTTPException as group:
+        raise group.exceptions[0]
+
+    bodies = [task.result() for task in movie_tasks]
+    unavailable = [kinopoisk_id for kinopoisk_id, body in zip(recent, bodies) if body is None]
+    # Ответ собирается из готовых JSON-фрагментов без повторной сериализации деталей фильмов
+    content = b"".join([
+        b'{"profile":', profile_task.result(),
+        b',"favorites":', favorite_list_adapter.dump_json(favorites),
+        b',"movies":[', b",".join(body for body in bodies if body is not None),
+        b'],"unavailable":', orjson.dumps(unavailable),
+        b"}",
+    ])
+    return Response(content=content, media_type="application/json")
@@ -1,6 +1,11 @@
+import math
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from app.core.config import settings
 from app.core.core_jwt import decode_access_token
+from app.core.ratelimit import RATE_LIMITED, rate_limiter, upstream_caller
+from app.core.revocation import token_denylist
+from app.core.tracing import span
 from app.db.session import get_db
 from sqlalchemy.orm import Session
 
@@ -14,7 +19,7 @@ def get_db_session(db: Session = Depends(get_db)):
 
 
 # Зависимость для декодирования JWT токена
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Description:
     ------------
@@ -35,10 +40,70 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
     Raises:
     ------
-        HTTPException: If the authentication credentials are invalid (status code 401).
+        HTTPException: If the authentication credentials are invalid or the token has been revoked
+            (status code 401).
+
+    Notes:
+    ------
+        Revocation is checked against the in-memory token_denylist: for tokens that were not revoked
+        it is a bloom filter lookup without I/O. Tokens without a jti claim cannot be revoked.
     """
-    user = decode_access_token(token)
+    with span("auth.get_current_user"):
+        user = decode_access_token(token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    jti = user.get("jti")
+    if jti is not None and await token_denylist.is_revoked(jti):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+
+    return user
+
+
+# Зависимость для маршрутов администратора
+def get_admin_user(user: dict = Depends(get_current_user)):
+    """
+    Description:
+    ------------
+        Ensures the current user is an administrator (listed in the ADMIN_USER_IDS setting).
+
+    Returns:
+    --------
+        dict:
+            The token payload of the administrator.
 
+    Raises:
+    ------
+        HTTPException: If the user is not an administrator (status code 403).
+    """
+    if user.get("id") not in settings.ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+
+    return user
+
+
+# Зависимость для маршрутов, обращающихся к Kinopoisk API
+async def rate_limit(user: dict = Depends(get_current_user)):
+    """
+    Description:
+    ------------
+        Counts the request against the user's rate limit (RATE_LIMIT_RATE per second on average,
+        bursts of RATE_LIMIT_BURST) and marks the user as the caller of the upstream requests it makes,
+        so that they are queued fairly with the other users' requests.
+
+    Returns:
+    --------
+        dict:
+            The token payload of the user.
+
+    Raises:
+    ------
+        HTTPException: If the user is over the limit (status code 429 with a Retry-After header).
+    """
+    key = str(user.get("id"))
+    retry_after = await rate_limiter.check(key)
+    if retry_after:
+        RATE_LIMITED.inc()
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    upstream_caller.set(key)
     return user
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+# Эндпойнт для сбора метрик Prometheus
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Description:
+    ------------
+        Endpoint exposing application metrics in the Prometheus text format.
+
+    Returns:
+    --------
+        A text/plain response with route latency histograms and status counters, Kinopoisk API latency
+        and errors, SQLAlchemy pool checkout wait and utilization, cache hit rates and event loop lag.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
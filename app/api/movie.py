@@ -1,41 +1,79 @@
-import httpx
-from fastapi import APIRouter, Depends, HTTPException
+import re
+import time
+from urllib.parse import urlsplit
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
 from app.core.config import settings
 from app.db.session import get_db
-from schemas import Movie, MovieDetail, FavoriteCreate, FavoriteOut
-from app.api.dependencies import get_current_user
+from schemas import Movie, MovieDetail, FavoriteCreate, FavoriteOut, Suggestion, parse_year, parse_rating  # noqa: F401
+from app.api.dependencies import get_current_user, rate_limit
+from app.core.cache import cache_control, movie_cache, entry_response, projected_entry
+from app.core.log import LogBody
+from app.core.metrics import UPSTREAM_REQUEST_DURATION, UPSTREAM_ERRORS
+from app.core.posters import poster_store, snap_width
+from app.core.providers import FILM_PATH, SEARCH_PATH, ProviderError, get_provider
+from app.core.ratelimit import upstream_caller, upstream_scheduler
+from app.core.suggest import suggest_index
+from app.core.tracing import traced, set_span_attribute
+from app.core.warming import hot_movies, upstream_quota
+from app.core.serialization import (
+    json_response,
+    parse_payload,
+    parse_field_set,
+    field_set_projector,
+    movie_list_adapter,
+    movie_detail_adapter,
+    favorite_list_adapter,
+    search_page_adapter,
+    film_detail_adapter
+)
 from app.db.crud import (
     get_favorites_by_user,
-    get_favorite_with_user_id,
+    get_favorite_rows_with_user_id,
     create_favorite,
     remove_favorite
 )
+from app.db.writebehind import favorite_writes
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+UPSTREAM_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+# Описание параметра ?fields= для документации OpenAPI
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated list of fields to return, e.g. title,year,poster_url"
+)
 
 
 # Асинхронная функция для получения данных с Kinopoisk API
-async def get_kinopoisk_data(endpoint: str, params: dict = None, headers: dict = None):
+@traced("kinopoisk.get")
+async def get_kinopoisk_data(endpoint: str, params: dict = None, raw: bool = False):
     """
     Description:
     ------------
-        Asynchronous function to perform a GET request to the Kinopoisk API, retrieving movie
-        data using the provided endpoint, params, and headers.
+        Asynchronous function retrieving movie data from the Kinopoisk API through the configured
+        movie provider (live HTTP, recorded fixtures or an in-memory fake, see KINOPOISK_PROVIDER).
 
     Parameters:
     -----------
         endpoint (str):
-            The URL of the API endpoint.
+            The API path, e.g. SEARCH_PATH, relative to KINOPOISK_API_URL.
         params (dict, optional):
             A dictionary of parameters to send with the request. Default is None.
-        headers (dict, optional):
-            A dictionary of headers to send with the request. Default is None.
+        raw (bool, optional):
+            Return the undecoded response body (bytes) so that the caller can validate it
+            with a TypeAdapter in one pass. Default is False.
 
     Returns:
     --------
-        Returns the JSON response from the Kinopoisk API.
+        Returns the JSON response from the Kinopoisk API, or its raw bytes if raw is True.
 
     Exceptions:
     -----------
@@ -43,37 +81,63 @@ async def get_kinopoisk_data(endpoint: str, params: dict = None, headers: dict =
 
     Notes:
     ------
-         The function logs the request parameters, response status, and content for debugging purposes.
+         The function logs the request parameters, response status, and a truncated body for debugging purposes.
+         These messages are sampled (LOG_SAMPLE_RATES) and formatted lazily in the logging thread.
     """
-    headers = {
-        "X-API-KEY": settings.KINOPOISK_API_KEY,
-        "Content-Type": "application/json"
-    }
+    provider = get_provider()
+    labels = (upstream_endpoint_label(endpoint),)
+    set_span_attribute("endpoint", labels[0])
+    set_span_attribute("provider", provider.name)
+    start = time.perf_counter()
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Логируем параметры запроса
-            logging.info(f"Requesting URL: {endpoint} with params: {params}")
-            response = await client.get(endpoint, params=params, headers=headers)
-
-            # Логируем статус ответа
-            logging.info(f"Response status: {response.status_code}")
-
-            if response.status_code != 200:
-                logging.error(f"Failed to fetch data: {response.text}")
-                raise HTTPException(status_code=500, detail="Failed to fetch data from Kinopoisk API")
-
-            # Логируем содержимое ответа
-            logging.info(f"Response content: {response.text}")
-            return response.json()
+        # Логируем параметры запроса
+        logger.info("Requesting URL: %s with params: %s", endpoint, params,
+                    extra={"event": "upstream.request", "endpoint": labels[0]})
+        # Единственное место учёта квоты; фоновые задачи (прогрев) — в своей доле
+        upstream_quota.record(background=upstream_caller.get() == "background")
+        # Очередь к Kinopoisk API: при нехватке слотов пользователи обслуживаются по очереди
+        async with upstream_scheduler.slot():
+            content = await provider.fetch(endpoint, params)
+        elapsed = time.perf_counter() - start
+        UPSTREAM_REQUEST_DURATION.observe(elapsed, labels)
+        set_span_attribute("http.status_code", 200)
+
+        # Логируем статус ответа
+        logger.info("Response status: %s", 200,
+                    extra={"event": "upstream.response", "endpoint": labels[0],
+                           "status": 200, "duration_ms": round(elapsed * 1000, 1)})
+
+        # Логируем начало тела ответа
+        logger.debug("Response content: %s", LogBody(content),
+                     extra={"event": "upstream.body", "endpoint": labels[0]})
+        if raw:
+            return content
+        return orjson.loads(content)
+    except ProviderError as e:
+        UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - start, labels)
+        UPSTREAM_ERRORS.inc(labels + (e.reason,))
+        set_span_attribute("http.status_code", e.status)
+        logger.error("Failed to fetch data: %s %s", e.reason, LogBody(e.body),
+                     extra={"event": "upstream.error", "endpoint": labels[0], "status": e.status})
+        raise HTTPException(status_code=500, detail="An error occurred while requesting Kinopoisk API")
     except Exception as e:
-        logging.error(f"Error during API request: {str(e)}")
+        UPSTREAM_ERRORS.inc(labels + (type(e).__name__,))
+        logger.error("Error during API request: %s", e, extra={"event": "upstream.error", "endpoint": labels[0]})
         raise HTTPException(status_code=500, detail="An error occurred while requesting Kinopoisk API")
 
 
+# Метка эндпойнта Kinopoisk для метрик: без хоста и идентификаторов
+def upstream_endpoint_label(endpoint: str) -> str:
+    return UPSTREAM_ID_RE.sub("/{id}", urlsplit(endpoint).path)
+
+
 # Эндпойнт для поиска фильмов
-@router.get("/search", response_model=list[Movie])
-async def search_movies(query: str, token: str = Depends(get_current_user)):
+@router.get("/search", response_model=list[Movie], dependencies=[Depends(rate_limit)])
+async def search_movies(request: Request,
+                        query: str,
+                        fields: str | None = FIELDS_QUERY,
+                        token: str = Depends(get_current_user)):
     """
     Description:
     -----------
@@ -81,113 +145,160 @@ async def search_movies(query: str, token: str = Depends(get_current_user)):
 
     Parameters:
     -----------
+        request (Request):
+            The incoming request; its Accept-Encoding selects the precompressed cache variant.
         query (str):
             The keyword to search for movies.
+        fields (str, optional):
+            Comma-separated list of Movie fields to return. All fields are returned by default.
         token (str):
             User's authentication token.
 
     Returns:
     --------
-        A list of Movie objects corresponding to the found movies.
+        A JSON response with the list of Movie objects corresponding to the found movies,
+            serialized by the precompiled movie_list_adapter.
 
     Exceptions:
     ----------
         Raises an HTTPException with status code 404 if no movies are found for the given query.
+        Raises an HTTPException with status code 400 if fields contains unknown field names.
+        Raises an HTTPException with status code 429 if the user exceeds the rate limit (RATE_LIMIT_RATE).
 
     Notes:
     ------
          This function calls get_kinopoisk_data() to fetch data from the Kinopoisk API.
+         Results are cached for SEARCH_CACHE_TTL seconds together with their gzip/brotli variants.
+         The response carries Cache-Control: public with s-maxage, so a shared proxy may store it,
+         a weak ETag and Last-Modified of the cache entry; a conditional request for a cached entry
+         gets 304 without upstream work.
     """
-    params = {"keyword": query}
-    headers = {
-        "X-API-KEY": settings.KINOPOISK_API_KEY,
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    field_set = get_field_set(fields, Movie)
+    cache_key = f"search:{query.strip().casefold()}"
+    entry = await movie_cache.fetch(cache_key)
+    if entry is not None:
+        return await sparse_entry_response(entry, request, Movie, field_set, many=True)
 
+    params = {"keyword": query}
     data = await get_kinopoisk_data(
-        "https://api.kinopoiskapiunofficial.tech/api/v2.1/films/search-by-keyword",
+        SEARCH_PATH,
         params,
-        headers=headers
+        raw=True
     )
 
-    if not data or 'films' not in data:
+    if not data:
         raise HTTPException(status_code=404, detail="No films found for the given query")
 
-    return [
-        Movie(
-            kinopoisk_id=movie.get('filmId'),
-            title=movie.get('nameRu', 'Unknown Title'),
-            year=parse_year(movie.get('year')),
-            description=movie.get('description', ''),
-            rating=parse_rating(movie.get('rating'))
-        ) for movie in data['films']
-    ]
+    # Весь ответ валидируется за один проход pydantic-core, фильмы сразу становятся Movie
+    page = parse_kinopoisk_payload(search_page_adapter, data)
+    if page.films is None:
+        raise HTTPException(status_code=404, detail="No films found for the given query")
 
+    entry = await movie_cache.store(cache_key, movie_list_adapter.dump_json(page.films), settings.SEARCH_CACHE_TTL)
+    return await sparse_entry_response(entry, request, Movie, field_set, many=True)
 
-def parse_year(year: str) -> int | None:
+
+# Подсказки при наборе названия: из индекса в памяти, без запросов к Kinopoisk API и базе данных
+@router.get("/search/suggest", response_model=list[Suggestion])
+async def suggest_movies(q: str = Query(..., min_length=1, max_length=100, description="Title prefix typed so far"),
+                         limit: int = Query(settings.SUGGEST_LIMIT, ge=1, le=settings.SUGGEST_MAX_LIMIT),
+                         token: dict = Depends(get_current_user)):
     """
     Description:
     ------------
-        Converts a string representing a movie's year to an integer or None.
+        Endpoint returning type-ahead suggestions for a title prefix from the catalog (the movies table).
 
     Parameters:
     -----------
-        year (str):
-            The year of the movie as a string.
+        q (str):
+            The beginning of the title or of one of its words, in Cyrillic or Latin transliteration, any case.
+        limit (int, optional):
+            The maximum number of suggestions. Defaults to SUGGEST_LIMIT.
+        token (dict):
+            User's authentication token.
 
     Returns:
     --------
-        int(year) | None
-
-        Returns an integer if the string can be successfully converted to a year, otherwise returns None.
+        A JSON response with the list of Suggestion objects, the most favorited and best rated first.
+            The list is empty if nothing matches.
 
     Notes:
     ------
-         If the year cannot be converted to an integer, the function returns None.
+        Served by the in-memory suggest_index, refreshed in the background every SUGGEST_REFRESH_INTERVAL
+        seconds; movies added to the catalog after the last refresh are not suggested yet.
     """
-    if year == 'null' or year is None:
-        return None
-    try:
-        return int(year)
-    except ValueError:
-        # Если не удалось преобразовать в int, возвращаем None
-        return None
+    return Response(content=suggest_index.suggest_json(q, limit), media_type="application/json")
 
 
-def parse_rating(rating: str) -> float | None:
+def parse_kinopoisk_payload(adapter, data):
     """
     Description:
     ------------
-        Converts a string representing a movie's rating to a float or None.
+        Validates a Kinopoisk API payload with a precompiled TypeAdapter.
 
     Parameters:
     -----------
-        rating (str):
-            The rating of the movie as a string.
+        adapter (TypeAdapter):
+            The adapter of the expected upstream schema.
+        data (bytes | dict):
+            The raw response body or an already decoded payload.
 
     Returns:
-    -------
-        float(rating) | None
+    --------
+        The validated upstream model.
 
-        Returns a float if the string can be successfully converted to a rating, otherwise returns None.
+    Exceptions:
+    -----------
+        Raises an HTTPException with status code 500 if the payload does not match the schema.
+    """
+    try:
+        return parse_payload(adapter, data)
+    except ValidationError as e:
+        logger.error("Unexpected Kinopoisk API payload: %s", e, extra={"event": "upstream.invalid"})
+        raise HTTPException(status_code=500, detail="Unexpected response from Kinopoisk API")
 
-    Notes:
-    ------
-         If the rating cannot be converted to a float, the function returns None.
+
+def get_field_set(fields: str | None, model) -> frozenset | None:
+    """
+    Description:
+    ------------
+        Validates the ?fields= query parameter against the response model.
+
+    Parameters:
+    -----------
+        fields (str | None):
+            Comma-separated field names.
+        model (type[BaseModel]):
+            The response model.
+
+    Returns:
+    --------
+        frozenset | None
+            The requested field names, or None for the full payload.
+
+    Exceptions:
+    -----------
+        Raises an HTTPException with status code 400 if some of the fields are unknown.
     """
-    if rating == 'null' or rating is None:
-        return None
     try:
-        return float(rating)
-    except ValueError:
-        # Если не удалось преобразовать в float, возвращаем None
-        return None
+        return parse_field_set(fields, model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {str(e)}")
+
+
+async def sparse_entry_response(entry, request: Request, model, field_set: frozenset | None, many: bool = False):
+    # Проекция строится один раз на запись кеша и набор полей, дальше отдаётся готовыми байтами
+    if field_set is not None:
+        entry = await projected_entry(entry, field_set, field_set_projector(model, field_set, many))
+    return entry_response(entry, request)
 
 
 # Эндпойнт для получения деталей фильма
-@router.get("/movies/{kinopoisk_id}", response_model=MovieDetail)
-async def get_movie_details(kinopoisk_id: int, token: str = Depends(get_current_user)):
+@router.get("/movies/{kinopoisk_id}", response_model=MovieDetail, dependencies=[Depends(rate_limit)])
+async def get_movie_details(request: Request,
+                            kinopoisk_id: int,
+                            fields: str | None = FIELDS_QUERY,
+                            token: str = Depends(get_current_user)):
     """
     Description:
     ------------
@@ -195,54 +306,160 @@ async def get_movie_details(kinopoisk_id: int, token: str = Depends(get_current_
 
     Parameters:
     -----------
+        request (Request):
+            The incoming request; its Accept-Encoding selects the precompressed cache variant.
         kinopoisk_id (int):
             The movie's unique identifier in the Kinopoisk system.
+        fields (str, optional):
+            Comma-separated list of MovieDetail fields to return. All fields are returned by default.
         token (str):
             User's authentication token.
 
     Returns:
     --------
-        A MovieDetail object containing detailed movie data such as title, description, year, rating, and other attributes.
+        A JSON response with the MovieDetail object containing detailed movie data such as title, description,
+            year, rating, and other attributes.
 
     Exceptions:
     ----------
         Raises an HTTPException with status code 404 if the movie is not found.
+        Raises an HTTPException with status code 400 if fields contains unknown field names.
+        Raises an HTTPException with status code 429 if the user exceeds the rate limit (RATE_LIMIT_RATE).
 
     Notes:
     ------
         This function calls get_kinopoisk_data() to fetch movie details from the Kinopoisk API.
+        Details are cached for MOVIE_CACHE_TTL seconds together with their gzip/brotli variants.
+        The response carries Cache-Control: public with s-maxage, so a shared proxy may store it,
+        a weak ETag and Last-Modified of the cache entry; a conditional request for a cached entry
+        gets 304 without upstream work.
     """
+    field_set = get_field_set(fields, MovieDetail)
+    entry = await load_movie_entry(kinopoisk_id)
+    return await sparse_entry_response(entry, request, MovieDetail, field_set)
+
+
+async def load_movie_entry(kinopoisk_id: int):
+    """
+    Description:
+    ------------
+        Returns the cache entry with the movie details, fetching them from the Kinopoisk API on a miss.
+
+    Parameters:
+    -----------
+        kinopoisk_id (int):
+            The movie's unique identifier in the Kinopoisk system.
+
+    Returns:
+    --------
+        CacheEntry:
+            The entry with the serialized MovieDetail.
 
-    headers = {
-        "X-API-KEY": settings.KINOPOISK_API_KEY,
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    Exceptions:
+    ----------
+        Raises an HTTPException with status code 404 if the movie is not found.
+    """
+    hot_movies.touch(kinopoisk_id)
+    entry = await movie_cache.fetch(f"movie:{kinopoisk_id}")
+    if entry is not None:
+        return entry
+    return await refresh_movie_entry(kinopoisk_id)
+
+
+async def refresh_movie_entry(kinopoisk_id: int):
+    """
+    Description:
+    ------------
+        Fetches the movie details from the Kinopoisk API and stores them in the cache,
+        replacing a cached entry if there is one. Used on cache misses and by the cache warmer.
+
+    Parameters:
+    -----------
+        kinopoisk_id (int):
+            The movie's unique identifier in the Kinopoisk system.
+
+    Returns:
+    --------
+        CacheEntry:
+            The entry with the serialized MovieDetail.
+
+    Exceptions:
+    ----------
+        Raises an HTTPException with status code 404 if the movie is not found.
+    """
     data = await get_kinopoisk_data(
-        f"https://api.kinopoiskapiunofficial.tech/api/v2.2/films/{kinopoisk_id}",
-        headers=headers
+        FILM_PATH.format(kinopoisk_id=kinopoisk_id),
+        raw=True
     )
 
     if not data:
         raise HTTPException(status_code=404, detail="Film not found")
 
-    movie_data = data
-
-    genres = [genre['genre'] for genre in movie_data.get('genres', [])]
-    countries = [country['country'] for country in movie_data.get('countries', [])]
-
-    return MovieDetail(
-        kinopoisk_id=movie_data['kinopoiskId'],
-        title=movie_data['nameRu'],
-        year=movie_data['year'],
-        description=movie_data.get('description', ''),
-        rating=movie_data.get('rating', None),
-        countries=countries,
-        genres=genres,
-        director=movie_data.get('director', ''),
-        actors=movie_data.get('actors', []),
-        duration=movie_data.get('duration', None),
-        poster_url=movie_data.get('posterUrl', '')
+    # genres/countries разворачиваются в списки строк внутри схемы KinopoiskFilmDetail
+    movie_detail = parse_kinopoisk_payload(film_detail_adapter, data)
+    return await movie_cache.store(f"movie:{kinopoisk_id}", movie_detail_adapter.dump_json(movie_detail),
+                                   settings.MOVIE_CACHE_TTL)
+
+
+# Эндпойнт для получения постера фильма через прокси с дисковым кешем
+@router.get("/movies/{kinopoisk_id}/poster", response_class=FileResponse, dependencies=[Depends(rate_limit)])
+async def get_movie_poster(kinopoisk_id: int,
+                           w: int | None = Query(None, gt=0, description="Thumbnail width in pixels"),
+                           token: str = Depends(get_current_user)):
+    """
+    Description:
+    ------------
+        Endpoint to retrieve a movie poster, optionally resized, from the local poster cache.
+
+    Parameters:
+    -----------
+        kinopoisk_id (int):
+            The movie's unique identifier in the Kinopoisk system.
+        w (int, optional):
+            The thumbnail width; rounded up to the nearest of POSTER_WIDTHS. The original is returned by default.
+        token (str):
+            User's authentication token.
+
+    Returns:
+    --------
+        A FileResponse streaming the cached image with long-lived public caching headers; Range requests are supported.
+
+    Exceptions:
+    ----------
+        Raises an HTTPException with status code 404 if the movie or its poster is not found.
+        Raises an HTTPException with status code 500 if the poster cannot be downloaded.
+
+    Notes:
+    ------
+        The poster URL is taken from the cached movie details. The image is downloaded from the CDN once,
+        stored content-addressed on disk, and thumbnails are generated in a process pool.
+    """
+    entry = await load_movie_entry(kinopoisk_id)
+    poster_url = orjson.loads(entry.body).get("poster_url")
+    if not poster_url:
+        raise HTTPException(status_code=404, detail="Poster not found")
+
+    # httpx загружается при первом обращении к CDN, а не при импорте приложения
+    from httpx import HTTPError
+
+    try:
+        if w:
+            path, version, media_type = await poster_store.thumbnail(poster_url, snap_width(w))
+        else:
+            path, version, media_type = await poster_store.original(poster_url)
+    except HTTPError as e:
+        logger.error("Failed to fetch poster %s: %s", poster_url, e, extra={"event": "poster.error"})
+        raise HTTPException(status_code=500, detail="Failed to fetch poster")
+
+    # Файл не вытесняется из кеша постеров, пока ответ не отправлен
+    return FileResponse(
+        path,
+        media_type=media_type,
+        background=BackgroundTask(poster_store.release, path),
+        headers={
+            "Cache-Control": cache_control(settings.POSTER_MAX_AGE),
+            "ETag": f'"{version}"',
+        },
     )
 
 
@@ -274,15 +491,22 @@ async def add_to_favorites(movie: FavoriteCreate,
         Raises an HTTPException with status code 400 if the movie is already in the user's favorites.
     """
     user = token
-    movie_in_db = await get_favorites_by_user(
-        db,
-        user_id=user['id'],
-        kinopoisk_id=movie.kinopoisk_id
-    )
+    if favorite_writes.active:
+        movie_in_db = await favorite_writes.get(db, user_id=user['id'], kinopoisk_id=movie.kinopoisk_id)
+    else:
+        movie_in_db = await get_favorites_by_user(
+            db,
+            user_id=user['id'],
+            kinopoisk_id=movie.kinopoisk_id
+        )
 
     if movie_in_db:
         raise HTTPException(status_code=400, detail="Movie already in favorites")
 
+    # В режиме отложенной записи изменение подтверждается после записи в журнал, в базу попадёт пакетом
+    if favorite_writes.active:
+        return await favorite_writes.add(user['id'], movie.kinopoisk_id, movie.title, movie.year)
+
     added_movie_to_favorite = await create_favorite(
         db,
         user_id=user['id'],
@@ -321,11 +545,17 @@ async def remove_from_favorites(kinopoisk_id: int,
         Raises an HTTPException with status code 404 if the movie is not found in the user's favorites.
     """
     user = token
-    movie_in_db = await get_favorites_by_user(db, user_id=user['id'], kinopoisk_id=kinopoisk_id)
+    if favorite_writes.active:
+        movie_in_db = await favorite_writes.get(db, user_id=user['id'], kinopoisk_id=kinopoisk_id)
+    else:
+        movie_in_db = await get_favorites_by_user(db, user_id=user['id'], kinopoisk_id=kinopoisk_id)
 
     if not movie_in_db:
         raise HTTPException(status_code=404, detail="Movie not found in favorites")
 
+    if favorite_writes.active:
+        return await favorite_writes.remove(user['id'], movie_in_db)
+
     removed_movie = await remove_favorite(db, user_id=user['id'], kinopoisk_id=kinopoisk_id)
     return removed_movie
 
@@ -347,8 +577,10 @@ async def get_favorites(token: dict = Depends(get_current_user), db: AsyncSessio
 
     Returns:
     --------
-        A list of FavoriteOut objects representing the user's favorite movies.
+        A JSON response with the list of the user's favorite movies in the FavoriteOut format.
     """
     user = token
-    favorites = await get_favorite_with_user_id(db, user_id=user['id'])
-    return favorites
+    # Несохранённые в базу изменения пользователя накладываются на строки таблицы
+    overlay = favorite_writes.overlay(user['id'])
+    favorites = await get_favorite_rows_with_user_id(db, user_id=user['id'])
+    return json_response(favorite_list_adapter, favorite_writes.merge(favorites, overlay))
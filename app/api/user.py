@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.api.dependencies import oauth2_scheme
+from app.api.dependencies import get_current_user, oauth2_scheme
 from app.db import crud
 from app.db.session import get_db
 from schemas import UserCreate, UserOut, Token
 from app.core.security import verify_password
 from app.core.core_jwt import create_access_token, decode_access_token
+from app.core.revocation import token_denylist
 
 router = APIRouter()
 
@@ -84,6 +86,44 @@ async def login_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return {"access_token": token, "token_type": "bearer"}
 
 
+@router.post("/logout", status_code=204)
+async def logout_user(token: dict = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    Description:
+    ------------
+        Endpoint for user logout. Revokes the access token the request is made with.
+
+    Parameters:
+    -----------
+        token (dict):
+            The decoded access token, provided by Depends(get_current_user).
+        db (AsyncSession, optional):
+            An asynchronous database session, automatically provided by Depends(get_db).
+
+    Returns:
+    --------
+        An empty 204 No Content response.
+
+    Exceptions:
+    ----------
+        Raises an HTTPException with status code 401 if the token is invalid or already revoked.
+        Raises an HTTPException with status code 400 if the token has no jti claim (issued before revocation
+            was supported); such tokens stay valid until they expire.
+
+    Notes:
+    ------
+        The token's jti is stored in the revoked_tokens table until the token expires and added to this
+        worker's token_denylist at once; other workers pick it up within TOKEN_DENYLIST_SYNC_INTERVAL seconds.
+    """
+    jti = token.get("jti")
+    if jti is None:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+
+    await crud.revoke_token(db, jti, token.get("id"), datetime.utcfromtimestamp(token["exp"]))
+    token_denylist.add(jti)
+    return Response(status_code=204)
+
+
 @router.get("/profile", response_model=UserOut)
 async def get_user_profile(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """
@@ -120,6 +160,8 @@ async def get_user_profile(token: str = Depends(oauth2_scheme), db: AsyncSession
         username = payload.get("sub")
         if not username:
             raise HTTPException(status_code=401, detail="Invalid token")
+        if payload.get("jti") is not None and await token_denylist.is_revoked(payload["jti"]):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token")
 
@@ -0,0 +1,447 @@
+import asyncio
+import hashlib
+import email.utils
+import logging
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fastapi import Request
+from fastapi.responses import Response
+from app.core.compression import compress, negotiate_encoding, supported_encodings
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, registry
+from app.core.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+# Заголовок записи в общем кеше: версия, время создания и истечения, число сжатых вариантов
+ENTRY_HEADER = struct.Struct("<16sddB")
+# Версия формата записи в общем кеше, входит в ключ: при изменении формата старые записи не читаются
+ENTRY_FORMAT_VERSION = 1
+# Ошибки разбора записи общего кеша: повреждённая или чужая запись считается промахом
+DECODE_ERRORS = (struct.error, UnicodeDecodeError, ValueError)
+# Ошибки общего кеша, при которых запрос обслуживается без него
+SHARED_ERRORS = (OSError, ConnectionError, RespError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """
+    A cached JSON payload together with its precompressed variants.
+
+    Attributes:
+    -----------
+        body (bytes):
+            The uncompressed JSON body.
+        version (str):
+            A content hash of the body, stable across workers.
+        created_at (float):
+            Unix time the entry was stored.
+        expires_at (float):
+            Unix time after which the entry is stale.
+        encodings (dict[str, bytes]):
+            Precompressed bodies keyed by content coding ("br", "gzip").
+        projections (dict[str, CacheEntry]):
+            Sparse fieldset variants of the payload keyed by field-set key.
+    """
+    body: bytes
+    version: str
+    created_at: float
+    expires_at: float
+    encodings: dict = field(default_factory=dict)
+    projections: dict = field(default_factory=dict)
+
+
+def make_entry(body: bytes, ttl: int) -> CacheEntry:
+    """
+    Description:
+    ------------
+        Builds a cache entry, compressing the body once for every supported coding.
+
+    Parameters:
+    -----------
+        body (bytes):
+            The serialized JSON payload.
+        ttl (int):
+            Time to live in seconds.
+
+    Returns:
+    --------
+        CacheEntry:
+            The entry; bodies below COMPRESSION_MIN_SIZE are stored uncompressed only.
+    """
+    now = time.time()
+    encodings = {}
+    if len(body) >= settings.COMPRESSION_MIN_SIZE:
+        encodings = {coding: compress(body, coding, precompressed=True) for coding in supported_encodings()}
+    return CacheEntry(
+        body=body,
+        version=hashlib.blake2b(body, digest_size=8).hexdigest(),
+        created_at=now,
+        expires_at=now + ttl,
+        encodings=encodings,
+    )
+
+
+async def build_entry(body: bytes, ttl: int) -> CacheEntry:
+    # Сжатие brotli/gzip крупного тела занимает миллисекунды: оно выполняется в потоке, не блокируя event loop
+    if len(body) < settings.COMPRESSION_MIN_SIZE:
+        return make_entry(body, ttl)
+    return await asyncio.to_thread(make_entry, body, ttl)
+
+
+def encode_entry(entry: CacheEntry) -> bytes:
+    """
+    Description:
+    ------------
+        Serializes a cache entry with its precompressed variants for the shared cache tier.
+        Projections are not included: workers derive them locally.
+
+    Parameters:
+    -----------
+        entry (CacheEntry):
+            The entry to serialize.
+
+    Returns:
+    --------
+        bytes:
+            The header followed by length-prefixed body and encodings.
+    """
+    parts = [ENTRY_HEADER.pack(entry.version.encode(), entry.created_at, entry.expires_at, len(entry.encodings)),
+             struct.pack("<I", len(entry.body)), entry.body]
+    for coding, body in entry.encodings.items():
+        name = coding.encode()
+        parts += [struct.pack("<B", len(name)), name, struct.pack("<I", len(body)), body]
+    return b"".join(parts)
+
+
+def decode_entry(data: bytes) -> CacheEntry:
+    """
+    Description:
+    ------------
+        Parses a cache entry serialized by encode_entry.
+
+    Parameters:
+    -----------
+        data (bytes):
+            The value read from the shared cache tier.
+
+    Returns:
+    --------
+        CacheEntry:
+            The entry, without projections.
+
+    Exceptions:
+    ----------
+        Raises one of DECODE_ERRORS if the data is truncated or malformed.
+    """
+    version, created_at, expires_at, count = ENTRY_HEADER.unpack_from(data)
+    offset = ENTRY_HEADER.size
+    (length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    body = data[offset:offset + length]
+    offset += length
+    encodings = {}
+    for _ in range(count):
+        (name_length,) = struct.unpack_from("<B", data, offset)
+        name = data[offset + 1:offset + 1 + name_length].decode()
+        offset += 1 + name_length
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        encodings[name] = data[offset:offset + length]
+        offset += length
+    if offset != len(data):
+        raise ValueError(f"Malformed cache entry: {len(data)} bytes, expected {offset}")
+    return CacheEntry(body=body, version=version.decode(), created_at=created_at, expires_at=expires_at,
+                      encodings=encodings)
+
+
+async def projected_entry(entry: CacheEntry, fields: frozenset, project) -> CacheEntry:
+    """
+    Description:
+    ------------
+        Returns the variant of a cache entry restricted to a field set, building it on first use.
+
+    Parameters:
+    -----------
+        entry (CacheEntry):
+            The entry with the full payload.
+        fields (frozenset):
+            The requested field names.
+        project (Callable[[bytes], bytes]):
+            The projector for this field set (see field_set_projector).
+
+    Returns:
+    --------
+        CacheEntry:
+            The projected entry with its own version and precompressed variants; it expires
+            together with the full entry.
+    """
+    key = ",".join(sorted(fields))
+    variant = entry.projections.get(key)
+    if variant is None:
+        variant = await build_entry(project(entry.body), ttl=max(0, entry.expires_at - time.time()))
+        # Число вариантов ограничено, чтобы произвольные комбинации полей не раздували запись
+        if len(entry.projections) < settings.CACHE_MAX_PROJECTIONS:
+            entry.projections[key] = variant
+    return variant
+
+
+class PayloadCache:
+    """
+    In-process TTL cache of response payloads with LRU eviction, optionally backed by a shared tier.
+
+    Entries hold ready-to-send bytes, so a hit costs a dict lookup instead of an upstream request,
+    validation, serialization and compression. get()/set() work on the local tier only; fetch()/store()
+    also read and write the shared Redis-protocol cache (CACHE_BACKEND_URL), so that a payload fetched
+    by one worker is served by all workers on the host. If the shared cache is unreachable it is
+    skipped for SHARED_RETRY_INTERVAL seconds.
+    """
+
+    SHARED_RETRY_INTERVAL = 5.0
+
+    def __init__(self, name: str, max_entries: int = None, shared: RespClient = None):
+        self.name = name
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._shared_down_until = 0.0
+        # Метки счётчиков создаются один раз, а не на каждом обращении
+        self._hit_labels = (name, "hit")
+        self._miss_labels = (name, "miss")
+        self._shared_hit_labels = (name, "shared_hit")
+        self._shared_miss_labels = (name, "shared_miss")
+
+    def get(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            CACHE_REQUESTS.inc(self._miss_labels)
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            CACHE_REQUESTS.inc(self._miss_labels)
+            return None
+        self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(self._hit_labels)
+        return entry
+
+    def set(self, key: str, body: bytes, ttl: int) -> CacheEntry:
+        entry = make_entry(body, ttl)
+        self._put(key, entry)
+        return entry
+
+    def _put(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def expiring(self, prefix: str, within: float) -> list[str]:
+        # Ключи ещё свежих записей, которые истекут в ближайшие within секунд
+        now = time.time()
+        return [key for key, entry in list(self._entries.items())
+                if key.startswith(prefix) and now < entry.expires_at <= now + within]
+
+    def __contains__(self, key: str) -> bool:
+        # Проверка без учёта в счётчиках попаданий и без сдвига в LRU
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.time()
+
+    def _shared_available(self) -> bool:
+        return self.shared is not None and time.monotonic() >= self._shared_down_until
+
+    def _shared_failed(self, error: Exception):
+        self._shared_down_until = time.monotonic() + self.SHARED_RETRY_INTERVAL
+        logger.warning("Shared cache unavailable: %r", error, extra={"event": "cache.shared_error"})
+
+    async def fetch(self, key: str) -> CacheEntry | None:
+        """
+        Description:
+        ------------
+            Looks a key up in the local tier, then in the shared tier; shared hits are kept locally.
+
+        Parameters:
+        -----------
+            key (str):
+                The cache key, e.g. "movie:301".
+
+        Returns:
+        --------
+            CacheEntry | None:
+                The entry, or None if neither tier has a fresh one.
+        """
+        entry = self.get(key)
+        if entry is not None or not self._shared_available():
+            return entry
+
+        entry = await self._get_shared(key)
+        CACHE_REQUESTS.inc(self._shared_miss_labels if entry is None else self._shared_hit_labels)
+        return entry
+
+    async def peek_shared(self, key: str) -> CacheEntry | None:
+        # Для фоновых задач: запись общего кеша без учёта в счётчиках попаданий; свежая кладётся в локальный
+        if not self._shared_available():
+            return None
+        return await self._get_shared(key)
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.name}:v{ENTRY_FORMAT_VERSION}:{key}"
+
+    async def _get_shared(self, key: str) -> CacheEntry | None:
+        try:
+            data = await self.shared.get(self._shared_key(key))
+        except SHARED_ERRORS as e:
+            self._shared_failed(e)
+            return None
+        if data is None:
+            return None
+        try:
+            entry = decode_entry(data)
+        except DECODE_ERRORS as e:
+            # Повреждённая запись удаляется, чтобы следующий запрос записал её заново
+            logger.warning("Discarding malformed shared cache entry %s: %r", key, e,
+                           extra={"event": "cache.shared_decode_error"})
+            try:
+                await self.shared.delete(self._shared_key(key))
+            except SHARED_ERRORS as e:
+                self._shared_failed(e)
+            return None
+        if entry.expires_at <= time.time():
+            return None
+        self._put(key, entry)
+        return entry
+
+    async def store(self, key: str, body: bytes, ttl: int) -> CacheEntry:
+        """
+        Description:
+        ------------
+            Stores a payload in the local tier and, if configured, in the shared tier.
+
+        Parameters:
+        -----------
+            key (str):
+                The cache key.
+            body (bytes):
+                The serialized JSON payload.
+            ttl (int):
+                Time to live in seconds.
+
+        Returns:
+        --------
+            CacheEntry:
+                The stored entry.
+
+        Notes:
+        ------
+            Bodies of COMPRESSION_MIN_SIZE bytes or more are compressed in a worker thread.
+        """
+        entry = await build_entry(body, ttl)
+        self._put(key, entry)
+        if self._shared_available():
+            try:
+                await self.shared.set(self._shared_key(key), encode_entry(entry), ttl_ms=ttl * 1000)
+            except SHARED_ERRORS as e:
+                self._shared_failed(e)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cache_control(max_age: float) -> str:
+    # Ответы не зависят от пользователя: их хранит и браузер, и общий прокси (авторизацию проверяет прокси)
+    seconds = max(0, round(max_age))
+    return f"public, max-age={seconds}, s-maxage={seconds}"
+
+
+def entry_headers(entry: CacheEntry) -> dict:
+    # ETag слабый: identity, gzip и br — разные байты одного и того же ответа
+    return {
+        "Vary": "Accept-Encoding",
+        "ETag": f'W/"{entry.version}"',
+        "Last-Modified": email.utils.formatdate(entry.created_at, usegmt=True),
+        "Cache-Control": cache_control(entry.expires_at - time.time()),
+    }
+
+
+def not_modified(entry: CacheEntry, request: Request) -> bool:
+    """
+    Description:
+    ------------
+        Evaluates the conditional request headers against a cache entry.
+
+    Parameters:
+    -----------
+        entry (CacheEntry):
+            The cached payload.
+        request (Request):
+            The incoming request; If-None-Match and If-Modified-Since are used.
+
+    Returns:
+    --------
+        bool:
+            True if the client's copy is current and 304 Not Modified can be returned.
+
+    Notes:
+    ------
+        If-None-Match takes precedence; weak validators match too (the comparison is weak, as GET
+        requires). If-Modified-Since is compared at one-second precision.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = f'"{entry.version}"'
+        return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.created_at) <= since
+    return False
+
+
+def entry_response(entry: CacheEntry, request: Request) -> Response:
+    """
+    Description:
+    ------------
+        Serves a cache entry, picking the precompressed variant accepted by the client.
+
+    Parameters:
+    -----------
+        entry (CacheEntry):
+            The cached payload.
+        request (Request):
+            The incoming request; its Accept-Encoding and conditional headers are used.
+
+    Returns:
+    --------
+        Response:
+            An application/json response with ETag, Last-Modified and Cache-Control derived from the entry,
+            or 304 Not Modified without a body if the client's copy is current. CompressionMiddleware
+            leaves it as is.
+    """
+    headers = entry_headers(entry)
+    if not_modified(entry, request):
+        return Response(status_code=304, headers=headers)
+    body = entry.body
+    if entry.encodings:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding in entry.encodings:
+            body = entry.encodings[encoding]
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, headers=headers, media_type="application/json")
+
+
+# Кеш ответов Kinopoisk: детали фильмов и результаты поиска; общий для воркеров, если задан CACHE_BACKEND_URL
+movie_cache = PayloadCache("movie", shared=RespClient(settings.CACHE_BACKEND_URL) if settings.CACHE_BACKEND_URL else None)
+
+registry.gauge("cache_entries", "Entries held by the cache.", ("cache",),
+               callback=lambda: {(movie_cache.name,): len(movie_cache)})
@@ -0,0 +1,162 @@
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость, без неё отдаём только gzip
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать (изображения и так сжаты)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def supported_encodings() -> tuple[str, ...]:
+    # Порядок задаёт предпочтение сервера при равных q-значениях
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Description:
+    ------------
+        Picks the content coding for a response from the Accept-Encoding request header.
+
+    Parameters:
+    -----------
+        accept_encoding (str | None):
+            The raw Accept-Encoding header value, e.g. "gzip, deflate, br;q=0.9".
+
+    Returns:
+    --------
+        str | None
+            "br" or "gzip", or None if the client accepts neither.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    """
+    Description:
+    ------------
+        Compresses a response body.
+
+    Parameters:
+    -----------
+        body (bytes):
+            The body to compress.
+        encoding (str):
+            "br" or "gzip".
+        precompressed (bool, optional):
+            Use the higher compression levels meant for cache entries, which are compressed once
+            and served many times. Defaults to False (levels for on-the-fly compression).
+
+    Returns:
+    --------
+        bytes:
+            The compressed body.
+    """
+    if encoding == "br":
+        quality = settings.CACHE_BROTLI_QUALITY if precompressed else settings.BROTLI_QUALITY
+        return brotli.compress(body, quality=quality)
+    level = settings.CACHE_GZIP_LEVEL if precompressed else settings.GZIP_LEVEL
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def is_compressible(content_type: str | None) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+# Vary без повторов: ответы из кеша уже несут Vary: Accept-Encoding, общий прокси не должен видеть дубли
+def add_vary(headers: MutableHeaders, name: str):
+    vary = headers.get("vary", "")
+    if name.lower() not in (value.strip().lower() for value in vary.split(",")):
+        headers.add_vary_header(name)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses with brotli or gzip according to Accept-Encoding.
+
+    Bodies smaller than minimum_size are sent as is: for them the compression overhead outweighs
+    the saved bytes. Responses that already carry Content-Encoding (precompressed cache entries)
+    and streamed responses are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type")):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Заголовки отправим, когда станет известен размер тела
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start["headers"])
+                if message.get("more_body", False) or len(body) < self.minimum_size:
+                    # Потоковые и маленькие ответы отдаём без сжатия
+                    passthrough = True
+                    add_vary(headers, "Accept-Encoding")
+                    await send(start)
+                    await send(message)
+                    return
+
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                add_vary(headers, "Accept-Encoding")
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
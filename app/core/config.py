@@ -10,6 +10,112 @@ class Settings:
     JWT_ALGORITHM = "HS256"
     JWT_EXPIRATION_TIME = 72000  # 1 hour
     KINOPOISK_API_KEY = os.getenv("KINOPOISK_API_KEY")
+    # Базовый адрес Kinopoisk API; в нагрузочных тестах указывает на локальную заглушку
+    KINOPOISK_API_URL = os.getenv("KINOPOISK_API_URL", "https://api.kinopoiskapiunofficial.tech").rstrip("/")
+    # Источник данных Kinopoisk: http, record (http с записью ответов), replay (записанные ответы), fake
+    KINOPOISK_PROVIDER = os.getenv("KINOPOISK_PROVIDER", "http")
+    KINOPOISK_FIXTURES_DIR = os.getenv("KINOPOISK_FIXTURES_DIR", ".cache/kinopoisk-fixtures")
+    KINOPOISK_REPLAY_LATENCY = float(os.getenv("KINOPOISK_REPLAY_LATENCY", 0))  # секунды на ответ в режиме replay
+    # Дневной лимит запросов тарифа Kinopoisk API (0 — без ограничения)
+    KINOPOISK_DAILY_QUOTA = int(os.getenv("KINOPOISK_DAILY_QUOTA", 0))
+    # Режим подготовки схемы при старте: check (сверка ревизии Alembic), create (create_all), skip
+    DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "check")
+    # Вывод всех SQL-запросов в лог (echo движка SQLAlchemy); echo пишет синхронно, в обход
+    # отложенного обработчика и сэмплирования логов, поэтому по умолчанию выключен
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+    # Настройки встроенного SQLite (DATABASE_URL=sqlite+aiosqlite:///path/to/db.sqlite3)
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024))  # отрицательное значение — в КиБ
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # мс
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 5))
+    # Сжатие ответов: тела меньше порога отдаются как есть
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+    # Записи кеша сжимаются один раз, поэтому для них уровни выше
+    CACHE_GZIP_LEVEL = int(os.getenv("CACHE_GZIP_LEVEL", 9))
+    CACHE_BROTLI_QUALITY = int(os.getenv("CACHE_BROTLI_QUALITY", 9))
+    # Кеш ответов Kinopoisk (секунды)
+    MOVIE_CACHE_TTL = int(os.getenv("MOVIE_CACHE_TTL", 3600))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 600))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    CACHE_MAX_PROJECTIONS = int(os.getenv("CACHE_MAX_PROJECTIONS", 16))  # вариантов ?fields= на запись
+    # Общий кеш воркеров по протоколу Redis (redis://host:port/db); пусто — только кеш процесса
+    CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL", "")
+    # Прогрев кеша деталей фильмов: популярные в избранном и часто запрашиваемые; 0 — выключен
+    CACHE_WARM_INTERVAL = float(os.getenv("CACHE_WARM_INTERVAL", 300))
+    CACHE_WARM_TOP_FAVORITES = int(os.getenv("CACHE_WARM_TOP_FAVORITES", 200))
+    CACHE_WARM_HOT_IDS = int(os.getenv("CACHE_WARM_HOT_IDS", 100))
+    CACHE_WARM_RATE = float(os.getenv("CACHE_WARM_RATE", 2))  # запросов к Kinopoisk API в секунду
+    CACHE_WARM_QUOTA_SHARE = float(os.getenv("CACHE_WARM_QUOTA_SHARE", 0.1))  # доля KINOPOISK_DAILY_QUOTA
+    # Обновление записей, истекающих в ближайшие секунды, только в часы низкой нагрузки (например, "2-6")
+    CACHE_REFRESH_AHEAD = int(os.getenv("CACHE_REFRESH_AHEAD", 300))
+    CACHE_WARM_OFF_PEAK_HOURS = os.getenv("CACHE_WARM_OFF_PEAK_HOURS", "2-6")
+    # /me/dashboard: детали скольких последних фильмов из избранного возвращать (по умолчанию и максимум)
+    DASHBOARD_MOVIES = int(os.getenv("DASHBOARD_MOVIES", 10))
+    DASHBOARD_MAX_MOVIES = int(os.getenv("DASHBOARD_MAX_MOVIES", 20))
+    # Лимит запросов пользователя к маршрутам, обращающимся к Kinopoisk API: в среднем в секунду и всплеск
+    RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 5))  # 0 — без ограничения
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 20))
+    # Общий для воркеров счётчик (redis://host:port/db); без него лимит считается в каждом воркере
+    RATE_LIMIT_BACKEND_URL = os.getenv("RATE_LIMIT_BACKEND_URL", "")
+    # Одновременных запросов к Kinopoisk API на воркер; остальные ждут в очереди, по очереди между пользователями
+    UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", 8))
+    # Отозванные токены: фильтр Блума в памяти воркера, синхронизация с таблицей revoked_tokens (секунды)
+    TOKEN_DENYLIST_CAPACITY = int(os.getenv("TOKEN_DENYLIST_CAPACITY", 100000))
+    TOKEN_DENYLIST_ERROR_RATE = float(os.getenv("TOKEN_DENYLIST_ERROR_RATE", 0.001))
+    TOKEN_DENYLIST_SYNC_INTERVAL = float(os.getenv("TOKEN_DENYLIST_SYNC_INTERVAL", 5))
+    TOKEN_DENYLIST_REBUILD_INTERVAL = float(os.getenv("TOKEN_DENYLIST_REBUILD_INTERVAL", 3600))
+    # Отложенная запись избранного: изменения подтверждаются после fsync в журнал воркера и
+    # пакетно сбрасываются в базу раз в FAVORITES_FLUSH_INTERVAL секунд
+    FAVORITES_WRITE_BEHIND = os.getenv("FAVORITES_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    FAVORITES_FLUSH_INTERVAL = float(os.getenv("FAVORITES_FLUSH_INTERVAL", 0.5))
+    FAVORITES_LOG_DIR = os.getenv("FAVORITES_LOG_DIR", ".cache/favorites-log")
+    # /search/suggest: индекс названий каталога в памяти, догрузка новых фильмов и полная перестройка (секунды)
+    SUGGEST_REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", 60))  # 0 — индекс не строится
+    SUGGEST_REBUILD_INTERVAL = float(os.getenv("SUGGEST_REBUILD_INTERVAL", 3600))
+    SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", 10))
+    SUGGEST_MAX_LIMIT = int(os.getenv("SUGGEST_MAX_LIMIT", 50))
+    # Прокси постеров: дисковый кеш оригиналов и миниатюр
+    POSTER_CACHE_DIR = os.getenv("POSTER_CACHE_DIR", ".cache/posters")
+    # Лимит считает каждый воркер отдельно: при N воркерах каталог может занять до N лимитов
+    POSTER_CACHE_MAX_BYTES = int(os.getenv("POSTER_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    POSTER_WIDTHS = (92, 154, 185, 342, 500, 780)  # допустимые ширины миниатюр ?w=
+    POSTER_WORKERS = int(os.getenv("POSTER_WORKERS", 2))
+    POSTER_FETCH_TIMEOUT = float(os.getenv("POSTER_FETCH_TIMEOUT", 10))
+    POSTER_MAX_AGE = int(os.getenv("POSTER_MAX_AGE", 30 * 24 * 3600))
+    # Период замера задержки event loop для /metrics (секунды)
+    EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.5))
+    # Логирование: пишется фоновым потоком через очередь
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json или text
+    LOG_BODY_LIMIT = int(os.getenv("LOG_BODY_LIMIT", 512))  # байт тела ответа в логе
+    # Доля сохраняемых сообщений по типу события; предупреждения и ошибки не сэмплируются
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "upstream.request=0.1,upstream.response=0.1,upstream.body=0.01")
+    # Трассировка: доля запросов в выборке (0 — выключено), буфер для /admin/traces и файл OTLP/JSON
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0))
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 200))
+    TRACE_OTLP_FILE = os.getenv("TRACE_OTLP_FILE", "")
+    # Пользователи с правами администратора (id через запятую): профилирование и /admin
+    ADMIN_USER_IDS = frozenset(int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip())
+    # Профилирование: заголовок X-Profile от администратора профилирует один запрос
+    PROFILING_DIR = os.getenv("PROFILING_DIR", ".cache/profiles")
+    PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.001))  # период сэмплирования запроса (секунды)
+    PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 200))
+    # Постоянное сэмплирование с низкой частотой; 0 — выключено
+    PROFILING_SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL", 0))
+    PROFILING_DUMP_INTERVAL = float(os.getenv("PROFILING_DUMP_INTERVAL", 300))
+    # Запуск через python -m app.server: адрес, число воркеров и время на завершение запросов при остановке
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+    WORKER_GRACEFUL_TIMEOUT = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", 30))
+    # Остановка приложения: общее время хуков сброса буферов (секунды); мастер ждёт воркер
+    # WORKER_GRACEFUL_TIMEOUT + SHUTDOWN_HOOK_TIMEOUT + SHUTDOWN_CLOSE_TIMEOUT, прежде чем убить его
+    SHUTDOWN_HOOK_TIMEOUT = float(os.getenv("SHUTDOWN_HOOK_TIMEOUT", 5))
+    # Запас на закрытие клиентов, пула соединений и логов после хуков
+    SHUTDOWN_CLOSE_TIMEOUT = float(os.getenv("SHUTDOWN_CLOSE_TIMEOUT", 5))
 
 
 settings = Settings()
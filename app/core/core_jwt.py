@@ -1,4 +1,4 @@
-import jwt
+import uuid
 from datetime import datetime, timedelta
 from .config import settings
 
@@ -18,8 +18,10 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     Returns:
     --------
         str:
-            The generated JWT access token.
+            The generated JWT access token with a unique jti claim, so that it can be revoked.
         """
+    import jwt
+
     to_encode = data.copy()
 
     if expires_delta:
@@ -27,7 +29,8 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
 
-    to_encode.update({"exp": expire, "id": data["id"]})
+    # jti — идентификатор токена для отзыва при выходе из системы
+    to_encode.update({"exp": expire, "id": data["id"], "jti": uuid.uuid4().hex})
     return jwt.encode(
         to_encode,
         settings.JWT_SECRET_KEY,
@@ -53,6 +56,8 @@ def decode_access_token(token: str) -> dict:
     ---------
         If the token has expired, is invalid, or an unexpected error occurs.
         """
+    import jwt
+
     try:
         payload = jwt.decode(
             token,
@@ -0,0 +1,33 @@
+import asyncio
+
+
+class LazyHttpClient:
+    """
+    An httpx.AsyncClient created on first use and reused afterwards, so that upstream requests share
+    keep-alive connections instead of paying a TCP and TLS handshake each. httpx is imported only
+    when the first client is created.
+
+    Pooled connections belong to the event loop they were opened in; if the client is asked for from
+    another loop (a new TestClient portal, a restarted app), a fresh client is created for it.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self._client = None
+        self._loop = None
+
+    def get(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(**self.options)
+            self._loop = loop
+        return self._client
+
+    async def close(self):
+        client, self._client = self._client, None
+        # Клиент из другого, уже остановленного event loop закрыть нельзя: его соединения ушли вместе с ним
+        if client is not None and self._loop is asyncio.get_running_loop():
+            await client.aclose()
+        self._loop = None
@@ -0,0 +1,94 @@
+import asyncio
+import inspect
+import logging
+import time
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """
+    Process-wide state of the application's shutdown.
+
+    Counts in-flight HTTP requests for /metrics and holds the shutdown hooks registered with
+    on_shutdown(). The server stops accepting connections and waits for in-flight requests
+    (uvicorn's timeout_graceful_shutdown) before the lifespan shutdown starts; run_shutdown_hooks()
+    then flushes buffers before connections are closed.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._hooks = []
+
+    def on_shutdown(self, hook):
+        """
+        Description:
+        ------------
+            Registers a callable (sync or async, without arguments) to run on shutdown, while the
+            database and the HTTP clients are still open. Hooks run in registration order.
+            Can be used as a decorator.
+        """
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+        return hook
+
+    def remove_shutdown_hook(self, hook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+
+    async def run_shutdown_hooks(self, timeout: float):
+        """
+        Description:
+        ------------
+            Runs the shutdown hooks within a shared deadline, so the whole phase is bounded
+            (app.server adds it to the time it waits for a worker before killing it).
+
+        Parameters:
+        -----------
+            timeout (float):
+                Seconds for all hooks together; each hook gets the time left by the previous ones.
+        """
+        # Ошибка или зависание одного хука не мешает остальным
+        deadline = time.monotonic() + timeout
+        for hook in list(self._hooks):
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await asyncio.wait_for(result, max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                logger.error("Shutdown hook %s failed: %r", getattr(hook, "__qualname__", hook), e,
+                             extra={"event": "shutdown.hook_error"})
+
+
+lifecycle = Lifecycle()
+
+registry.gauge("http_requests_in_flight", "HTTP requests being processed.",
+               callback=lambda: {(): lifecycle.in_flight})
+
+
+class InFlightMiddleware:
+    """
+    ASGI middleware counting in-flight HTTP requests for the http_requests_in_flight gauge.
+    """
+
+    def __init__(self, app, lifecycle: Lifecycle = lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.request_finished()
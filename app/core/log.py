@@ -0,0 +1,169 @@
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+
+# Идентификатор текущего запроса; попадает в каждую строку лога
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями из extra
+RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+class LogBody:
+    """
+    A response body that is decoded and truncated only when the log line is actually written,
+    i.e. in the listener thread and only if the record passed level and sampling filters.
+    """
+
+    __slots__ = ("content", "limit")
+
+    def __init__(self, content: bytes, limit: int = None):
+        self.content = content
+        self.limit = settings.LOG_BODY_LIMIT if limit is None else limit
+
+    def __str__(self):
+        text = self.content[:self.limit].decode("utf-8", errors="replace")
+        if len(self.content) > self.limit:
+            text += f"... [{len(self.content)} bytes]"
+        return text
+
+
+def parse_sample_rates(value: str) -> dict[str, float]:
+    # "upstream.request=0.1,upstream.body=0.01" -> {"upstream.request": 0.1, "upstream.body": 0.01}
+    rates = {}
+    for part in value.split(","):
+        event, _, rate = part.partition("=")
+        if event.strip() and rate.strip():
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class RequestIdFilter(logging.Filter):
+    # Выполняется в потоке, который пишет в лог, поэтому видит contextvar запроса
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops a share of records by their "event" extra field; warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line; fields passed via extra are included as is.
+    """
+
+    def format(self, record):
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+
+    The standard prepare() formats the message on the calling thread, which is exactly the work
+    we want off the event loop. Arguments are passed by reference, so they must not be mutated
+    after the logging call (strings, numbers, LogBody and freshly built dicts are fine).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging() -> QueueListener:
+    """
+    Description:
+    ------------
+        Routes the root logger through a queue to a background listener thread writing JSON lines
+        (or plain text with LOG_FORMAT=text) to stderr. The event loop thread only runs the level,
+        request id and sampling filters and puts the record on the queue.
+
+    Returns:
+    --------
+        QueueListener:
+            The started listener; stop it on shutdown to flush pending records.
+    """
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    # Сначала сэмплирование: отброшенные записи не стоят ничего, кроме random()
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(settings.LOG_SAMPLE_RATES)))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware assigning a request id (taken from the X-Request-ID header or generated)
+    that is attached to every log record of the request and echoed in the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = (Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex)[:64]
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from bisect import bisect_left
+
+# Границы гистограмм задержек по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+
+    Metrics are updated from the event loop thread only, so plain dict updates are enough:
+    no locks are taken on the hot path.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in list(self._values.items()):
+            yield self.name, labels, "", value
+
+
+class Gauge:
+    """
+    Gauge with labels; either set explicitly or computed at scrape time by a callback.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+        self._values = {}
+
+    def set(self, value: float, labels: tuple = ()):
+        self._values[labels] = value
+
+    def samples(self):
+        values = self.callback() if self.callback is not None else self._values
+        for labels, value in list(values.items()):
+            yield self.name, labels, "", value
+
+
+class Histogram:
+    """
+    Cumulative histogram with labels. observe() is a bisect plus two additions.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [counts по корзинам..., count в +Inf, sum]
+
+    def observe(self, value: float, labels: tuple = ()):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def count(self, labels: tuple = ()) -> int:
+        state = self._values.get(labels)
+        return sum(state[:-1]) if state else 0
+
+    def samples(self):
+        for labels, state in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels, f'le="{_format_value(bound)}"', cumulative
+            yield f"{self.name}_count", labels, "", cumulative
+            yield f"{self.name}_sum", labels, "", state[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Description:
+        ------------
+            Renders all metrics in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+        --------
+            str:
+                The exposition text.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels, extra)} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+registry = Registry()
+
+# HTTP-маршруты
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+)
+HTTP_RESPONSES = registry.counter(
+    "http_responses_total", "HTTP responses by route template and status code.", ("method", "route", "status")
+)
+
+# Запросы к Kinopoisk API
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    "kinopoisk_request_duration_seconds", "Kinopoisk API request latency.", ("endpoint",)
+)
+UPSTREAM_ERRORS = registry.counter(
+    "kinopoisk_errors_total", "Failed Kinopoisk API requests by reason.", ("endpoint", "reason")
+)
+
+# Пул соединений SQLAlchemy
+DB_POOL_CHECKOUT_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the SQLAlchemy pool."
+)
+
+# Кеши
+CACHE_REQUESTS = registry.counter("cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+
+# Задержка event loop
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Delay of event loop callbacks beyond their scheduled time.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+
+
+def register_pool_metrics(pool):
+    """
+    Description:
+    ------------
+        Exposes size and utilization gauges of an SQLAlchemy QueuePool, computed at scrape time.
+
+    Parameters:
+    -----------
+        pool (QueuePool):
+            The engine's connection pool.
+    """
+    registry.gauge("db_pool_size", "Configured size of the SQLAlchemy pool.",
+                   callback=lambda: {(): pool.size()})
+    registry.gauge("db_pool_checked_out", "Connections currently checked out of the pool.",
+                   callback=lambda: {(): pool.checkedout()})
+    registry.gauge("db_pool_overflow", "Connections open beyond the pool size.",
+                   callback=lambda: {(): max(0, pool.overflow())})
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and status of every HTTP request per route template
+    (e.g. /movies/{kinopoisk_id}), so that path parameters do not explode the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "<unmatched>")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, labels)
+            HTTP_RESPONSES.inc(labels + (str(status),))
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """
+    Description:
+    ------------
+        Background task measuring how late the event loop wakes up a sleeping coroutine.
+        Lag grows when synchronous work (bcrypt, large JSON, logging) blocks the loop.
+
+    Parameters:
+    -----------
+        interval (float, optional):
+            The sampling interval in seconds. Defaults to 0.5.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
+import tempfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from app.core.config import settings
+from app.core.httpclient import LazyHttpClient
+from app.core.metrics import CACHE_REQUESTS, registry
+
+# Pillow — необязательная зависимость, без неё отдаём оригинал; импортируется только в процессах миниатюр
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+
+def make_thumbnail(source: str, target: str, width: int) -> int:
+    """
+    Description:
+    ------------
+        Resizes an image to the given width keeping the aspect ratio. Runs in a worker process.
+
+    Parameters:
+    -----------
+        source (str):
+            Path of the original image.
+        target (str):
+            Path of the thumbnail to write; written atomically via a temporary file.
+        width (int):
+            The target width in pixels; images narrower than that are not upscaled.
+
+    Returns:
+    --------
+        int:
+            The size of the written thumbnail in bytes.
+    """
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image_format = image.format
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, format=image_format)
+    os.replace(tmp_path, target)
+    return os.path.getsize(target)
+
+
+async def download_poster(client, url: str) -> tuple[bytes, str]:
+    """
+    Description:
+    ------------
+        Downloads a poster image from the CDN.
+
+    Parameters:
+    -----------
+        client (httpx.AsyncClient):
+            The poster store's client, reused across downloads.
+        url (str):
+            The poster URL from the movie details.
+
+    Returns:
+    --------
+        tuple[bytes, str]:
+            The image bytes and its media type.
+
+    Exceptions:
+    -----------
+        Raises httpx.HTTPError if the request fails or the CDN does not answer 200.
+    """
+    response = await client.get(url)
+    response.raise_for_status()
+    return response.content, response.headers.get("content-type", "image/jpeg").split(";")[0]
+
+
+class PosterStore:
+    """
+    Content-addressed on-disk cache of posters and their thumbnails.
+
+    Originals are stored under the sha256 of their bytes, so the same image reachable from several
+    URLs is kept once; thumbnails sit next to them as "<digest>.w<width>". Files are evicted in
+    least-recently-used order once their total size exceeds max_bytes, except files pinned by
+    original()/thumbnail() until release().
+
+    The index and max_bytes are per process: with several workers sharing the directory each one
+    enforces the cap for the files it knows, so the directory may grow to workers × max_bytes, and a
+    worker may delete a file another one has just looked up; such a file is downloaded again.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = Path(root or settings.POSTER_CACHE_DIR)
+        self.max_bytes = max_bytes or settings.POSTER_CACHE_MAX_BYTES
+        self._files = None  # OrderedDict[Path, int] в порядке последнего обращения
+        self._total = 0
+        self._pinned = Counter()  # файлы, которые сейчас отдаются или читаются: их нельзя вытеснять
+        self._inflight = {}
+        self._executor = None
+        self.http = LazyHttpClient(timeout=settings.POSTER_FETCH_TIMEOUT, follow_redirects=True)
+
+    # Индекс файлов строится лениво, при первом обращении, обходом каталога в потоке
+    async def _index(self) -> OrderedDict:
+        if self._files is None:
+            files = await asyncio.to_thread(self._scan)
+            if self._files is None:
+                self._files = files
+                self._total = sum(files.values())
+        return self._files
+
+    def _scan(self) -> OrderedDict:
+        files = []
+        for path in self.root.glob("??/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Файл вытеснил другой воркер во время обхода
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return OrderedDict((path, size) for _, path, size in sorted(files))
+
+    async def _touch(self, path: Path):
+        # mtime сохраняет порядок LRU между перезапусками; FileNotFoundError — файла уже нет на диске
+        files = await self._index()
+        try:
+            await asyncio.to_thread(os.utime, path)
+        except FileNotFoundError:
+            self._total -= files.pop(path, 0)
+            raise
+        if path in files:
+            files.move_to_end(path)
+
+    def _pin(self, path: Path):
+        self._pinned[path] += 1
+
+    def release(self, path: Path):
+        """
+        Description:
+        ------------
+            Allows a path returned by original() or thumbnail() to be evicted again.
+
+        Parameters:
+        -----------
+            path (Path):
+                The path, once the response streaming it has been sent.
+        """
+        self._pinned[path] -= 1
+        if self._pinned[path] <= 0:
+            del self._pinned[path]
+
+    async def _add(self, path: Path, size: int):
+        files = await self._index()
+        self._total += size - files.get(path, 0)
+        files[path] = size
+        files.move_to_end(path)
+        evicted = []
+        for old_path in list(files):
+            if self._total <= self.max_bytes:
+                break
+            if old_path == path or old_path in self._pinned:
+                continue
+            self._total -= files.pop(old_path)
+            evicted.append(old_path)
+        if evicted:
+            await asyncio.to_thread(self._unlink, evicted)
+
+    @staticmethod
+    def _unlink(paths: list[Path]):
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    def _url_index_path(self, url: str) -> Path:
+        return self.root / "urls" / hashlib.sha1(url.encode()).hexdigest()
+
+    def _object_path(self, digest: str, width: int = None) -> Path:
+        name = digest if width is None else f"{digest}.w{width}"
+        return self.root / digest[:2] / name
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _lookup(self, url: str) -> tuple[str, str] | None:
+        # Читает индекс URL с диска, вызывается в потоке
+        index_path = self._url_index_path(url)
+        try:
+            digest, media_type = index_path.read_text().split()
+        except (FileNotFoundError, ValueError):
+            return None
+        if not self._object_path(digest).exists():
+            return None
+        return digest, media_type
+
+    def _store(self, url: str, data: bytes, digest: str, media_type: str):
+        path = self._object_path(digest)
+        if not path.exists():
+            self._write(path, data)
+        self._write(self._url_index_path(url), f"{digest} {media_type}".encode())
+
+    async def _fetch(self, url: str) -> tuple[str, str]:
+        data, media_type = await download_poster(self.http.get(), url)
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._store, url, data, digest, media_type)
+        await self._add(self._object_path(digest), len(data))
+        return digest, media_type
+
+    async def _render(self, source: Path, path: Path, width: int):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.POSTER_WORKERS)
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(self._executor, make_thumbnail, str(source), str(path), width)
+        await self._add(path, size)
+
+    async def _once(self, key, factory):
+        # Одновременные запросы одного и того же объекта ждут одну задачу
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def original(self, url: str) -> tuple[Path, str, str]:
+        """
+        Description:
+        ------------
+            Returns the cached original of a poster, downloading it on the first request.
+            Concurrent requests for the same URL share one download.
+
+        Parameters:
+        -----------
+            url (str):
+                The poster URL.
+
+        Returns:
+        --------
+            tuple[Path, str, str]:
+                The file path, the content digest and the media type. The path is not evicted until
+                it is passed to release().
+
+        Notes:
+        ------
+            If the file disappears before it is pinned (evicted by another worker), it is downloaded again.
+        """
+        for _ in range(2):
+            found = await asyncio.to_thread(self._lookup, url)
+            CACHE_REQUESTS.inc(("poster", "miss" if found is None else "hit"))
+            if found is None:
+                found = await self._once(url, lambda: self._fetch(url))
+            digest, media_type = found
+            path = self._object_path(digest)
+            self._pin(path)
+            try:
+                await self._touch(path)
+            except FileNotFoundError:
+                self.release(path)
+                continue
+            return path, digest, media_type
+        raise FileNotFoundError(path)
+
+    async def thumbnail(self, url: str, width: int) -> tuple[Path, str, str]:
+        """
+        Description:
+        ------------
+            Returns a poster resized to the given width, generating it in the process pool on first use.
+            Concurrent requests for the same thumbnail share one process pool job.
+
+        Parameters:
+        -----------
+            url (str):
+                The poster URL.
+            width (int):
+                One of settings.POSTER_WIDTHS.
+
+        Returns:
+        --------
+            tuple[Path, str, str]:
+                The file path, an ETag-friendly version string and the media type. The path is not
+                evicted until it is passed to release().
+        """
+        source, digest, media_type = await self.original(url)
+        if not PILLOW_AVAILABLE:
+            return source, digest, media_type
+
+        path = self._object_path(digest, width)
+        self._pin(path)
+        try:
+            try:
+                await self._touch(path)
+            except FileNotFoundError:
+                await self._once(path, lambda: self._render(source, path, width))
+        except BaseException:
+            self.release(path)
+            raise
+        finally:
+            # Оригинал нужен только на время генерации миниатюры
+            self.release(source)
+        return path, f"{digest}.w{width}", media_type
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        await self.http.close()
+
+
+def snap_width(width: int) -> int:
+    # Ширина округляется вверх до одной из разрешённых, чтобы не плодить миниатюры
+    for allowed in settings.POSTER_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return settings.POSTER_WIDTHS[-1]
+
+
+poster_store = PosterStore()
+
+registry.gauge("poster_cache_bytes", "Bytes held by the poster disk cache (known after the first request).",
+               callback=lambda: {(): poster_store._total})
@@ -0,0 +1,300 @@
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+import orjson
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from app.api.dependencies import get_admin_user, get_current_user
+from app.core.config import settings
+
+# Форматы профиля: speedscope (https://www.speedscope.app) и collapsed stacks (flamegraph.pl, speedscope)
+PROFILE_FORMATS = {"speedscope": ".speedscope.json", "collapsed": ".collapsed"}
+PROFILE_NAME_RE = re.compile(r"^[\w-][\w.-]*$")
+
+
+def _frame_key(frame) -> tuple[str, str, int]:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def capture_stack(frame) -> tuple:
+    # Стек от корня к листу; функция идентифицируется по имени, файлу и первой строке
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class StackSampler:
+    """
+    Statistical profiler sampling the Python stack of one thread from a background thread.
+
+    Unlike cProfile it does not hook every call, so the profiled code runs at nearly full speed and
+    the cost is bounded by the sampling rate. With asyncio only the event loop thread is sampled,
+    which means work of concurrent requests handled by the same loop shows up in the profile too.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = capture_stack(frame)
+            del frame
+            with self._lock:
+                self.stacks[stack] += 1
+
+    def take(self) -> Counter:
+        # Забираем накопленные стеки и начинаем новый период
+        with self._lock:
+            stacks, self.stacks = self.stacks, Counter()
+        return stacks
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.take()
+
+
+def to_collapsed(stacks: Counter) -> bytes:
+    """
+    Description:
+    ------------
+        Renders sampled stacks in the collapsed format ("root;child;leaf count" per line).
+
+    Parameters:
+    -----------
+        stacks (Counter):
+            Sample counts keyed by stack tuples from capture_stack().
+
+    Returns:
+    --------
+        bytes:
+            The profile, readable by flamegraph.pl and speedscope.
+    """
+    lines = []
+    for stack, count in stacks.most_common():
+        names = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+        lines.append(f"{names} {count}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def to_speedscope(stacks: Counter, name: str, interval: float) -> bytes:
+    """
+    Description:
+    ------------
+        Renders sampled stacks as a speedscope "sampled" profile.
+
+    Parameters:
+    -----------
+        stacks (Counter):
+            Sample counts keyed by stack tuples from capture_stack().
+        name (str):
+            The profile name shown by speedscope.
+        interval (float):
+            The sampling interval in seconds, used as the weight of one sample.
+
+    Returns:
+    --------
+        bytes:
+            The profile as speedscope JSON.
+    """
+    frames, frame_index, samples, weights = [], {}, [], []
+    for stack, count in stacks.most_common():
+        indices = []
+        for key in stack:
+            index = frame_index.get(key)
+            if index is None:
+                index = frame_index[key] = len(frames)
+                frames.append({"name": key[0], "file": key[1], "line": key[2]})
+            indices.append(index)
+        samples.append(indices)
+        weights.append(count * interval)
+
+    return orjson.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "movie-favorite-api",
+    })
+
+
+def render_profile(stacks: Counter, profile_format: str, name: str, interval: float) -> bytes:
+    if profile_format == "collapsed":
+        return to_collapsed(stacks)
+    return to_speedscope(stacks, name, interval)
+
+
+def save_profile(name: str, data: bytes) -> Path:
+    """
+    Description:
+    ------------
+        Writes a profile to PROFILING_DIR, removing the oldest files beyond PROFILING_MAX_FILES.
+
+    Parameters:
+    -----------
+        name (str):
+            The file name, including the format extension.
+        data (bytes):
+            The rendered profile.
+
+    Returns:
+    --------
+        Path:
+            The path of the written file.
+    """
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(data)
+
+    files = sorted(directory.iterdir(), key=lambda file: file.stat().st_mtime)
+    for old_path in files[:max(0, len(files) - settings.PROFILING_MAX_FILES)]:
+        old_path.unlink(missing_ok=True)
+    return path
+
+
+def list_profiles() -> list[str]:
+    directory = Path(settings.PROFILING_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted((path.name for path in directory.iterdir()), reverse=True)
+
+
+def profile_path(name: str) -> Path | None:
+    # Имя проверяется, чтобы нельзя было выйти за пределы каталога профилей
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = Path(settings.PROFILING_DIR) / name
+    return path if path.is_file() else None
+
+
+async def is_admin_token(authorization: str | None) -> bool:
+    # Те же проверки, что у маршрутов администратора, включая отзыв токена через /logout
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        get_admin_user(await get_current_user(token))
+    except Exception:
+        # HTTPException для отозванных и чужих токенов, Exception от decode_access_token для невалидных
+        return False
+    return True
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running a single request under the stack sampler on demand.
+
+    A request is profiled when it carries the "X-Profile" header (or the "_profile" query parameter)
+    and a bearer token of a user listed in ADMIN_USER_IDS. The value selects the format: "speedscope"
+    (default) or "collapsed". The profile is saved to PROFILING_DIR and its name is returned in the
+    "X-Profile-Id" response header; download it from /admin/profiles/{name}. Only one request is
+    profiled at a time, others run normally.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        requested = headers.get("x-profile")
+        if requested is None and b"_profile" in scope.get("query_string", b""):
+            requested = QueryParams(scope["query_string"]).get("_profile")
+        if requested is None or not await is_admin_token(headers.get("authorization")):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_format = requested if requested in PROFILE_FORMATS else "speedscope"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}{PROFILE_FORMATS[profile_format]}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])["X-Profile-Id"] = name
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL).start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            self._busy.release()
+            title = f"{scope['method']} {scope['path']}"
+            save_profile(name, render_profile(stacks, profile_format, title, settings.PROFILING_INTERVAL))
+
+
+class ContinuousProfiler:
+    """
+    Always-on low-rate sampling of the event loop thread.
+
+    Samples are aggregated in memory and written to PROFILING_DIR as a collapsed profile every
+    dump_interval seconds, so a slow period can be inspected after the fact.
+    """
+
+    def __init__(self, interval: float = None, dump_interval: float = None):
+        self.interval = interval or settings.PROFILING_SAMPLE_INTERVAL
+        self.dump_interval = dump_interval or settings.PROFILING_DUMP_INTERVAL
+        self._sampler = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id: int = None) -> "ContinuousProfiler":
+        self._sampler = StackSampler(thread_id or threading.get_ident(), self.interval).start()
+        self._thread = threading.Thread(target=self._run, name="profile-dumper", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.dump_interval):
+            self.dump()
+
+    def dump(self, stacks: Counter = None) -> Path | None:
+        if stacks is None:
+            stacks = self._sampler.take()
+        if not stacks:
+            return None
+        return save_profile(f"continuous-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.collapsed",
+                            to_collapsed(stacks))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.dump(self._sampler.stop())
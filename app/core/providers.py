@@ -0,0 +1,307 @@
+import abc
+import asyncio
+import mmap
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlencode
+import orjson
+from app.core.config import settings
+from app.core.httpclient import LazyHttpClient
+
+# Пути Kinopoisk API относительно KINOPOISK_API_URL
+SEARCH_PATH = "/api/v2.1/films/search-by-keyword"
+FILM_PATH = "/api/v2.2/films/{kinopoisk_id}"
+FILM_PATH_RE = re.compile(r"^/api/v2\.2/films/(\d+)$")
+COLLECTIONS_PATH = "/api/v2.2/films/collections"
+COLLECTION_PAGE_SIZE = 20
+
+
+class ProviderError(Exception):
+    """
+    The upstream did not return a payload.
+
+    Attributes:
+    -----------
+        reason (str):
+            A short label for metrics, e.g. "status_404" or "replay_miss".
+        status (int | None):
+            The upstream HTTP status, if there was a response.
+        body (bytes):
+            The response body, if any.
+    """
+
+    def __init__(self, reason: str, status: int = None, body: bytes = b""):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.body = body
+
+
+def request_key(path: str, params: dict = None) -> str:
+    # Ключ запроса не зависит от порядка параметров
+    if not params:
+        return path
+    return f"{path}?{urlencode(sorted(params.items()))}"
+
+
+class MovieProvider(abc.ABC):
+    """
+    Source of Kinopoisk API payloads. fetch() returns the raw JSON body of a successful response
+    and raises ProviderError otherwise; routes never see how the payload was obtained.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def fetch(self, path: str, params: dict = None) -> bytes:
+        ...
+
+    async def close(self):
+        pass
+
+
+class HttpProvider(MovieProvider):
+    """
+    The live Kinopoisk API over HTTP.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = None, api_key: str = None):
+        self.base_url = (base_url or settings.KINOPOISK_API_URL).rstrip("/")
+        self.api_key = api_key or settings.KINOPOISK_API_KEY
+        # Один клиент на источник: запросы к API переиспользуют соединения из пула
+        self.http = LazyHttpClient()
+
+    async def fetch(self, path: str, params: dict = None) -> bytes:
+        headers = {
+            "X-API-KEY": self.api_key,
+            "Content-Type": "application/json"
+        }
+        response = await self.http.get().get(f"{self.base_url}{path}", params=params, headers=headers)
+        if response.status_code != 200:
+            raise ProviderError(f"status_{response.status_code}", response.status_code, response.content)
+        return response.content
+
+    async def close(self):
+        await self.http.close()
+
+
+class FixtureStore:
+    """
+    Read-only store of recorded responses: bodies are concatenated in "responses.bin", which is
+    memory-mapped, and "index.json" maps a request key to [offset, length, status]. A lookup is a
+    dict access plus a slice of the mapping, without reading the whole file into memory.
+    """
+
+    DATA_FILE = "responses.bin"
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.index = orjson.loads((self.directory / self.INDEX_FILE).read_bytes())
+        self._file = open(self.directory / self.DATA_FILE, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def get(self, key: str) -> tuple[int, bytes] | None:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, status = entry
+        return status, self._map[offset:offset + length]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+class FixtureWriter:
+    """
+    Appends responses in the FixtureStore format; the index is written on flush().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / FixtureStore.INDEX_FILE
+        self.index = orjson.loads(index_path.read_bytes()) if index_path.exists() else {}
+        self._file = open(self.directory / FixtureStore.DATA_FILE, "ab")
+
+    def add(self, key: str, status: int, body: bytes):
+        offset = self._file.tell()
+        self._file.write(body)
+        self.index[key] = [offset, len(body), status]
+
+    def flush(self):
+        self._file.flush()
+        tmp_path = self.directory / f"{FixtureStore.INDEX_FILE}.tmp"
+        tmp_path.write_bytes(orjson.dumps(self.index, option=orjson.OPT_SORT_KEYS))
+        os.replace(tmp_path, self.directory / FixtureStore.INDEX_FILE)
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class RecordingProvider(MovieProvider):
+    """
+    Passes requests to another provider and records every response, including errors, to a fixture directory.
+    """
+
+    name = "record"
+
+    def __init__(self, inner: MovieProvider, directory: str):
+        self.inner = inner
+        self.writer = FixtureWriter(directory)
+
+    async def fetch(self, path: str, params: dict = None) -> bytes:
+        key = request_key(path, params)
+        try:
+            body = await self.inner.fetch(path, params)
+        except ProviderError as e:
+            if e.status is not None:
+                self.writer.add(key, e.status, e.body)
+            raise
+        self.writer.add(key, 200, body)
+        return body
+
+    async def close(self):
+        self.writer.close()
+        await self.inner.close()
+
+
+class ReplayProvider(MovieProvider):
+    """
+    Serves recorded responses with a fixed, deterministic latency; unknown requests fail with "replay_miss".
+    """
+
+    name = "replay"
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.store = FixtureStore(directory)
+        self.latency = latency
+
+    async def fetch(self, path: str, params: dict = None) -> bytes:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        found = self.store.get(request_key(path, params))
+        if found is None:
+            raise ProviderError("replay_miss")
+        status, body = found
+        if status != 200:
+            raise ProviderError(f"status_{status}", status, body)
+        return body
+
+    async def close(self):
+        self.store.close()
+
+
+class FakeProvider(MovieProvider):
+    """
+    In-memory Kinopoisk API: films are kept as film detail payloads, search matches nameRu by substring
+    and every collection lists all films.
+    """
+
+    name = "fake"
+
+    def __init__(self, films: list[dict] = None, latency: float = 0.0):
+        self.films = {film["kinopoiskId"]: film for film in films or []}
+        self.latency = latency
+
+    def add(self, film: dict):
+        self.films[film["kinopoiskId"]] = film
+
+    async def fetch(self, path: str, params: dict = None) -> bytes:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        match = FILM_PATH_RE.match(path)
+        if match is not None:
+            film = self.films.get(int(match.group(1)))
+            if film is None:
+                raise ProviderError("status_404", 404)
+            return orjson.dumps(film)
+
+        if path == COLLECTIONS_PATH:
+            # Подборка — все фильмы по возрастанию id, страницами по COLLECTION_PAGE_SIZE
+            films = [self.films[kinopoisk_id] for kinopoisk_id in sorted(self.films)]
+            page = int((params or {}).get("page", 1))
+            total_pages = max(1, -(-len(films) // COLLECTION_PAGE_SIZE))
+            items = films[(page - 1) * COLLECTION_PAGE_SIZE:page * COLLECTION_PAGE_SIZE]
+            return orjson.dumps({"total": len(films), "totalPages": total_pages, "items": items})
+
+        if path == SEARCH_PATH:
+            keyword = (params or {}).get("keyword", "").casefold()
+            films = [
+                {
+                    "filmId": film["kinopoiskId"],
+                    "nameRu": film.get("nameRu"),
+                    "year": film.get("year"),
+                    "description": film.get("description"),
+                    "rating": film.get("ratingKinopoisk"),
+                    "posterUrl": film.get("posterUrl"),
+                }
+                for film in self.films.values() if keyword in (film.get("nameRu") or "").casefold()
+            ]
+            return orjson.dumps({"keyword": keyword, "pagesCount": 1, "films": films})
+
+        raise ProviderError("status_404", 404)
+
+
+def create_provider(kind: str = None) -> MovieProvider:
+    """
+    Description:
+    ------------
+        Builds the provider selected by the KINOPOISK_PROVIDER setting.
+
+    Parameters:
+    -----------
+        kind (str, optional):
+            "http" (default), "record" (http, recording to KINOPOISK_FIXTURES_DIR), "replay"
+            (from KINOPOISK_FIXTURES_DIR with KINOPOISK_REPLAY_LATENCY) or "fake" (empty in-memory).
+
+    Returns:
+    --------
+        MovieProvider:
+            The provider.
+
+    Exceptions:
+    -----------
+        Raises ValueError for an unknown kind.
+    """
+    kind = kind or settings.KINOPOISK_PROVIDER
+    if kind == "http":
+        return HttpProvider()
+    if kind == "record":
+        return RecordingProvider(HttpProvider(), settings.KINOPOISK_FIXTURES_DIR)
+    if kind == "replay":
+        return ReplayProvider(settings.KINOPOISK_FIXTURES_DIR, settings.KINOPOISK_REPLAY_LATENCY)
+    if kind == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown KINOPOISK_PROVIDER: {kind}")
+
+
+_provider = None
+
+
+def get_provider() -> MovieProvider:
+    # Провайдер создаётся при первом запросе, чтобы импорт не требовал фикстур
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider: MovieProvider | None):
+    global _provider
+    _provider = provider
+
+
+async def close_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
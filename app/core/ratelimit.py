@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from app.core.cache import SHARED_ERRORS
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.resp import RespClient
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.counter("rate_limited_requests_total", "Requests rejected by the per-user rate limit.")
+UPSTREAM_QUEUE_WAIT = registry.histogram(
+    "upstream_queue_wait_seconds", "Time Kinopoisk API requests waited for a free upstream slot.")
+
+# От чьего имени идёт запрос к Kinopoisk API: id пользователя или "background" для фоновых задач
+upstream_caller: ContextVar[str] = ContextVar("upstream_caller", default="background")
+
+
+class GcraLimiter:
+    """
+    Generic cell rate algorithm: per key, allows `rate` requests per second on average with bursts of
+    up to `burst` requests. Only the theoretical arrival time is stored per key.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        self.interval = 1 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.max_keys = max_keys
+        self._tat = {}
+
+    def check(self, key: str) -> float:
+        # 0 — запрос разрешён, иначе через сколько секунд можно повторить
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now)
+        if tat - now > self.tolerance:
+            return tat - now - self.tolerance
+        self._tat[key] = tat + self.interval
+        if len(self._tat) > self.max_keys:
+            # Ключи, чей лимит уже полностью восстановился, ничего не хранят
+            self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        return 0.0
+
+    def clear(self):
+        self._tat.clear()
+
+
+class SharedWindowLimiter:
+    """
+    Sliding window counter in a Redis-protocol backend, shared by all workers: at most `burst` requests
+    per key within any burst / rate seconds, estimated from the counts of the current and previous
+    fixed windows (INCR, DECR and PEXPIRE only, so it works with Redis and the built-in RespServer).
+    As with GcraLimiter, rejected requests are not counted: a client retrying too early does not push
+    back its own next allowed request.
+    """
+
+    def __init__(self, client: RespClient, rate: float, burst: int):
+        self.client = client
+        self.window = burst / rate
+        self.limit = burst
+
+    async def check(self, key: str) -> float:
+        now = time.time() / self.window
+        window = int(now)
+        elapsed = now - window
+        current_key = f"ratelimit:{key}:{window}"
+        current = await self.client.incr(current_key)
+        if current == 1:
+            await self.client.pexpire(current_key, int(self.window * 2000))
+        previous = int(await self.client.get(f"ratelimit:{key}:{window - 1}") or 0)
+        if previous * (1 - elapsed) + current <= self.limit:
+            return 0.0
+        # Отклонённый запрос не расходует лимит
+        await self.client.decr(current_key)
+        if current > self.limit or not previous:
+            return (1 - elapsed) * self.window
+        # Когда вклад предыдущего окна уменьшится настолько, что запрос поместится в лимит
+        return max(0.0, 1 - (self.limit - current) / previous - elapsed) * self.window
+
+
+class RateLimiter:
+    """
+    Per-user request rate limit: the shared limiter if a backend is configured, the in-process GCRA
+    otherwise. If the backend is unreachable the local limiter is used for SHARED_RETRY_INTERVAL seconds.
+    """
+
+    SHARED_RETRY_INTERVAL = 5.0
+
+    def __init__(self, rate: float, burst: int, shared: RespClient = None):
+        self.enabled = rate > 0
+        self.local = GcraLimiter(rate, burst) if self.enabled else None
+        self.shared = SharedWindowLimiter(shared, rate, burst) if shared is not None and self.enabled else None
+        self._shared_down_until = 0.0
+
+    async def check(self, key: str) -> float:
+        """
+        Description:
+        ------------
+            Counts a request of the key against its limit.
+
+        Parameters:
+        -----------
+            key (str):
+                The caller, e.g. the user id from the JWT.
+
+        Returns:
+        --------
+            float:
+                0 if the request is allowed, otherwise the number of seconds to wait before retrying.
+        """
+        if not self.enabled:
+            return 0.0
+        if self.shared is not None and time.monotonic() >= self._shared_down_until:
+            try:
+                return await self.shared.check(key)
+            except SHARED_ERRORS as e:
+                self._shared_down_until = time.monotonic() + self.SHARED_RETRY_INTERVAL
+                logger.warning("Shared rate limit backend unavailable: %r", e, extra={"event": "ratelimit.shared_error"})
+        return self.local.check(key)
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+
+
+class FairScheduler:
+    """
+    Limits concurrent upstream requests and hands free slots to waiting callers in round-robin order.
+
+    Each caller has its own queue; when a slot frees up, the caller at the head of the rotation gets it
+    and moves to the back. A user with many requests in flight therefore waits behind every other user
+    with a request pending, instead of everyone waiting behind their backlog.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.active = 0
+        self._queues = OrderedDict()  # caller -> deque ожидающих Future
+
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._queues.values())
+
+    async def acquire(self, key: str):
+        if self.active < self.concurrency and not self._queues:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже был передан этому запросу: отдаём его следующему
+                self.release()
+            else:
+                self._discard(key, future)
+            raise
+
+    def _discard(self, key: str, future: asyncio.Future):
+        waiters = self._queues.get(key)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._queues[key]
+
+    def release(self):
+        while self._queues:
+            key, waiters = next(iter(self._queues.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not future.done():
+                # Слот переходит к ожидающему, число занятых не меняется
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: str = None):
+        start = time.perf_counter()
+        await self.acquire(key or upstream_caller.get())
+        UPSTREAM_QUEUE_WAIT.observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Лимит запросов пользователя к маршрутам, обращающимся к Kinopoisk API, и очередь к самому API
+rate_limiter = RateLimiter(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST,
+                           RespClient(settings.RATE_LIMIT_BACKEND_URL) if settings.RATE_LIMIT_BACKEND_URL else None)
+upstream_scheduler = FairScheduler(settings.UPSTREAM_CONCURRENCY)
+
+registry.gauge("upstream_queue_waiting", "Kinopoisk API requests waiting for a free upstream slot.",
+               callback=lambda: {(): upstream_scheduler.waiting()})
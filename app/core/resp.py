@@ -0,0 +1,258 @@
+"""
+Minimal Redis protocol (RESP2) client and an in-memory stand-in server.
+
+The client is enough for a shared cache (GET, SET with PX, DEL, PING); the server speaks the same
+subset so that tests and local multi-worker runs do not need a Redis installation:
+
+    python -m app.core.resp --port 6390
+"""
+import argparse
+import asyncio
+import sys
+import time
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    pass
+
+
+def encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RespError(f"Unexpected reply: {line!r}")
+
+
+class RespClient:
+    """
+    Asyncio client with a small pool of connections per event loop.
+
+    Parameters:
+    -----------
+        url (str):
+            redis://host:port/db
+        max_idle (int, optional):
+            Idle connections kept for reuse. Defaults to 16.
+        timeout (float, optional):
+            Connect and command timeout in seconds. Defaults to 1.0.
+    """
+
+    def __init__(self, url: str, max_idle: int = 16, timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+
+    async def _connect(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        if self.db:
+            writer.write(encode_command("SELECT", self.db))
+            await read_reply(reader)
+        return asyncio.get_running_loop(), reader, writer
+
+    async def execute(self, *args):
+        """
+        Description:
+        ------------
+            Sends one command and returns the decoded reply.
+
+        Exceptions:
+        -----------
+            Raises RespError for error replies, OSError/ConnectionError/TimeoutError on network failures.
+        """
+        loop = asyncio.get_running_loop()
+        connection = None
+        while self._idle and connection is None:
+            candidate = self._idle.pop()
+            # Соединение привязано к event loop, в котором было открыто
+            if candidate[0] is loop and not candidate[2].is_closing():
+                connection = candidate
+            else:
+                candidate[2].close()
+        if connection is None:
+            connection = await self._connect()
+
+        _, reader, writer = connection
+        try:
+            writer.write(encode_command(*args))
+            reply = await asyncio.wait_for(read_reply(reader), self.timeout)
+        except RespError:
+            self._release(connection)
+            raise
+        except BaseException:
+            writer.close()
+            raise
+        self._release(connection)
+        return reply
+
+    def _release(self, connection):
+        if len(self._idle) < self.max_idle:
+            self._idle.append(connection)
+        else:
+            connection[2].close()
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl_ms: int = None):
+        if ttl_ms:
+            return await self.execute("SET", key, value, "PX", max(1, int(ttl_ms)))
+        return await self.execute("SET", key, value)
+
+    async def delete(self, key: str) -> int:
+        return await self.execute("DEL", key)
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+    async def decr(self, key: str) -> int:
+        return await self.execute("DECR", key)
+
+    async def pexpire(self, key: str, ttl_ms: int) -> int:
+        return await self.execute("PEXPIRE", key, max(1, int(ttl_ms)))
+
+    def close(self):
+        for _, _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class RespServer:
+    """
+    In-memory stand-in for Redis: GET, SET [EX|PX], DEL, EXISTS, INCR, DECR, PEXPIRE, PING, SELECT, DBSIZE,
+    FLUSHDB/FLUSHALL.
+    Expired keys are dropped on access.
+    """
+
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at | None)
+        self._server = None
+        self._clients = set()
+
+    def _get(self, key: bytes):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def handle(self, args: list[bytes]) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command == b"GET":
+            value = self._get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires_at = None
+            if len(args) >= 5:
+                unit = args[3].upper()
+                amount = int(args[4])
+                expires_at = time.monotonic() + (amount / 1000 if unit == b"PX" else amount)
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        if command in (b"INCR", b"DECR"):
+            value = self._get(args[1])
+            try:
+                number = int(value or 0) + (1 if command == b"INCR" else -1)
+            except ValueError:
+                return b"-ERR value is not an integer or out of range\r\n"
+            # Как в Redis, INCR и DECR не меняют срок жизни ключа
+            expires_at = self.data[args[1]][1] if value is not None else None
+            self.data[args[1]] = (b"%d" % number, expires_at)
+            return b":%d\r\n" % number
+        if command == b"PEXPIRE":
+            if self._get(args[1]) is None:
+                return b":0\r\n"
+            self.data[args[1]] = (self.data[args[1]][0], time.monotonic() + int(args[2]) / 1000)
+            return b":1\r\n"
+        if command == b"EXISTS":
+            return b":%d\r\n" % sum(self._get(key) is not None for key in args[1:])
+        if command == b"DBSIZE":
+            return b":%d\r\n" % len(self.data)
+        if command in (b"FLUSHDB", b"FLUSHALL"):
+            self.data.clear()
+            return b"+OK\r\n"
+        if command == b"SELECT":
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                args = await read_reply(reader)
+                writer.write(self.handle(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._serve_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        # Открытые соединения клиентов закрываются вместе с сервером, а не при остановке event loop
+        for task in list(self._clients):
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        await self._server.wait_closed()
+
+
+async def serve(host: str, port: int):
+    server = RespServer()
+    port = await server.start(host, port)
+    print(f"RESP stand-in listening on {host}:{port}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args(sys.argv[1:])
+    asyncio.run(serve(args.host, args.port))
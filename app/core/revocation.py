@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.crud import get_revoked_jtis, is_token_revoked
+from app.db.session import get_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+DENYLIST_CHECKS = registry.counter(
+    "token_denylist_checks_total", "Token revocation checks by result.", ("result",))
+
+
+class BloomFilter:
+    """
+    Set membership with false positives but no false negatives, in a fixed bit array.
+
+    Parameters:
+    -----------
+        capacity (int):
+            The number of items the filter is sized for.
+        error_rate (float):
+            The false positive rate at capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Двойное хеширование: k позиций из двух половин одного дайджеста
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenDenylist:
+    """
+    Revoked token ids (jti): an in-memory bloom filter in front of the revoked_tokens table.
+
+    A token whose jti is not in the filter is valid without any I/O. A filter hit is confirmed with
+    the table once and the answer is remembered, so false positives cost one query per jti.
+    Every worker rebuilds the filter from the table on startup and every TOKEN_DENYLIST_REBUILD_INTERVAL
+    seconds (dropping expired tokens), and adds the tokens revoked by other workers every
+    TOKEN_DENYLIST_SYNC_INTERVAL seconds; a token revoked by another worker may therefore be accepted
+    for up to that long.
+    """
+
+    def __init__(self, capacity: int = None, error_rate: float = None, max_confirmed: int = 10000):
+        self.capacity = capacity or settings.TOKEN_DENYLIST_CAPACITY
+        self.error_rate = error_rate or settings.TOKEN_DENYLIST_ERROR_RATE
+        self.max_confirmed = max_confirmed
+        self.filter = BloomFilter(self.capacity, self.error_rate)
+        self.confirmed = OrderedDict()  # jti -> отозван ли, по ответам таблицы
+        self.synced_until = None  # revoked_at последней загруженной строки
+
+    def add(self, jti: str):
+        self.filter.add(jti)
+        self._remember(jti, True)
+
+    def _remember(self, jti: str, revoked: bool):
+        self.confirmed[jti] = revoked
+        self.confirmed.move_to_end(jti)
+        if len(self.confirmed) > self.max_confirmed:
+            self.confirmed.popitem(last=False)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """
+        Description:
+        ------------
+            Checks whether a token id has been revoked.
+
+        Parameters:
+        -----------
+            jti (str):
+                The token's jti claim.
+
+        Returns:
+        --------
+            bool:
+                True if the token is revoked. Only filter hits not seen before query the database.
+        """
+        if jti not in self.filter:
+            DENYLIST_CHECKS.inc(("miss",))
+            return False
+        revoked = self.confirmed.get(jti)
+        if revoked is None:
+            DENYLIST_CHECKS.inc(("confirm",))
+            async with get_sessionmaker()() as db:
+                revoked = await is_token_revoked(db, jti)
+            self._remember(jti, revoked)
+        else:
+            DENYLIST_CHECKS.inc(("hit",))
+        return revoked
+
+    async def sync(self, full: bool = False) -> int:
+        """
+        Description:
+        ------------
+            Loads the tokens revoked since the last sync into the filter, or rebuilds it if full.
+
+        Parameters:
+        -----------
+            full (bool, optional):
+                Rebuild the filter from all unexpired revoked tokens. Default is False.
+
+        Returns:
+        --------
+            int:
+                The number of rows loaded.
+        """
+        # Окно перекрытия на случай расхождения часов воркеров; повторное добавление безвредно
+        since = None if full or self.synced_until is None else self.synced_until - timedelta(seconds=5)
+        async with get_sessionmaker()() as db:
+            rows = await get_revoked_jtis(db, since)
+        if full or self.synced_until is None:
+            denylist = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+            # Отозванные на этом воркере во время запроса к таблице не должны потеряться
+            for jti, revoked in self.confirmed.items():
+                if revoked:
+                    denylist.add(jti)
+            self.filter = denylist
+        for jti, _ in rows:
+            self.add(jti)
+        if rows:
+            self.synced_until = max(self.synced_until or datetime.min, max(revoked_at for _, revoked_at in rows))
+        elif self.synced_until is None:
+            self.synced_until = datetime.utcnow()
+        return len(rows)
+
+    async def refresh(self, full: bool = False) -> bool:
+        started = time.monotonic()
+        try:
+            rows = await self.sync(full)
+        except Exception as e:
+            logger.warning("Token denylist sync failed: %r", e, extra={"event": "denylist.sync_error"})
+            return False
+        if full:
+            logger.info("Token denylist rebuilt with %s tokens in %.3f s", rows, time.monotonic() - started,
+                        extra={"event": "denylist.rebuild"})
+        return True
+
+    async def run(self, interval: float = None, rebuild_interval: float = None):
+        interval = interval or settings.TOKEN_DENYLIST_SYNC_INTERVAL
+        rebuild_interval = rebuild_interval or settings.TOKEN_DENYLIST_REBUILD_INTERVAL
+        last_rebuild = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            full = time.monotonic() - last_rebuild >= rebuild_interval
+            if await self.refresh(full) and full:
+                last_rebuild = time.monotonic()
+
+
+# Отозванные токены; фильтр строится при старте приложения
+token_denylist = TokenDenylist()
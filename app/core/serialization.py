@@ -0,0 +1,161 @@
+from functools import lru_cache
+from typing import Any, Callable
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+from schemas import Movie, MovieDetail, KinopoiskCollectionPage, KinopoiskSearchPage, KinopoiskFilmDetail
+
+
+# Строка избранного в виде словаря, как её возвращает выборка колонок из crud
+class FavoriteRow(TypedDict):
+    kinopoisk_id: int
+    title: str
+    year: int
+
+
+# Предкомпилированные сериализаторы pydantic-core для горячих эндпойнтов
+movie_list_adapter = TypeAdapter(list[Movie])
+movie_detail_adapter = TypeAdapter(MovieDetail)
+favorite_list_adapter = TypeAdapter(list[FavoriteRow])
+
+# Предкомпилированные валидаторы ответов Kinopoisk API
+search_page_adapter = TypeAdapter(KinopoiskSearchPage)
+film_detail_adapter = TypeAdapter(KinopoiskFilmDetail)
+collection_page_adapter = TypeAdapter(KinopoiskCollectionPage)
+
+
+def parse_payload(adapter: TypeAdapter, data: Any):
+    """
+    Description:
+    ------------
+        Validates an upstream payload in a single pydantic-core pass.
+
+    Parameters:
+    -----------
+        adapter (TypeAdapter):
+            The adapter of the upstream schema.
+        data (Any):
+            Raw JSON bytes (response.content), parsed directly without an intermediate dict,
+            or an already decoded object.
+
+    Returns:
+    --------
+        The validated instance of the adapter's type.
+
+    Exceptions:
+    -----------
+        Raises pydantic.ValidationError if the payload does not match the schema.
+    """
+    if isinstance(data, (bytes, bytearray, str)):
+        return adapter.validate_json(data)
+    return adapter.validate_python(data)
+
+
+def json_response(adapter: TypeAdapter, content: Any, status_code: int = 200, headers: dict = None) -> Response:
+    """
+    Description:
+    ------------
+        Serializes already validated content straight to JSON bytes with a precompiled TypeAdapter.
+
+        Returning a Response from a route makes FastAPI skip the response_model round trip
+        (model_dump, re-validation, jsonable_encoder, json.dumps), which otherwise repeats
+        the work for every item of large lists. response_model is still used for the OpenAPI schema.
+
+    Parameters:
+    -----------
+        adapter (TypeAdapter):
+            The adapter matching the type of content.
+        content (Any):
+            Pydantic models or dicts that already satisfy the adapter's type.
+        status_code (int, optional):
+            The HTTP status code. Defaults to 200.
+        headers (dict, optional):
+            Extra response headers.
+
+    Returns:
+    --------
+        Response:
+            An application/json response with the serialized body.
+    """
+    return Response(
+        content=adapter.dump_json(content),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def parse_field_set(fields: str | None, model: type[BaseModel]) -> frozenset | None:
+    """
+    Description:
+    ------------
+        Parses the ?fields= query parameter into a set of model field names.
+
+    Parameters:
+    -----------
+        fields (str | None):
+            Comma-separated field names, e.g. "title,year,poster_url".
+        model (type[BaseModel]):
+            The response model the fields belong to.
+
+    Returns:
+    --------
+        frozenset | None
+            The requested field names, or None if all fields are requested.
+
+    Exceptions:
+    -----------
+        Raises ValueError listing the names that are not fields of the model.
+    """
+    if not fields:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    if not requested or requested == model.model_fields.keys():
+        return None
+    return requested
+
+
+@lru_cache(maxsize=256)
+def field_set_projector(model: type[BaseModel], fields: frozenset, many: bool) -> Callable[[bytes], bytes]:
+    """
+    Description:
+    ------------
+        Builds (once per model and field set) a function that projects a serialized payload
+        onto the requested fields.
+
+        The serializer is a TypeAdapter over a TypedDict with only the requested fields,
+        so omitted fields are neither materialized as objects nor serialized.
+
+    Parameters:
+    -----------
+        model (type[BaseModel]):
+            The response model of the full payload.
+        fields (frozenset):
+            The field names to keep.
+        many (bool):
+            Whether the payload is a list of models.
+
+    Returns:
+    --------
+        Callable[[bytes], bytes]:
+            Takes the full JSON body and returns the projected JSON body.
+    """
+    # Порядок полей как в модели, чтобы ответы с одинаковым набором полей совпадали байт в байт
+    names = tuple(name for name in model.model_fields if name in fields)
+    row_type = TypedDict(
+        f"{model.__name__}Fields",
+        {name: model.model_fields[name].annotation for name in names}
+    )
+    adapter = TypeAdapter(list[row_type] if many else row_type)
+
+    def project(body: bytes) -> bytes:
+        data = orjson.loads(body)
+        if many:
+            return adapter.dump_json([{name: item[name] for name in names} for item in data])
+        return adapter.dump_json({name: data[name] for name in names})
+
+    return project
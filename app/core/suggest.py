@@ -0,0 +1,222 @@
+import asyncio
+import heapq
+import logging
+import re
+import time
+from bisect import bisect_left
+import orjson
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_INDEX_KEYS = registry.gauge("suggest_index_keys", "Keys in the autocomplete prefix index.")
+
+# Транслитерация кириллицы для ввода латиницей: "matrica" и "matritsa" находят "Матрица"
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+})
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+# Префиксы не длиннее этого отвечаются из заранее ранжированных списков: их диапазоны в индексе слишком велики
+SHORT_PREFIX = 3
+# Результаты префиксов с диапазоном длиннее этого запоминаются до следующего обновления индекса
+MEMO_MIN_RANGE = 200
+MEMO_MAX_ENTRIES = 10000
+# Ключи строятся от начала названия и от начала нескольких первых слов
+MAX_WORD_KEYS = 6
+
+
+def fold(text: str) -> str:
+    # Регистр, "ё" и пунктуация не учитываются: "Ёлки-2!" -> "елки 2"
+    return NON_WORD_RE.sub(" ", text.casefold().replace("ё", "е")).strip()
+
+
+def title_keys(title: str) -> set[str]:
+    # Название целиком и с каждого слова, в исходном виде и транслитом
+    words = fold(title).split()
+    keys = set()
+    for start in range(min(len(words), MAX_WORD_KEYS)):
+        key = " ".join(words[start:])
+        keys.add(key)
+        keys.add(key.translate(TRANSLIT))
+    return keys
+
+
+class _Snapshot:
+    # Неизменяемое состояние индекса: читатели работают со старым, пока фоновый поток строит новое
+    __slots__ = ("keys", "ids", "top", "rank", "fragments", "memo")
+
+    def __init__(self, keys=(), ids=(), top=None, rank=None, fragments=None):
+        self.keys = keys
+        self.ids = ids
+        self.top = top or {}
+        self.rank = rank or {}
+        self.fragments = fragments or {}
+        self.memo = {}  # ранжированные результаты частых длинных префиксов
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index over the catalog titles (the movies table) for type-ahead suggestions.
+
+    Every title is indexed from its start and from the start of each of its first words, case-folded and
+    also transliterated to Latin. The keys are kept in a sorted list searched with bisect; prefixes of up to
+    SHORT_PREFIX characters are answered from precomputed ranked lists, and the ranked results of longer
+    prefixes matching many keys are memoized. Results are ranked by the number of users who added the movie
+    to favorites, then by rating, and are returned as ready JSON fragments.
+
+    New rows are merged into the index by refresh(); a full rebuild also picks up changed titles, ratings
+    and favorites counts. Both build a new snapshot in a worker thread and swap it in, so lookups never wait.
+    The index is per process.
+    """
+
+    def __init__(self, max_results: int = None):
+        self.max_results = max_results or settings.SUGGEST_MAX_LIMIT
+        self.snapshot = _Snapshot()
+        self.max_id = 0  # наибольший movies.id в индексе
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.snapshot.fragments)
+
+    def lookup(self, query: str, limit: int) -> list[int]:
+        """
+        Description:
+        ------------
+            Returns the kinopoisk ids of the best ranked titles matching the query prefix.
+
+        Parameters:
+        -----------
+            query (str):
+                Text typed so far, in Cyrillic or Latin, any case.
+            limit (int):
+                The maximum number of ids to return.
+
+        Returns:
+        --------
+            list[int]:
+                Kinopoisk ids, best ranked first.
+        """
+        prefix = fold(query)
+        if not prefix:
+            return []
+        snapshot = self.snapshot
+        if len(prefix) <= SHORT_PREFIX:
+            return snapshot.top.get(prefix, [])[:limit]
+
+        ranked = snapshot.memo.get(prefix)
+        if ranked is None:
+            start = bisect_left(snapshot.keys, prefix)
+            end = bisect_left(snapshot.keys, prefix + "\uffff", start)
+            ranked = heapq.nsmallest(self.max_results, set(snapshot.ids[start:end]), key=snapshot.rank.__getitem__)
+            if end - start > MEMO_MIN_RANGE:
+                if len(snapshot.memo) >= MEMO_MAX_ENTRIES:
+                    snapshot.memo.clear()
+                snapshot.memo[prefix] = ranked
+        return ranked[:limit]
+
+    def suggest_json(self, query: str, limit: int) -> bytes:
+        fragments = self.snapshot.fragments
+        return b"[" + b",".join(fragments[kinopoisk_id] for kinopoisk_id in self.lookup(query, limit)) + b"]"
+
+    def _build(self, base: _Snapshot, rows: list[dict]) -> _Snapshot:
+        # Выполняется в рабочем потоке; base не изменяется
+        rank = dict(base.rank)
+        fragments = dict(base.fragments)
+        new_keys = {}
+        for row in rows:
+            kinopoisk_id = row["kinopoisk_id"]
+            # Ключи уже проиндексированного фильма обновит только полная перестройка
+            if kinopoisk_id not in fragments:
+                new_keys[kinopoisk_id] = title_keys(row["title"])
+            rank[kinopoisk_id] = (-row["favorites"], -(row["rating"] or 0), kinopoisk_id)
+            fragments[kinopoisk_id] = orjson.dumps({"kinopoisk_id": kinopoisk_id, "title": row["title"],
+                                                    "year": row["year"], "rating": row["rating"]})
+        entries = sorted((key, kinopoisk_id) for kinopoisk_id, keys in new_keys.items() for key in keys)
+        merged = list(heapq.merge(zip(base.keys, base.ids), entries))
+        keys = [key for key, _ in merged]
+        ids = [kinopoisk_id for _, kinopoisk_id in merged]
+
+        # Ранжированные списки коротких префиксов: новые фильмы обходятся от лучших к худшим,
+        # затем сливаются с прежними списками затронутых префиксов
+        buckets = {}
+        for kinopoisk_id in sorted(new_keys, key=rank.__getitem__):
+            prefixes = {key[:length] for key in new_keys[kinopoisk_id] for length in range(1, SHORT_PREFIX + 1)}
+            for prefix in prefixes:
+                bucket = buckets.setdefault(prefix, [])
+                if len(bucket) < self.max_results:
+                    bucket.append(kinopoisk_id)
+        top = dict(base.top)
+        for prefix, bucket in buckets.items():
+            if prefix in top:
+                bucket = heapq.nsmallest(self.max_results, set(top[prefix]).union(bucket), key=rank.__getitem__)
+            top[prefix] = bucket
+        return _Snapshot(keys, ids, top, rank, fragments)
+
+    async def refresh(self, load_rows, full: bool = False, batch_size: int = 5000) -> int:
+        """
+        Description:
+        ------------
+            Loads the movies added since the last refresh (or all of them if full) and swaps in
+            an index including them.
+
+        Parameters:
+        -----------
+            load_rows (Callable[[int, int], Awaitable[list[dict]]]):
+                Returns up to batch_size rows with id greater than the given one, ordered by id
+                (see crud.get_movie_titles).
+            full (bool, optional):
+                Rebuild the index from scratch. Default is False.
+            batch_size (int, optional):
+                Rows per query. Default is 5000.
+
+        Returns:
+        --------
+            int:
+                The number of rows loaded.
+        """
+        async with self._refresh_lock:
+            after_id = 0 if full else self.max_id
+            rows = []
+            while True:
+                batch = await load_rows(after_id, batch_size)
+                rows += batch
+                if len(batch) < batch_size:
+                    break
+                after_id = batch[-1]["id"]
+            if not rows and not full:
+                return 0
+
+            base = _Snapshot() if full else self.snapshot
+            self.snapshot = await asyncio.to_thread(self._build, base, rows)
+            self.max_id = rows[-1]["id"] if rows else 0
+            SUGGEST_INDEX_KEYS.set(len(self.snapshot.keys))
+            return len(rows)
+
+    async def run(self, load_rows, interval: float = None, rebuild_interval: float = None):
+        interval = interval or settings.SUGGEST_REFRESH_INTERVAL
+        rebuild_interval = rebuild_interval or settings.SUGGEST_REBUILD_INTERVAL
+        last_rebuild = None
+        while True:
+            started = time.monotonic()
+            full = last_rebuild is None or started - last_rebuild >= rebuild_interval
+            try:
+                rows = await self.refresh(load_rows, full=full)
+                if full:
+                    last_rebuild = started
+                if rows:
+                    logger.info("Suggest index %s %s movies in %.1f s", "rebuilt with" if full else "added",
+                                rows, time.monotonic() - started, extra={"event": "suggest.refresh"})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Suggest index refresh failed: %r", e, extra={"event": "suggest.refresh_error"})
+            await asyncio.sleep(interval)
+
+
+# Индекс подсказок по каталогу фильмов
+suggest_index = SuggestIndex()
@@ -0,0 +1,323 @@
+import functools
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+import orjson
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+from app.core.log import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# Текущий span; None — запрос не попал в выборку, и трассировка ничего не стоит
+current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation within a trace. Finished spans are appended to the list shared by the whole
+    trace and exported together when the root span ends.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error",
+                 "_spans", "_token")
+
+    def __init__(self, name: str, trace_id: str, spans: list, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+        self._spans = spans
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def child(self, name: str, attributes: dict = None) -> "Span":
+        return Span(name, self.trace_id, self._spans, self.span_id, attributes)
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self._spans.append(self)
+
+    def __enter__(self):
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = repr(exc)
+        current_span.reset(self._token)
+        self.end()
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class NoopSpan:
+    # Заглушка для запросов вне выборки: один объект на весь процесс
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def span(name: str, **attributes):
+    """
+    Description:
+    ------------
+        Starts a child span of the current one, to be used as a context manager.
+
+    Parameters:
+    -----------
+        name (str):
+            The operation name, e.g. "kinopoisk.get".
+        **attributes:
+            Initial span attributes.
+
+    Returns:
+    --------
+        Span | NoopSpan:
+            A new span, or a shared no-op object if the request is not traced.
+    """
+    parent = current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, attributes)
+
+
+def set_span_attribute(key: str, value):
+    # Атрибут текущего span; без трассировки — ничего не делает
+    current = current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+def detached_span(name: str, **attributes) -> Span | None:
+    # Span, который не становится текущим: для зависимостей с yield, живущих в другом контексте
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return parent.child(name, attributes)
+
+
+def traced(name: str = None):
+    """
+    Description:
+    ------------
+        Decorator wrapping every call of an async function in a span.
+
+    Parameters:
+    -----------
+        name (str, optional):
+            The span name. Defaults to "<module>.<function>", e.g. "crud.create_favorite".
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            parent = current_span.get()
+            if parent is None:
+                return await func(*args, **kwargs)
+            with parent.child(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list) -> dict:
+    """
+    Description:
+    ------------
+        Converts the spans of one trace to an OTLP/JSON ExportTraceServiceRequest.
+
+    Parameters:
+    -----------
+        spans (list[Span]):
+            The finished spans of the trace.
+
+    Returns:
+    --------
+        dict:
+            The request body accepted by OTLP/HTTP collectors and the OpenTelemetry file exporter format.
+    """
+    otlp_spans = []
+    for item in spans:
+        otlp_span = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 1 if item.parent_id else 2,  # INTERNAL / SERVER
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [{"key": key, "value": otlp_value(value)} for key, value in item.attributes.items()],
+            "status": {"code": 2, "message": item.error} if item.error else {"code": 0},
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        otlp_spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "movie-favorite-api"}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+        }]
+    }
+
+
+class RingBufferExporter:
+    """
+    Keeps the last traces in memory for the /admin/traces endpoint.
+    """
+
+    def __init__(self, size: int = None):
+        self.traces = deque(maxlen=size or settings.TRACE_BUFFER_SIZE)
+
+    def export(self, spans: list):
+        self.traces.append(spans)
+
+    def find(self, trace_id: str) -> list | None:
+        for spans in self.traces:
+            if spans and spans[0].trace_id == trace_id:
+                return spans
+        return None
+
+    def shutdown(self):
+        pass
+
+
+class OtlpJsonFileExporter:
+    """
+    Appends traces to a file as OTLP/JSON lines, one ExportTraceServiceRequest per trace.
+    Encoding and writing happen in a background thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="otlp-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: list):
+        self._queue.put(spans)
+
+    def _run(self):
+        with open(self.path, "ab") as f:
+            while (spans := self._queue.get()) is not None:
+                f.write(orjson.dumps(to_otlp(spans)) + b"\n")
+                f.flush()
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Tracer:
+    """
+    Samples requests and hands finished traces to the exporters.
+    """
+
+    def __init__(self, sample_rate: float = None, exporters: list = None):
+        self.sample_rate = settings.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.exporters = exporters or []
+
+    def start_trace(self, name: str, attributes: dict = None) -> Span | None:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        return Span(name, f"{random.getrandbits(128):032x}", [], attributes=attributes)
+
+    def export(self, root: Span):
+        # Корневой span завершается последним; в экспорт он идёт первым
+        spans = [root] + [item for item in root._spans if item is not root]
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception:
+                logger.exception("Failed to export trace %s", root.trace_id)
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+trace_buffer = RingBufferExporter()
+tracer = Tracer(exporters=[trace_buffer])
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of a sampled request (TRACE_SAMPLE_RATE). The span is
+    named after the route template and its trace id is returned in the X-Trace-Id header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root = tracer.start_trace(f"{scope['method']} {scope['path']}",
+                                  {"http.method": scope["method"], "request_id": request_id_var.get()})
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                MutableHeaders(raw=message["headers"])["X-Trace-Id"] = root.trace_id
+            await send(message)
+
+        try:
+            with root:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+            tracer.export(root)
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARM_REQUESTS = registry.counter(
+    "cache_warm_requests_total", "Upstream requests made by the cache warmer.", ("reason", "result"))
+
+
+def parse_hours(value: str) -> frozenset:
+    # "2-6" -> часы 2..5, "22-2,13" -> 22, 23, 0, 1, 13; пустая строка — любое время
+    hours = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        start = int(start)
+        end = int(end) if end else start + 1
+        hour = start
+        while True:
+            hours.add(hour % 24)
+            hour = (hour + 1) % 24
+            if hour == end % 24:
+                break
+    return frozenset(hours) if hours else frozenset(range(24))
+
+
+class UpstreamQuota:
+    """
+    Counts Kinopoisk API requests in fixed windows (a day by default) against the plan's quota.
+
+    User requests are only counted; background work asks allows() before each request so that it
+    stays within its share of the quota and never takes the last requests of the window.
+    The counters are per process: with several workers configure the limit per worker.
+    """
+
+    def __init__(self, limit: int = None, period: float = 86400):
+        self.limit = settings.KINOPOISK_DAILY_QUOTA if limit is None else limit
+        self.period = period
+        self._window = None
+        self.used = 0
+        self.used_background = 0
+
+    def _roll(self):
+        window = int(time.time() // self.period)
+        if window != self._window:
+            self._window = window
+            self.used = 0
+            self.used_background = 0
+
+    def record(self, background: bool = False):
+        self._roll()
+        self.used += 1
+        if background:
+            self.used_background += 1
+
+    def allows(self, share: float) -> bool:
+        self._roll()
+        if not self.limit:
+            return True
+        return self.used < self.limit and self.used_background < self.limit * share
+
+    def state(self) -> dict:
+        self._roll()
+        return {"window": self._window, "used": self.used, "used_background": self.used_background}
+
+    def restore(self, state: dict):
+        # Счётчики сохранённого окна; если окно уже сменилось, квота начинается заново
+        self._roll()
+        if state.get("window") == self._window:
+            self.used = max(self.used, state["used"])
+            self.used_background = max(self.used_background, state["used_background"])
+
+
+class HotKeys:
+    """
+    Approximate request counts per key; decay() halves them so that recently hot keys rank first.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.counts = Counter()
+
+    def touch(self, key):
+        self.counts[key] += 1
+        if len(self.counts) > self.max_keys * 2:
+            # Редкие ключи отбрасываются, чтобы счётчик не рос без ограничений
+            self.counts = Counter(dict(self.counts.most_common(self.max_keys)))
+
+    def top(self, n: int) -> list:
+        return [key for key, _ in self.counts.most_common(n)]
+
+    def score(self, key) -> int:
+        return self.counts.get(key, 0)
+
+    def decay(self):
+        self.counts = Counter({key: count // 2 for key, count in self.counts.items() if count > 1})
+
+
+class RequestPacer:
+    """
+    Spaces background requests evenly at a given rate, so that batch work does not burst the upstream.
+    Shared by concurrent callers: each wait() reserves the next free slot.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Kinopoisk API: общий учёт запросов и частота запросов деталей фильмов
+upstream_quota = UpstreamQuota()
+hot_movies = HotKeys()
+
+
+class CacheWarmer:
+    """
+    Background scheduler that keeps movie details cached.
+
+    Every CACHE_WARM_INTERVAL seconds it fetches the details of the films present in the most favorites
+    lists and of the recently most requested films, unless they are already cached. During off-peak hours
+    (CACHE_WARM_OFF_PEAK_HOURS) it also refreshes entries expiring within CACHE_REFRESH_AHEAD seconds,
+    hottest first. With a shared cache tier, entries another worker has already fetched or refreshed are
+    taken from it instead of the upstream. Requests are paced at CACHE_WARM_RATE per second and stop when the warmer has used
+    CACHE_WARM_QUOTA_SHARE of KINOPOISK_DAILY_QUOTA.
+
+    Parameters:
+    -----------
+        cache (PayloadCache):
+            The cache holding "movie:<id>" entries.
+        refresh (Callable[[int], Awaitable]):
+            Fetches the details of a film from the Kinopoisk API and stores them in the cache.
+        popular_ids (Callable[[int], Awaitable[list[int]]]):
+            Returns up to n film ids ordered by popularity in favorites.
+        quota (UpstreamQuota, optional):
+            The upstream request counter. Defaults to upstream_quota.
+        hot (HotKeys, optional):
+            Request counts of film ids. Defaults to hot_movies.
+    """
+
+    def __init__(self, cache, refresh, popular_ids, quota: UpstreamQuota = None, hot: HotKeys = None):
+        self.cache = cache
+        self.refresh = refresh
+        self.popular_ids = popular_ids
+        self.quota = quota or upstream_quota
+        self.hot = hot or hot_movies
+        self.off_peak_hours = parse_hours(settings.CACHE_WARM_OFF_PEAK_HOURS)
+        self.pacer = RequestPacer(settings.CACHE_WARM_RATE)
+
+    def is_off_peak(self) -> bool:
+        return datetime.now().hour in self.off_peak_hours
+
+    async def _fetch(self, kinopoisk_id: int, reason: str) -> bool:
+        if not self.quota.allows(settings.CACHE_WARM_QUOTA_SHARE):
+            CACHE_WARM_REQUESTS.inc((reason, "quota"))
+            return False
+        # Равномерный темп, чтобы прогрев не создавал всплесков к Kinopoisk API.
+        # Запрос учитывается в квоте в get_kinopoisk_data: задача прогрева выполняется от имени "background"
+        await self.pacer.wait()
+        try:
+            await self.refresh(kinopoisk_id)
+        except HTTPException as e:
+            CACHE_WARM_REQUESTS.inc((reason, "error"))
+            logger.debug("Warming movie %s failed: %s", kinopoisk_id, e.detail, extra={"event": "cache.warm_error"})
+            return True
+        CACHE_WARM_REQUESTS.inc((reason, "ok"))
+        return True
+
+    async def _cached(self, key: str, fresh_until: float = None) -> bool:
+        # Запись есть в локальном или общем кеше: с общим кешем воркеры не запрашивают одно и то же
+        if fresh_until is None and key in self.cache:
+            return True
+        entry = await self.cache.peek_shared(key)
+        return entry is not None and entry.expires_at > (fresh_until or 0)
+
+    async def warm_once(self) -> int:
+        """
+        Description:
+        ------------
+            Runs one warming pass.
+
+        Returns:
+        --------
+            int:
+                The number of upstream requests made.
+        """
+        candidates = list(await self.popular_ids(settings.CACHE_WARM_TOP_FAVORITES))
+        candidates += self.hot.top(settings.CACHE_WARM_HOT_IDS)
+        requests = 0
+        for kinopoisk_id in dict.fromkeys(candidates):
+            if await self._cached(f"movie:{kinopoisk_id}"):
+                continue
+            if not await self._fetch(kinopoisk_id, "cold"):
+                return requests
+            requests += 1
+
+        if self.is_off_peak():
+            keys = self.cache.expiring("movie:", settings.CACHE_REFRESH_AHEAD)
+            ids = sorted((int(key.partition(":")[2]) for key in keys), key=self.hot.score, reverse=True)
+            for kinopoisk_id in ids:
+                # Другой воркер мог уже обновить запись в общем кеше
+                if await self._cached(f"movie:{kinopoisk_id}", time.time() + settings.CACHE_REFRESH_AHEAD):
+                    continue
+                if not await self._fetch(kinopoisk_id, "refresh"):
+                    return requests
+                requests += 1
+
+        self.hot.decay()
+        return requests
+
+    async def run(self, interval: float = None):
+        interval = interval or settings.CACHE_WARM_INTERVAL
+        # Первый проход сразу после старта: после деплоя кеши пустые
+        while True:
+            started = time.monotonic()
+            try:
+                requests = await self.warm_once()
+                logger.info("Cache warming made %s upstream requests in %.1f s", requests,
+                            time.monotonic() - started, extra={"event": "cache.warm"})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache warming failed: %r", e, extra={"event": "cache.warm_error"})
+            await asyncio.sleep(interval)
@@ -1,15 +1,26 @@
+from datetime import datetime
+from sqlalchemy import delete, func, insert, tuple_
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import User, Favorite
+from .models import User, Favorite, MovieDB, RevokedToken
 from sqlalchemy.exc import IntegrityError
 from app.core.security import hash_password
+from app.db.session import commit, write, write_many
+from app.core.tracing import traced
 
 
+@traced()
 async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(select(User).filter(User.username == username))
     return result.scalars().first()
 
 
+@traced()
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
+
+
+@traced()
 async def create_user(db: AsyncSession, username: str, password: str):
     """
         Create a new user in the database.
@@ -39,13 +50,14 @@ async def create_user(db: AsyncSession, username: str, password: str):
     user = User(username=username, hashed_password=hashed_password)
     db.add(user)
     try:
-        await db.commit()
+        await commit(db)
         return user
     except IntegrityError:
         await db.rollback()
         return None
 
 
+@traced()
 async def create_favorite(db: AsyncSession, user_id: int, kinopoisk_id: int, title: str, year: int):
     """
         Create a new favorite movie entry for a user in the database.
@@ -73,19 +85,80 @@ async def create_favorite(db: AsyncSession, user_id: int, kinopoisk_id: int, tit
         """
     favorite = Favorite(user_id=user_id, kinopoisk_id=kinopoisk_id, title=title, year=year)
     db.add(favorite)
-    await db.commit()
+    await commit(db)
     await db.refresh(favorite)
     return favorite
 
 
 # Получение списка фильмов по user_id
+@traced()
 async def get_favorite_with_user_id(db: AsyncSession, user_id: int):
     result = await db.execute(select(Favorite).filter(Favorite.user_id == user_id))
 
     return result.scalars().all()
 
 
+# Получение списка избранного по user_id в виде словарей, без создания ORM-объектов
+@traced()
+async def get_favorite_rows_with_user_id(db: AsyncSession, user_id: int):
+    """
+    Retrieve the user's favorite movies as plain dicts for the fast serialization path.
+
+    Only the columns exposed by FavoriteOut are selected, so no ORM identity map entries are built.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        user_id : int
+            The ID of the user whose favorites are being listed.
+
+    Returns:
+    --------
+        list[dict]
+            Dicts with kinopoisk_id, title and year keys, in the order the favorites were added.
+    """
+    stmt = (
+        select(Favorite.kinopoisk_id, Favorite.title, Favorite.year)
+        .filter(Favorite.user_id == user_id)
+        .order_by(Favorite.id)
+    )
+
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+# Фильмы, чаще всего добавляемые в избранное, для прогрева кеша
+@traced()
+async def get_popular_kinopoisk_ids(db: AsyncSession, limit: int):
+    """
+    Retrieve the Kinopoisk IDs present in the most favorites lists.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        limit : int
+            The maximum number of IDs to return.
+
+    Returns:
+    --------
+        list[int]
+            Kinopoisk IDs ordered by the number of users who added them, most popular first.
+    """
+    stmt = (
+        select(Favorite.kinopoisk_id)
+        .group_by(Favorite.kinopoisk_id)
+        .order_by(func.count(Favorite.id).desc(), Favorite.kinopoisk_id)
+        .limit(limit)
+    )
+
+    result = await db.execute(stmt)
+    return list(result.scalars())
+
+
 # Получение избранного фильма по user_id и kinopoisk_id
+@traced()
 async def get_favorites_by_user(db: AsyncSession, user_id: int, kinopoisk_id: int):
     """
     Retrieve a specific favorite movie for a user from the database.
@@ -114,6 +187,7 @@ async def get_favorites_by_user(db: AsyncSession, user_id: int, kinopoisk_id: in
 
 
 # Удаление фильма из избранных
+@traced()
 async def remove_favorite(db: AsyncSession, user_id: int, kinopoisk_id: int):
     """
     Remove a favorite movie entry from the database for a specific user.
@@ -138,5 +212,167 @@ async def remove_favorite(db: AsyncSession, user_id: int, kinopoisk_id: int):
     favorite = await get_favorites_by_user(db, user_id, kinopoisk_id)
     if favorite:
         await db.delete(favorite)
-        await db.commit()
+        await commit(db)
     return favorite
+
+
+# Пакетное применение отложенных изменений избранного одной транзакцией
+@traced()
+async def apply_favorite_changes(db: AsyncSession, keys: list[tuple[int, int]], rows: list[dict]):
+    """
+    Apply coalesced favorite adds and removes in one transaction.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        keys : list[tuple[int, int]]
+            (user_id, kinopoisk_id) pairs of every changed favorite; their current rows are deleted.
+        rows : list[dict]
+            Favorites to insert after the delete, with user_id, kinopoisk_id, title and year keys.
+
+    Notes:
+    ------
+        Delete-then-insert makes replaying the same changes idempotent and lets a removed and re-added
+        movie move to the end of the list. The statements and the commit run in the writer queue.
+    """
+    statements = []
+    if keys:
+        statements.append((delete(Favorite).where(tuple_(Favorite.user_id, Favorite.kinopoisk_id).in_(keys)),))
+    if rows:
+        statements.append((insert(Favorite), rows))
+    await write_many(db, statements)
+
+
+# Пакетная вставка или обновление фильмов каталога по kinopoisk_id
+@traced()
+async def upsert_movies(db: AsyncSession, rows: list[dict]):
+    """
+    Insert catalog movies or update the existing ones with the same kinopoisk_id in one statement.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        rows : list[dict]
+            Dicts with kinopoisk_id, title, year, description, rating and poster_url keys.
+
+    Notes:
+    ------
+        Uses INSERT ... ON CONFLICT (kinopoisk_id) DO UPDATE, supported by PostgreSQL and SQLite,
+        so re-ingesting the same films is idempotent. The statement and the commit run in the writer queue.
+    """
+    if not rows:
+        return
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(MovieDB).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MovieDB.kinopoisk_id],
+        set_={column: stmt.excluded[column] for column in ("title", "year", "description", "rating", "poster_url")},
+    )
+    await write(db, stmt)
+
+
+# Названия фильмов каталога с числом добавлений в избранное для индекса подсказок
+@traced()
+async def get_movie_titles(db: AsyncSession, after_id: int, limit: int):
+    """
+    Retrieve a page of catalog movies for the autocomplete index, in the order they were added.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        after_id : int
+            Only movies with a greater primary key are returned (keyset pagination).
+        limit : int
+            The maximum number of rows to return.
+
+    Returns:
+    --------
+        list[dict]
+            Dicts with id, kinopoisk_id, title, year, rating and favorites (the number of users who
+            added the movie) keys, ordered by id.
+    """
+    favorites = (
+        select(Favorite.kinopoisk_id, func.count(Favorite.id).label("favorites"))
+        .group_by(Favorite.kinopoisk_id)
+        .subquery()
+    )
+    stmt = (
+        select(MovieDB.id, MovieDB.kinopoisk_id, MovieDB.title, MovieDB.year, MovieDB.rating,
+               func.coalesce(favorites.c.favorites, 0).label("favorites"))
+        .outerjoin(favorites, favorites.c.kinopoisk_id == MovieDB.kinopoisk_id)
+        .filter(MovieDB.id > after_id)
+        .order_by(MovieDB.id)
+        .limit(limit)
+    )
+
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+# Отзыв токена при выходе из системы; повторный отзыв того же jti ничего не меняет
+@traced()
+async def revoke_token(db: AsyncSession, jti: str, user_id: int | None, expires_at: datetime):
+    """
+    Add a token id to the revoked tokens table.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        jti : str
+            The token's jti claim.
+        user_id : int | None
+            The ID of the token's user.
+        expires_at : datetime
+            The token's expiration time (naive UTC); the row is useless after it.
+
+    Notes:
+    ------
+        Uses INSERT ... ON CONFLICT DO NOTHING. The statement and the commit run in the writer queue.
+    """
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(RevokedToken).values(jti=jti, user_id=user_id, expires_at=expires_at,
+                                       revoked_at=datetime.utcnow())
+    await write(db, stmt.on_conflict_do_nothing(index_elements=[RevokedToken.jti]))
+
+
+@traced()
+async def is_token_revoked(db: AsyncSession, jti: str) -> bool:
+    return await db.get(RevokedToken, jti) is not None
+
+
+# jti отозванных и ещё не истёкших токенов для фильтра Блума
+@traced()
+async def get_revoked_jtis(db: AsyncSession, since: datetime = None):
+    """
+    Retrieve the ids of revoked tokens that have not expired yet.
+
+    Parameters:
+    -----------
+        db : AsyncSession
+            The database session used for the operation.
+        since : datetime, optional
+            Only tokens revoked at or after this time (naive UTC). All by default.
+
+    Returns:
+    --------
+        list[tuple[str, datetime]]
+            Pairs of jti and revoked_at.
+    """
+    stmt = select(RevokedToken.jti, RevokedToken.revoked_at).filter(RevokedToken.expires_at > datetime.utcnow())
+    if since is not None:
+        stmt = stmt.filter(RevokedToken.revoked_at >= since)
+
+    result = await db.execute(stmt)
+    return [tuple(row) for row in result]
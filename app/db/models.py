@@ -1,10 +1,13 @@
+from datetime import datetime
 from sqlalchemy import (
     Column,
+    DateTime,
     Integer,
     String,
     ForeignKey,
     Float,
-    Text
+    Text,
+    UniqueConstraint
 )
 
 from sqlalchemy.orm import mapped_column, DeclarativeBase, Mapped, relationship
@@ -27,6 +30,10 @@ class User(Base):
 
 class Favorite(Base):
     __tablename__ = 'favorites'
+    __table_args__ = (
+        # Один фильм может быть в избранном пользователя только один раз
+        UniqueConstraint("user_id", "kinopoisk_id", name="uq_favorites_user_id_kinopoisk_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     kinopoisk_id: Mapped[int] = mapped_column(Integer, index=True)
@@ -47,3 +54,13 @@ class MovieDB(Base):
     description: Mapped[str] = Column(Text, nullable=True)
     rating: Mapped[int] = mapped_column(Float, nullable=True)
     poster_url: Mapped[str] = mapped_column(String(255), nullable=True)
+
+
+# Отозванные токены (выход из системы); строки с истёкшим expires_at можно удалять
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime, index=True)
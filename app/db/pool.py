@@ -0,0 +1,17 @@
+import time
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waits for a connection,
+    including the time to open a new one when the pool is not yet full.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
@@ -1,29 +1,221 @@
+from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import register_pool_metrics
+from app.core.tracing import detached_span
 from app.db import models
+from app.db.pool import InstrumentedQueuePool
+from app.db.sqlite import is_sqlite_url, sqlite_engine_options, configure_sqlite, get_writer_queue
 
-# Создаем асинхронный движок для работы с базой данных
-engine = create_async_engine(settings.SQLALCHEMY_DATABASE_URL, echo=True)
+# Путь к alembic.ini относительно корня проекта, а не текущей директории
+ALEMBIC_INI_PATH = Path(__file__).resolve().parents[2] / "alembic.ini"
 
-# Создаем сессионный класс для работы с базой
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+_engine = None
+_sessionmaker = None
+
+
+def get_engine():
+    """
+    Description:
+    ------------
+        Returns the application's async engine, creating it on first use.
+
+        The engine is not built at import time: loading the database driver and the dialect is
+        deferred until the first connection, so importing the app (workers, tests, CLI tools) stays fast.
+
+    Returns:
+    --------
+        AsyncEngine:
+            The engine for settings.SQLALCHEMY_DATABASE_URL.
+    """
+    global _engine
+    if _engine is None:
+        if is_sqlite_url(settings.SQLALCHEMY_DATABASE_URL):
+            engine = create_async_engine(
+                settings.SQLALCHEMY_DATABASE_URL,
+                echo=settings.DB_ECHO,
+                **sqlite_engine_options(settings.SQLALCHEMY_DATABASE_URL)
+            )
+            configure_sqlite(engine)
+        else:
+            engine = create_async_engine(settings.SQLALCHEMY_DATABASE_URL, echo=settings.DB_ECHO,
+                                         poolclass=InstrumentedQueuePool)
+
+        # Размер и загрузка пула отдаются в /metrics (у in-memory SQLite пул статический, без этих метрик)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            register_pool_metrics(engine.pool)
+        _engine = engine
+    return _engine
+
+
+def get_sessionmaker():
+    # Фабрика сессий создаётся вместе с движком при первом обращении
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = sessionmaker(
+            bind=get_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    return _sessionmaker
+
+
+# Закрытие соединений пула; следующее обращение создаст движок заново
+async def dispose_engine():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _sessionmaker = None
 
 
 # Получаем сессию базы данных
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+    # Время жизни сессии в трассировке; span не делается текущим, так как зависимость живёт в своём контексте
+    db_span = detached_span("db.session")
+    try:
+        async with get_sessionmaker()() as session:
+            yield session
+    finally:
+        if db_span is not None:
+            db_span.end()
+
+
+# Фиксация транзакции; для SQLite коммиты проходят через очередь единственного писателя
+async def commit(db: AsyncSession):
+    queue = get_writer_queue(db.bind)
+    if queue is None:
+        await db.commit()
+    else:
+        await queue.run(db.commit)
+
+
+async def write(db: AsyncSession, statement, *params):
+    """
+    Description:
+    ------------
+        Executes a data-modifying statement and commits it. For SQLite both run inside the writer queue.
+
+    Parameters:
+    -----------
+        db (AsyncSession):
+            The database session used for the operation.
+        statement (Executable):
+            The INSERT, UPDATE or DELETE statement.
+        params (list[dict], optional):
+            Parameter sets for an executemany.
+
+    Notes:
+    ------
+        SQLite takes the write lock at the first modifying statement, not at COMMIT. A statement
+        executed outside the queue would hold that lock while waiting for the queue, and block the
+        writer inside it until busy_timeout expires.
+    """
+    await write_many(db, [(statement, *params)])
+
+
+async def write_many(db: AsyncSession, statements: list[tuple]):
+    # Несколько изменений одной транзакцией: (statement,) или (statement, params)
+    async def transaction():
+        for statement, *params in statements:
+            await db.execute(statement, *params)
+        await db.commit()
+
+    queue = get_writer_queue(db.bind)
+    if queue is None:
+        await transaction()
+    else:
+        await queue.run(transaction)
 
 
 # Функция для создания всех таблиц
 async def create_db_and_tables():
     # Создаём таблицы в базе данных на основе всех моделей
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
 
         # Создаём все таблицы
         await conn.run_sync(models.Base.metadata.create_all)
+
+
+def get_head_revision() -> str | None:
+    """
+    Description:
+    ------------
+        Returns the head revision of the Alembic migration history shipped with the application.
+
+    Returns:
+    --------
+        str | None
+            The head revision id, or None if there are no migrations.
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(ALEMBIC_INI_PATH))
+    config.set_main_option("script_location", str(ALEMBIC_INI_PATH.parent / "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+async def get_current_revision() -> str | None:
+    """
+    Description:
+    ------------
+        Reads the revision the database is stamped with from the alembic_version table.
+
+    Returns:
+    --------
+        str | None
+            The current revision id, or None if the database has never been migrated.
+    """
+    from alembic.runtime.migration import MigrationContext
+
+    async with get_engine().connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision()
+        )
+
+
+async def check_schema_revision():
+    """
+    Description:
+    ------------
+        Verifies that the database schema is at the Alembic head revision.
+        Costs a single query against alembic_version, unlike create_all which inspects every table.
+
+    Exceptions:
+    -----------
+        Raises RuntimeError if the database revision differs from the head revision.
+    """
+    head = get_head_revision()
+    current = await get_current_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema revision is {current}, expected {head}. Run `alembic upgrade head`."
+        )
+
+
+# Подготовка схемы базы данных при старте в зависимости от DB_SCHEMA_MODE
+async def init_db_schema(mode: str = None):
+    """
+    Description:
+    ------------
+        Prepares the database schema on application startup.
+
+    Parameters:
+    -----------
+        mode (str, optional):
+            "check" verifies the Alembic revision, "create" runs create_all (local development only),
+            "skip" does nothing. Defaults to settings.DB_SCHEMA_MODE.
+
+    Exceptions:
+    -----------
+        Raises ValueError for an unknown mode.
+    """
+    mode = mode or settings.DB_SCHEMA_MODE
+    if mode == "check":
+        await check_schema_revision()
+    elif mode == "create":
+        await create_db_and_tables()
+    elif mode != "skip":
+        raise ValueError(f"Unknown DB_SCHEMA_MODE: {mode}")
@@ -0,0 +1,107 @@
+import asyncio
+import weakref
+from sqlalchemy import event
+from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool
+
+# Очереди записи для каждого SQLite-движка (ключ — синхронный Engine)
+_writer_queues = weakref.WeakKeyDictionary()
+
+
+def is_sqlite_url(url: str) -> bool:
+    return url is not None and url.startswith("sqlite")
+
+
+def sqlite_engine_options(url: str) -> dict:
+    """
+    Description:
+    ------------
+        Returns create_async_engine() keyword arguments for an SQLite database.
+
+        SQLAlchemy uses NullPool for file databases, so every session would reopen the file and lose
+        the page cache and the memory map. A small queue pool keeps connections warm instead.
+        Overflow is unbounded: a session may hold its connection while waiting in the writer queue,
+        so a capped pool could starve the writer that is currently committing.
+
+    Parameters:
+    -----------
+        url (str):
+            The sqlite+aiosqlite database URL.
+
+    Returns:
+    --------
+        dict:
+            Engine options; empty for in-memory databases, which already use a StaticPool.
+    """
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.SQLITE_POOL_SIZE,
+        "max_overflow": -1,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Description:
+    ------------
+        Applies WAL journaling and tuned pragmas to every new SQLite connection.
+
+    Notes:
+    ------
+        journal_mode=WAL lets readers run concurrently with the single writer.
+        synchronous=NORMAL fsyncs only at checkpoints, which is durable enough in WAL mode.
+        busy_timeout covers writers from other processes that do not share our writer queue.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+class WriterQueue:
+    """
+    Single-writer queue for an SQLite database.
+
+    SQLite allows one writer at a time; concurrent commits from the same process would otherwise spin
+    on busy_timeout. Writers wait on an asyncio.Lock, which wakes waiters in FIFO order, so commits
+    are executed one by one in arrival order.
+    """
+
+    def __init__(self):
+        self._lock = None
+
+    async def run(self, func, *args):
+        # Lock создаётся лениво, чтобы привязаться к работающему event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await func(*args)
+
+
+def configure_sqlite(engine):
+    """
+    Description:
+    ------------
+        Registers the pragma hook and the writer queue for an SQLite async engine.
+
+    Parameters:
+    -----------
+        engine (AsyncEngine):
+            The engine created for an sqlite+aiosqlite URL.
+    """
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    _writer_queues[engine.sync_engine] = WriterQueue()
+
+
+def get_writer_queue(engine) -> WriterQueue | None:
+    sync_engine = getattr(engine, "sync_engine", None)
+    if sync_engine is None:
+        return None
+    return _writer_queues.get(sync_engine)
@@ -0,0 +1,359 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from pathlib import Path
+import orjson
+from sqlalchemy.exc import DataError, IntegrityError
+from app.core.config import settings
+from app.core.lifecycle import lifecycle
+from app.core.metrics import registry
+from app.db.crud import apply_favorite_changes, get_favorites_by_user
+from app.db.session import get_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+FAVORITE_FLUSHES = registry.counter(
+    "favorites_write_behind_flushes_total", "Write-behind favorite flushes by result.", ("result",))
+FAVORITE_REJECTED = registry.counter(
+    "favorites_write_behind_rejected_total", "Favorite changes the database rejected, moved to the rejected log.")
+FAVORITE_LOG_SYNC = registry.histogram(
+    "favorites_write_behind_fsync_seconds", "Time to write and fsync a group of favorite changes to the log.")
+
+
+def _favorite(op: dict) -> dict:
+    return {"kinopoisk_id": op["kinopoisk_id"], "title": op["title"], "year": op["year"]}
+
+
+class FavoriteWriteBehind:
+    """
+    Write-behind buffer for favorite adds and removes.
+
+    A change is acknowledged once it is appended and fsynced to the worker's log file; changes arriving
+    during an fsync are written together by the next one (group commit). Pending changes are coalesced
+    per (user, movie), the last one winning, so an add followed by a remove never reaches the database,
+    and are applied every FAVORITES_FLUSH_INTERVAL seconds in one transaction. After a successful flush
+    the log is rewritten with the changes still pending.
+
+    A change the database rejects (integrity or data error) is found by splitting the failed batch and
+    is moved to rejected.log in the log directory, so it does not hold back the other changes.
+
+    Each worker has its own log, locked with flock while the worker runs. On start a worker takes over
+    the logs left unlocked by stopped workers and replays them. Reads merge the pending changes of this
+    worker over the database rows (see overlay() and merge()), so users see their own writes as long as
+    their requests reach the same worker.
+    """
+
+    def __init__(self, directory: str = None, flush_interval: float = None):
+        self.directory = Path(directory or settings.FAVORITES_LOG_DIR)
+        self.flush_interval = flush_interval or settings.FAVORITES_FLUSH_INTERVAL
+        self.path = None  # журнал этого воркера, назначается в start()
+        self.active = False
+        self.pending = {}  # user_id -> {kinopoisk_id: последняя операция}
+        self.flushing = {}  # изменения, применяемые текущим сбросом
+        self._file = None
+        self._batch = []
+        self._batch_future = None
+        self._log_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        self._tasks = set()  # задачи записи в журнал: event loop хранит только слабые ссылки
+
+    def __len__(self) -> int:
+        return sum(len(ops) for ops in self.pending.values())
+
+    def _apply(self, op: dict):
+        ops = self.pending.setdefault(op["user_id"], {})
+        # Повторная операция переносится в конец: порядок добавления в избранное сохраняется
+        ops.pop(op["kinopoisk_id"], None)
+        ops[op["kinopoisk_id"]] = op
+
+    def lookup(self, user_id: int, kinopoisk_id: int) -> dict | None:
+        # Последняя несохранённая в базу операция над фильмом или None
+        op = self.pending.get(user_id, {}).get(kinopoisk_id)
+        if op is None:
+            op = self.flushing.get(user_id, {}).get(kinopoisk_id)
+        return op
+
+    def overlay(self, user_id: int) -> dict:
+        """
+        Description:
+        ------------
+            Returns the user's changes not yet in the database. Take it before querying the database:
+            a flush finishing in between then only applies changes the overlay already contains.
+
+        Parameters:
+        -----------
+            user_id (int):
+                The ID of the user.
+
+        Returns:
+        --------
+            dict:
+                The last change per kinopoisk_id, in the order they were made.
+        """
+        flushing = self.flushing.get(user_id)
+        pending = self.pending.get(user_id)
+        if not flushing:
+            return dict(pending) if pending else {}
+        overlay = dict(flushing)
+        for kinopoisk_id, op in (pending or {}).items():
+            overlay.pop(kinopoisk_id, None)
+            overlay[kinopoisk_id] = op
+        return overlay
+
+    @staticmethod
+    def merge(rows: list[dict], overlay: dict) -> list[dict]:
+        # Строки базы без изменённых фильмов, затем добавленные, как самые новые
+        if not overlay:
+            return rows
+        return ([row for row in rows if row["kinopoisk_id"] not in overlay]
+                + [_favorite(op) for op in overlay.values() if op["op"] == "add"])
+
+    async def get(self, db, user_id: int, kinopoisk_id: int) -> dict | None:
+        # Фильм в избранном с учётом несохранённых изменений: dict с kinopoisk_id, title и year или None
+        op = self.lookup(user_id, kinopoisk_id)
+        if op is not None:
+            return _favorite(op) if op["op"] == "add" else None
+        favorite = await get_favorites_by_user(db, user_id=user_id, kinopoisk_id=kinopoisk_id)
+        if favorite is None:
+            return None
+        return {"kinopoisk_id": favorite.kinopoisk_id, "title": favorite.title, "year": favorite.year}
+
+    async def add(self, user_id: int, kinopoisk_id: int, title: str, year: int) -> dict:
+        op = {"op": "add", "user_id": user_id, "kinopoisk_id": kinopoisk_id, "title": title, "year": year}
+        await self._record(op)
+        return _favorite(op)
+
+    async def remove(self, user_id: int, favorite: dict) -> dict:
+        await self._record({"op": "remove", "user_id": user_id, **favorite})
+        return favorite
+
+    async def _record(self, op: dict):
+        # Сериализация до попадания в группу: ошибка одной операции не касается остальных запросов группы
+        line = orjson.dumps(op) + b"\n"
+        # Групповая запись: изменения, пришедшие во время fsync, пишутся следующим одним fsync
+        if self._batch_future is None:
+            self._batch_future = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(self._write_batch())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._batch.append((op, line))
+        await asyncio.shield(self._batch_future)
+
+    async def _write_batch(self):
+        async with self._log_lock:
+            batch, future = self._batch, self._batch_future
+            self._batch, self._batch_future = [], None
+            ops = [op for op, _ in batch]
+            try:
+                start = time.perf_counter()
+                await asyncio.to_thread(self._write, b"".join(line for _, line in batch))
+                FAVORITE_LOG_SYNC.observe(time.perf_counter() - start)
+            except Exception as e:
+                logger.error("Favorites log write failed: %r", e, extra={"event": "favorites.log_error"})
+                future.set_exception(e)
+                return
+            # В очередь на сброс изменения попадают только после fsync, в порядке записи в журнал
+            for op in ops:
+                self._apply(op)
+            future.set_result(None)
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _reject(self, ops: list[dict]):
+        # Отклонённые базой изменения сохраняются для разбора, а не теряются молча
+        with open(self.directory / "rejected.log", "ab") as file:
+            file.write(b"".join(orjson.dumps(op) + b"\n" for op in ops))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _open(self, path: Path):
+        # Журнал воркера заблокирован, пока воркер жив; снятая блокировка — признак брошенного журнала
+        file = open(path, "ab")
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return file
+
+    def _rewrite(self):
+        # Атомарная замена журнала изменениями, ещё не сохранёнными в базу
+        tmp_path = self.path.with_suffix(".tmp")
+        file = self._open(tmp_path)
+        file.truncate(0)
+        ops = [op for source in (self.flushing, self.pending) for ops in source.values() for op in ops.values()]
+        file.write(b"".join(orjson.dumps(op) + b"\n" for op in ops))
+        file.flush()
+        os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        if self._file is not None:
+            self._file.close()
+        self._file = file
+
+    def _claim_orphans(self) -> list:
+        # Журналы остановленных воркеров (и этого pid от прошлого запуска), чьи блокировки свободны.
+        # Файлы остаются открытыми и заблокированными, пока start() их не удалит
+        claimed = []
+        for path in sorted(self.directory.glob("favorites-*.log")):
+            try:
+                file = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Живой воркер мог заменить журнал между open и flock: заблокирован старый файл, а не его журнал
+                if os.fstat(file.fileno()).st_ino != os.stat(path).st_ino:
+                    raise FileNotFoundError(path)
+            except (BlockingIOError, FileNotFoundError):
+                file.close()
+                continue
+            for line in file:
+                try:
+                    self._apply(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    # Недописанная строка: изменение не было подтверждено клиенту
+                    logger.warning("Skipping a torn line in %s", path, extra={"event": "favorites.log_torn"})
+            claimed.append((path, file))
+        return claimed
+
+    async def start(self):
+        """
+        Description:
+        ------------
+            Recovers the changes left in the logs of stopped workers, opens this worker's log and starts
+            the periodic flush. The final flush is registered as a shutdown hook.
+        """
+        # pid узнаётся при старте: воркеры могут импортировать приложение до fork
+        self.path = self.directory / f"favorites-{os.getpid()}.log"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        async with self._log_lock:
+            claimed = await asyncio.to_thread(self._claim_orphans)
+            try:
+                # Восстановленные изменения сначала переносятся в свой журнал, затем чужие журналы удаляются
+                await asyncio.to_thread(self._rewrite)
+                for path, _ in claimed:
+                    if path != self.path:
+                        path.unlink(missing_ok=True)
+            finally:
+                for _, file in claimed:
+                    file.close()
+        if len(self):
+            logger.info("Recovered %s pending favorite changes", len(self), extra={"event": "favorites.recovered"})
+        self.active = True
+        self._flusher = asyncio.create_task(self.run())
+        lifecycle.on_shutdown(self.close)
+
+    async def flush(self) -> int:
+        """
+        Description:
+        ------------
+            Applies the pending changes to the database in one transaction and compacts the log.
+
+        Returns:
+        --------
+            int:
+                The number of (user, movie) pairs written, not counting rejected ones.
+
+        Exceptions:
+        -----------
+            Re-raises database errors other than integrity and data errors; the changes then stay
+            pending, under any newer ones.
+        """
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            self.flushing, self.pending = self.pending, {}
+            ops = [op for changes in self.flushing.values() for op in changes.values()]
+            try:
+                rejected = await self._apply_ops(ops)
+            except Exception:
+                FAVORITE_FLUSHES.inc(("error",))
+                for user_id, ops in self.flushing.items():
+                    newer = self.pending.get(user_id, {})
+                    self.pending[user_id] = {**{k: op for k, op in ops.items() if k not in newer}, **newer}
+                self.flushing = {}
+                raise
+            self.flushing = {}
+            FAVORITE_FLUSHES.inc(("ok",))
+            async with self._log_lock:
+                if rejected:
+                    await asyncio.to_thread(self._reject, rejected)
+                await asyncio.to_thread(self._rewrite)
+            return len(ops) - len(rejected)
+
+    async def _apply_ops(self, ops: list[dict]) -> list[dict]:
+        """
+        Description:
+        ------------
+            Applies the changes in one transaction. If the database rejects the batch, applies its halves
+            separately until the rejected changes are isolated.
+
+        Parameters:
+        -----------
+            ops (list[dict]):
+                The last change of each (user, movie) pair.
+
+        Returns:
+        --------
+            list[dict]:
+                The changes the database rejected on their own.
+
+        Notes:
+        ------
+            Halves applied before a later error other than a rejection are applied again with the whole
+            batch on the next flush; delete-then-insert makes that harmless.
+        """
+        keys = [(op["user_id"], op["kinopoisk_id"]) for op in ops]
+        rows = [{"user_id": op["user_id"], **_favorite(op)} for op in ops if op["op"] == "add"]
+        try:
+            async with get_sessionmaker()() as db:
+                await apply_favorite_changes(db, keys, rows)
+            return []
+        except (IntegrityError, DataError) as e:
+            if len(ops) == 1:
+                FAVORITE_REJECTED.inc()
+                logger.error("Favorite change rejected by the database: %s: %r", ops[0], e,
+                             extra={"event": "favorites.rejected"})
+                return ops
+        middle = len(ops) // 2
+        return await self._apply_ops(ops[:middle]) + await self._apply_ops(ops[middle:])
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Favorites flush failed, %s changes pending: %r", len(self), e,
+                               extra={"event": "favorites.flush_error"})
+
+    async def close(self):
+        # Финальный сброс при остановке; если база недоступна, журнал остаётся для следующего запуска
+        if not self.active:
+            return
+        self.active = False
+        lifecycle.remove_shutdown_hook(self.close)
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Final favorites flush failed, %s changes kept in %s: %r", len(self), self.path, e,
+                         extra={"event": "favorites.flush_error"})
+        async with self._log_lock:
+            if not self.pending:
+                self.path.unlink(missing_ok=True)
+            self._file.close()
+            self._file = None
+
+
+# Отложенная запись избранного; включается FAVORITES_WRITE_BEHIND при старте приложения
+favorite_writes = FavoriteWriteBehind()
+
+registry.gauge("favorites_write_behind_pending", "Favorite changes acknowledged but not yet in the database.",
+               callback=lambda: {(): len(favorite_writes)})
@@ -0,0 +1,362 @@
+"""
+Catalog ingestion: fills the `movies` table from Kinopoisk API collections and film id ranges.
+
+Usage:
+    python -m app.ingest --collection TOP_POPULAR_ALL --collection TOP_250_MOVIES
+    python -m app.ingest --ids 1-500000 --concurrency 16 --rate 15 --quota-share 0.5
+
+Requests go through the configured movie provider (KINOPOISK_PROVIDER), are paced at --rate per
+second and stop once --quota-share of KINOPOISK_DAILY_QUOTA is used. Rows are upserted by
+kinopoisk_id in batches of --batch-size. Progress and the quota used today are checkpointed to
+--checkpoint after every batch, so an interrupted run continues where it stopped when started again
+with the same sources; pages and ids that failed after retries are fetched again. --restart ignores
+the saved progress but not the quota used.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+import httpx
+import orjson
+from pydantic import ValidationError
+from app.core.providers import COLLECTIONS_PATH, FILM_PATH, ProviderError, close_provider, get_provider
+from app.core.serialization import collection_page_adapter, film_detail_adapter, parse_payload
+from app.core.warming import RequestPacer, UpstreamQuota
+from app.db.crud import upsert_movies
+from app.db.session import dispose_engine, get_sessionmaker
+
+logger = logging.getLogger("app.ingest")
+
+# Длина строковых колонок таблицы movies
+MAX_STRING_LENGTH = 255
+# Ключ контрольной точки со счётчиками квоты; имена источников начинаются с "collection:" или "ids:"
+QUOTA_KEY = "quota"
+
+
+def parse_range(value: str) -> tuple[int, int]:
+    # "1-1000" -> (1, 1000) включительно
+    start, _, end = value.partition("-")
+    start, end = int(start), int(end or start)
+    if start < 1 or end < start:
+        raise argparse.ArgumentTypeError(f"Invalid id range: {value}")
+    return start, end
+
+
+def movie_row(film) -> dict | None:
+    # Строка таблицы movies; фильмы без года не сохраняются (колонка year обязательна)
+    if film.year is None:
+        return None
+    return {
+        "kinopoisk_id": film.kinopoisk_id,
+        "title": film.title[:MAX_STRING_LENGTH],
+        "year": film.year,
+        "description": film.description or None,
+        "rating": film.rating,
+        "poster_url": film.poster_url[:MAX_STRING_LENGTH] if film.poster_url else None,
+    }
+
+
+class SourceProgress:
+    """
+    Progress over the numbered jobs of one source (collection pages or film ids).
+
+    Jobs complete out of order; the watermark is the highest job number below which every job is
+    complete, i.e. whose rows are committed. Only the watermark is checkpointed.
+    """
+
+    def __init__(self, name: str, start: int, end: int | None, watermark: int = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.watermark = start - 1 if watermark is None else watermark
+        self.next_job = self.watermark + 1
+        self._done = set()
+
+    def has_next(self) -> bool:
+        return self.end is None or self.next_job <= self.end
+
+    def take(self) -> int:
+        job = self.next_job
+        self.next_job += 1
+        return job
+
+    def complete(self, job: int):
+        self._done.add(job)
+        while self.watermark + 1 in self._done:
+            self.watermark += 1
+            self._done.discard(self.watermark)
+
+
+class Checkpoint:
+    """
+    JSON file with the watermark and the end of every source and the quota counters, written atomically.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.state = orjson.loads(self.path.read_bytes()) if self.path.exists() else {}
+
+    def restore(self, progress: SourceProgress):
+        saved = self.state.get(progress.name)
+        if saved is not None:
+            progress.watermark = saved["watermark"]
+            progress.next_job = progress.watermark + 1
+            if progress.end is None:
+                progress.end = saved.get("end")
+
+    def restore_quota(self, quota: UpstreamQuota):
+        saved = self.state.get(QUOTA_KEY)
+        if saved is not None:
+            quota.restore(saved)
+
+    def save(self, sources: list[SourceProgress], quota: UpstreamQuota = None):
+        for progress in sources:
+            self.state[progress.name] = {"watermark": progress.watermark, "end": progress.end}
+        if quota is not None:
+            self.state[QUOTA_KEY] = quota.state()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_bytes(orjson.dumps(self.state, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, self.path)
+
+
+class JobFailed(Exception):
+    # Страница или фильм не получены после всех попыток; задание не отмечается выполненным
+    pass
+
+
+class Ingester:
+    """
+    Runs numbered jobs of several sources with bounded concurrency and writes the rows in batches.
+
+    A job is complete once its rows are committed or the upstream answered 404; a job that failed
+    after retries or returned an unexpected payload stays incomplete, so the checkpoint does not
+    move past it and the next run fetches it again.
+
+    Parameters:
+    -----------
+        sources (list[SourceProgress]):
+            Sources named "collection:<TYPE>" or "ids:<start>-<end>".
+        checkpoint (Checkpoint):
+            Where the progress is saved after each batch.
+        concurrency (int):
+            Requests in flight.
+        rate (float):
+            Upstream requests per second.
+        quota (UpstreamQuota):
+            Daily request counter; the run stops when quota_share of it is used.
+        quota_share (float):
+            Share of the daily quota the run may use.
+        batch_size (int):
+            Rows per upsert statement and transaction.
+    """
+
+    # Задержка перед первым повтором запроса; каждая следующая вдвое больше
+    RETRY_DELAY = 1.0
+
+    def __init__(self, sources: list[SourceProgress], checkpoint: Checkpoint, concurrency: int, rate: float,
+                 quota: UpstreamQuota, quota_share: float, batch_size: int):
+        self.sources = sources
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.pacer = RequestPacer(rate)
+        self.quota = quota
+        self.quota_share = quota_share
+        self.batch_size = batch_size
+        self.provider = get_provider()
+        self._rows = {}  # kinopoisk_id -> строка, ожидающая записи
+        self._pending_jobs = []  # задания, строки которых ещё в буфере
+        self._write_lock = asyncio.Lock()
+        self.stats = {"requests": 0, "rows": 0, "skipped": 0, "not_found": 0, "errors": 0}
+        self.stopped_by_quota = False
+
+    def _next_job(self) -> tuple[SourceProgress, int] | None:
+        for progress in self.sources:
+            if progress.has_next():
+                return progress, progress.take()
+        return None
+
+    async def fetch(self, path: str, params: dict = None, attempts: int = 3) -> bytes | None:
+        """
+        Description:
+        ------------
+            Requests a path from the provider, retrying upstream and network errors with exponential backoff.
+
+        Returns:
+        --------
+            bytes | None:
+                The payload, or None if the upstream answered 404 (no such film).
+
+        Exceptions:
+        -----------
+            Raises JobFailed if every attempt failed.
+        """
+        for attempt in range(attempts):
+            await self.pacer.wait()
+            self.quota.record(background=True)
+            self.stats["requests"] += 1
+            try:
+                return await self.provider.fetch(path, params)
+            except ProviderError as e:
+                if e.status == 404:
+                    self.stats["not_found"] += 1
+                    return None
+                reason = e.reason
+            except httpx.TransportError as e:
+                # Обрыв соединения или таймаут: HttpProvider пропускает их как есть
+                reason = repr(e)
+            if attempt == attempts - 1:
+                self.stats["errors"] += 1
+                logger.warning("Giving up on %s %s: %s", path, params or "", reason)
+                raise JobFailed(reason)
+            await asyncio.sleep(self.RETRY_DELAY * 2 ** attempt)
+
+    async def run_job(self, progress: SourceProgress, job: int) -> list[dict] | None:
+        # Строки задания; None — задание не выполнено и должно быть повторено
+        try:
+            if progress.name.startswith("collection:"):
+                data = await self.fetch(COLLECTIONS_PATH, {"type": progress.name.partition(":")[2], "page": job})
+                if data is None:
+                    return []
+                page = parse_payload(collection_page_adapter, data)
+                if progress.end is None:
+                    progress.end = page.total_pages
+                films = page.items
+            else:
+                data = await self.fetch(FILM_PATH.format(kinopoisk_id=job))
+                films = [] if data is None else [parse_payload(film_detail_adapter, data)]
+        except JobFailed:
+            return None
+        except ValidationError as e:
+            self.stats["errors"] += 1
+            logger.warning("Unexpected payload for %s job %s: %s", progress.name, job, e.error_count())
+            return None
+
+        rows = [movie_row(film) for film in films]
+        self.stats["skipped"] += sum(row is None for row in rows)
+        return [row for row in rows if row is not None]
+
+    async def write(self, force: bool = False):
+        # Строки пишутся пакетами; после коммита отмечаем задания и сохраняем контрольную точку
+        async with self._write_lock:
+            if not force and len(self._rows) < self.batch_size:
+                return
+            rows, jobs = list(self._rows.values()), self._pending_jobs
+            self._rows, self._pending_jobs = {}, []
+            for start in range(0, len(rows), self.batch_size):
+                async with get_sessionmaker()() as db:
+                    await upsert_movies(db, rows[start:start + self.batch_size])
+            self.stats["rows"] += len(rows)
+            for progress, job in jobs:
+                progress.complete(job)
+            self.checkpoint.save(self.sources, self.quota)
+
+    async def worker(self):
+        while True:
+            if not self.quota.allows(self.quota_share):
+                self.stopped_by_quota = True
+                return
+            next_job = self._next_job()
+            if next_job is None:
+                return
+            progress, job = next_job
+            rows = await self.run_job(progress, job)
+            if rows is None:
+                continue
+            for row in rows:
+                self._rows[row["kinopoisk_id"]] = row
+            self._pending_jobs.append((progress, job))
+            await self.write()
+
+    async def report(self, interval: float, started: float):
+        while True:
+            await asyncio.sleep(interval)
+            elapsed = time.monotonic() - started
+            logger.info("%s requests (%.1f/s), %s rows (%.1f/s), %s not found, %s errors",
+                        self.stats["requests"], self.stats["requests"] / elapsed,
+                        self.stats["rows"], self.stats["rows"] / elapsed,
+                        self.stats["not_found"], self.stats["errors"])
+
+    async def run(self, report_interval: float = 10) -> dict:
+        started = time.monotonic()
+        reporter = asyncio.create_task(self.report(report_interval, started))
+        try:
+            # Первая страница подборки задаёт число страниц; до этого параллельно не ходим
+            for progress in list(self.sources):
+                if progress.name.startswith("collection:") and progress.end is None:
+                    job = progress.take()
+                    rows = await self.run_job(progress, job)
+                    if rows is None or progress.end is None:
+                        # Первая страница не получена: подборка пропускается до следующего запуска
+                        logger.warning("Skipping %s: the first page is unavailable", progress.name)
+                        self.sources.remove(progress)
+                        continue
+                    for row in rows:
+                        self._rows[row["kinopoisk_id"]] = row
+                    self._pending_jobs.append((progress, job))
+            await asyncio.gather(*(self.worker() for _ in range(self.concurrency)))
+        finally:
+            reporter.cancel()
+            await self.write(force=True)
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.stats,
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(self.stats["requests"] / elapsed, 2) if elapsed else 0,
+            "rows_per_s": round(self.stats["rows"] / elapsed, 2) if elapsed else 0,
+            "stopped_by_quota": self.stopped_by_quota,
+            "sources": {progress.name: {"watermark": progress.watermark, "end": progress.end}
+                        for progress in self.sources},
+        }
+
+
+def build_sources(collections: list[str], ranges: list[tuple[int, int]]) -> list[SourceProgress]:
+    sources = [SourceProgress(f"collection:{name}", 1, None) for name in collections]
+    sources += [SourceProgress(f"ids:{start}-{end}", start, end) for start, end in ranges]
+    return sources
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", default=[],
+                        help="Kinopoisk collection type, e.g. TOP_POPULAR_ALL, TOP_250_MOVIES")
+    parser.add_argument("--ids", action="append", type=parse_range, default=[], help="Film id range, e.g. 1-100000")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--rate", type=float, default=10, help="Upstream requests per second")
+    parser.add_argument("--quota-share", type=float, default=0.5, help="Share of KINOPOISK_DAILY_QUOTA to use")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per upsert")
+    parser.add_argument("--checkpoint", default=".cache/ingest-checkpoint.json", help="Progress file")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved progress")
+    parser.add_argument("--report-interval", type=float, default=10, help="Progress log period, seconds")
+    args = parser.parse_args(argv)
+    if not args.collection and not args.ids:
+        parser.error("nothing to ingest: pass --collection and/or --ids")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.restart:
+        # Прогресс сбрасывается, а израсходованная сегодня квота — нет
+        checkpoint.state = {key: value for key, value in checkpoint.state.items() if key == QUOTA_KEY}
+    sources = build_sources(args.collection, args.ids)
+    for progress in sources:
+        checkpoint.restore(progress)
+    quota = UpstreamQuota()
+    checkpoint.restore_quota(quota)
+
+    ingester = Ingester(sources, checkpoint, args.concurrency, args.rate, quota, args.quota_share,
+                        args.batch_size)
+    try:
+        report = await ingester.run(args.report_interval)
+    finally:
+        await close_provider()
+        await dispose_engine()
+    print(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,184 @@
+"""
+Production entry point: a pre-forking master running N uvicorn workers on one shared socket.
+
+Usage:
+    python -m app.server --workers 4 --port 8000
+
+The application is imported once in the master (preload) and inherited by the forked workers,
+so they start fast and share the imported code pages. Signals to the master:
+
+    SIGTERM, SIGINT   graceful shutdown: workers finish in-flight requests (--graceful-timeout),
+                      then run the lifespan shutdown (SHUTDOWN_HOOK_TIMEOUT + SHUTDOWN_CLOSE_TIMEOUT)
+    SIGHUP            graceful reload: workers are replaced one by one, the socket stays open
+    SIGTTIN, SIGTTOU  add or remove one worker
+
+With preload, a reload restarts workers (re-running startup, re-reading settings that are read at
+startup) but does not re-import the code; restart the master to deploy new code.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import uvicorn
+from uvicorn.importer import import_from_string
+from app.core.config import settings
+
+logger = logging.getLogger("app.server")
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU)
+
+
+def create_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """
+    Master process: forks workers, restarts the ones that die and handles shutdown and reload signals.
+    """
+
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: int):
+        self.app = app
+        self.sock = sock
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        # Воркер убивается, только если не успел и дождаться запросов, и выполнить остановку приложения
+        self.kill_timeout = graceful_timeout + settings.SHUTDOWN_HOOK_TIMEOUT + settings.SHUTDOWN_CLOSE_TIMEOUT
+        self.workers = set()
+        self._signals = []
+        self._stopping = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            logger.info("Started worker %s", pid)
+            return pid
+
+        # Воркер: обработчики сигналов мастера не нужны, uvicorn установит свои
+        for sig in HANDLED_SIGNALS:
+            signal.signal(sig, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            config = uvicorn.Config(self.app, lifespan="on", proxy_headers=True,
+                                    timeout_graceful_shutdown=self.graceful_timeout)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def stop_worker(self, pid: int, wait: bool = True):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.workers.discard(pid)
+            return
+        if wait:
+            self.wait_for({pid})
+
+    def wait_for(self, pids: set):
+        # Ждём завершения воркеров; не успевшие за kill_timeout убиваются
+        deadline = time.monotonic() + self.kill_timeout
+        while pids and time.monotonic() < deadline:
+            self.reap(respawn=False)
+            pids &= self.workers
+            time.sleep(0.1)
+        for pid in pids:
+            logger.warning("Killing worker %s after %s s shutdown timeout", pid, self.kill_timeout)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while pids & self.workers:
+            self.reap(respawn=False)
+            time.sleep(0.05)
+
+    def reap(self, respawn: bool = True):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if respawn and not self._stopping:
+                    logger.warning("Worker %s exited with status %s, restarting", pid, status)
+
+    def reload(self):
+        # Воркеры заменяются по одному, чтобы сокет всё время обслуживался
+        logger.info("Reloading %s workers", len(self.workers))
+        for pid in list(self.workers):
+            self.spawn()
+            self.stop_worker(pid)
+
+    def handle_signal(self, sig, frame):
+        self._signals.append(sig)
+
+    def run(self):
+        for sig in HANDLED_SIGNALS:
+            signal.signal(sig, self.handle_signal)
+
+        logger.info("Master %s listening on %s with %s workers", os.getpid(), self.sock.getsockname(),
+                    self.num_workers)
+        while True:
+            while self._signals:
+                sig = self._signals.pop(0)
+                if sig in (signal.SIGTERM, signal.SIGINT):
+                    self.shutdown()
+                    return
+                if sig == signal.SIGHUP:
+                    self.reload()
+                elif sig == signal.SIGTTIN:
+                    self.num_workers += 1
+                elif sig == signal.SIGTTOU and self.num_workers > 1:
+                    self.num_workers -= 1
+
+            self.reap()
+            while len(self.workers) < self.num_workers:
+                self.spawn()
+            while len(self.workers) > self.num_workers:
+                self.stop_worker(max(self.workers))
+            time.sleep(0.2)
+
+    def shutdown(self):
+        logger.info("Shutting down %s workers", len(self.workers))
+        self._stopping = True
+        for pid in list(self.workers):
+            self.stop_worker(pid, wait=False)
+        self.wait_for(set(self.workers))
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="ASGI application, module:attribute")
+    parser.add_argument("--factory", action="store_true", help="Treat --app as an application factory")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.WORKER_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [master] %(message)s")
+    sock = create_socket(args.host, args.port)
+    # Предзагрузка: приложение импортируется один раз, воркеры наследуют его при fork
+    app = import_from_string(args.app)
+    if args.factory:
+        app = app()
+    Arbiter(app, sock, args.workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
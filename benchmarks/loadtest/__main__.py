@@ -0,0 +1,163 @@
+"""
+End-to-end load test: boots the API against a local stub Kinopoisk server and a scratch database,
+drives it with an asyncio load generator and reports RPS and p50/p95/p99 per endpoint.
+
+Usage:
+    python -m benchmarks.loadtest --users 50 --duration 30 --output loadtest.json
+    python -m benchmarks.loadtest --latency 0.1 --error-rate 0.02 --payload-size 8192 \
+        --mix search=50,details=50
+    python -m benchmarks.loadtest --baseline loadtest.json --max-regression 0.2   # exit code 1 on regression
+    python -m benchmarks.loadtest --record fixtures/          # record the stub's (or real) responses
+    python -m benchmarks.loadtest --replay fixtures/ --replay-latency 0.02
+
+By default the database is a temporary SQLite file; pass --database-url to use a scratch Postgres
+database (its tables are created if missing). --app-url skips booting and targets a running API.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.loadtest.generator import DEFAULT_MIX, compare, parse_mix, run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout} s")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Measured period, seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured period before it, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Operation weights, e.g. search=35,details=35,favorites=15,add_favorite=10,remove_favorite=5")
+    parser.add_argument("--movies", type=int, default=10000, help="Size of the film id space")
+    parser.add_argument("--seed", type=int, help="Seed of the request sequence")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub Kinopoisk mean delay, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Stub Kinopoisk delay deviation, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stub Kinopoisk share of HTTP 500")
+    parser.add_argument("--payload-size", type=int, default=2048, help="Stub Kinopoisk bytes per film object")
+    parser.add_argument("--record", metavar="DIR", help="Record upstream responses to a fixture directory")
+    parser.add_argument("--replay", metavar="DIR", help="Serve upstream responses from a fixture directory")
+    parser.add_argument("--replay-latency", type=float, default=0.0, help="Fixed replay delay, seconds")
+    parser.add_argument("--database-url", help="Scratch database URL (default: temporary SQLite file)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the API")
+    parser.add_argument("--db-echo", action="store_true", help="Keep SQLAlchemy statement logging on")
+    parser.add_argument("--app-url", help="Target an already running API instead of booting one")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare with a previous report and fail on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95/RPS degradation")
+    args = parser.parse_args(argv)
+
+    processes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            app_url = args.app_url
+            if app_url is None:
+                stub_port, app_port = free_port(), free_port()
+                if args.replay is None:
+                    stub = subprocess.Popen([
+                        sys.executable, "-m", "benchmarks.loadtest.stub_kinopoisk", "--port", str(stub_port),
+                        "--latency", str(args.latency), "--jitter", str(args.jitter),
+                        "--error-rate", str(args.error_rate), "--payload-size", str(args.payload_size),
+                        "--movies", str(args.movies),
+                    ], cwd=ROOT)
+                    processes.append(stub)
+                    await wait_ready(f"http://127.0.0.1:{stub_port}/health", stub)
+
+                env = {
+                    **os.environ,
+                    "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{tmp}/loadtest.sqlite3",
+                    "KINOPOISK_API_URL": f"http://127.0.0.1:{stub_port}",
+                    "KINOPOISK_API_KEY": "loadtest",
+                    "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "loadtest-secret"),
+                    "LOG_LEVEL": "WARNING",
+                    "DB_SCHEMA_MODE": "skip",
+                    "DB_ECHO": "true" if args.db_echo else "false",
+                    "CACHE_WARM_INTERVAL": "0",
+                    # Нагрузка идёт от нескольких тестовых пользователей, лимит исказил бы замеры
+                    "RATE_LIMIT_RATE": "0",
+                }
+                if args.record:
+                    env.update(KINOPOISK_PROVIDER="record", KINOPOISK_FIXTURES_DIR=os.path.abspath(args.record))
+                elif args.replay:
+                    env.update(KINOPOISK_PROVIDER="replay", KINOPOISK_FIXTURES_DIR=os.path.abspath(args.replay),
+                               KINOPOISK_REPLAY_LATENCY=str(args.replay_latency))
+                # Схема создаётся один раз до старта, а не каждым воркером
+                subprocess.run([
+                    sys.executable, "-c",
+                    "import asyncio; from app.db.session import create_db_and_tables, dispose_engine\n"
+                    "async def prepare():\n"
+                    "    await create_db_and_tables()\n"
+                    "    await dispose_engine()\n"
+                    "asyncio.run(prepare())",
+                ], cwd=ROOT, env=env, check=True)
+                app = subprocess.Popen([
+                    sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+                    "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+                ], cwd=ROOT, env=env)
+                processes.append(app)
+
+                app_url = f"http://127.0.0.1:{app_port}"
+                await wait_ready(f"{app_url}/metrics", app)
+
+            report = await run_load(app_url, args.users, args.duration, args.warmup, args.mix, args.movies, args.seed)
+        finally:
+            for process in reversed(processes):
+                stop(process)
+
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    # Базовый отчёт читается до записи нового: --output может указывать на тот же файл
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
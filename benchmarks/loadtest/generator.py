@@ -0,0 +1,224 @@
+import asyncio
+import random
+import statistics
+import time
+import uuid
+import httpx
+
+# Запросы для поиска: набор слов, чтобы часть ответов попадала в кеш, а часть нет
+SEARCH_WORDS = (
+    "матрица", "брат", "аватар", "титаник", "интерстеллар", "начало", "джокер", "дюна", "чужой", "терминатор",
+    "крестный отец", "леон", "гладиатор", "форрест гамп", "зеленая миля", "побег", "престиж", "остров", "бойцовский клуб",
+)
+
+DEFAULT_MIX = {"search": 35, "details": 35, "favorites": 15, "add_favorite": 10, "remove_favorite": 5}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    # "search=40,details=40,favorites=20" -> веса операций
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation: {name.strip()}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Recorder:
+    """
+    Collects request latencies and errors per operation, ignoring the warmup period.
+    """
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, started: float, elapsed: float, status: int | None):
+        if started < self.measure_from:
+            return
+        self.latencies.setdefault(name, []).append(elapsed)
+        if status is None or status >= 400:
+            key = str(status) if status is not None else "exception"
+            self.errors.setdefault(name, {}).setdefault(key, 0)
+            self.errors[name][key] += 1
+
+    def report(self, duration: float) -> dict:
+        def summary(values: list[float], errors: int) -> dict:
+            return {
+                "count": len(values),
+                "errors": errors,
+                "rps": round(len(values) / duration, 1),
+                "mean_ms": round(statistics.fmean(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+
+        all_values = [value for values in self.latencies.values() for value in values]
+        total_errors = sum(sum(errors.values()) for errors in self.errors.values())
+        return {
+            "duration_s": round(duration, 3),
+            "total": summary(all_values, total_errors) if all_values else {},
+            "endpoints": {
+                name: {**summary(values, sum(self.errors.get(name, {}).values())),
+                       "error_statuses": self.errors.get(name, {})}
+                for name, values in sorted(self.latencies.items())
+            },
+        }
+
+
+class VirtualUser:
+    """
+    One simulated client: registers and logs in, then issues a weighted mix of requests until the deadline.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, mix: dict, movies: int, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.movies = movies
+        self.rng = rng
+        self.headers = {}
+        self.favorites = set()
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(name, started, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(name, started, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def login(self, username: str):
+        credentials = {"username": username, "password": "loadtest-password"}
+        await self.request("register", "POST", "/register", json=credentials)
+        response = await self.request("login", "POST", "/login", json=credentials)
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f"Login failed for {username}")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def search(self):
+        await self.request("search", "GET", "/search", params={"query": self.rng.choice(SEARCH_WORDS)},
+                           headers=self.headers)
+
+    async def details(self):
+        await self.request("details", "GET", f"/movies/{self.rng.randint(1, self.movies)}", headers=self.headers)
+
+    async def favorites_list(self):
+        await self.request("favorites", "GET", "/favorites", headers=self.headers)
+
+    async def add_favorite(self):
+        kinopoisk_id = self.rng.randint(1, self.movies)
+        if kinopoisk_id in self.favorites:
+            return
+        payload = {"kinopoisk_id": kinopoisk_id, "title": f"Фильм {kinopoisk_id}", "year": 2000}
+        response = await self.request("add_favorite", "POST", "/movies/favorites", json=payload, headers=self.headers)
+        if response is not None and response.status_code == 200:
+            self.favorites.add(kinopoisk_id)
+
+    async def remove_favorite(self):
+        if not self.favorites:
+            return await self.add_favorite()
+        kinopoisk_id = self.favorites.pop()
+        await self.request("remove_favorite", "DELETE", f"/movies/favorites/{kinopoisk_id}", headers=self.headers)
+
+    async def run(self, deadline: float):
+        actions = {
+            "search": self.search,
+            "details": self.details,
+            "favorites": self.favorites_list,
+            "add_favorite": self.add_favorite,
+            "remove_favorite": self.remove_favorite,
+        }
+        while time.perf_counter() < deadline:
+            [name] = self.rng.choices(self.operations, self.weights)
+            await actions[name]()
+
+
+async def run_load(base_url: str, users: int, duration: float, warmup: float, mix: dict, movies: int,
+                   seed: int = None) -> dict:
+    """
+    Description:
+    ------------
+        Drives the API with concurrent virtual users and summarizes latencies per operation.
+
+    Parameters:
+    -----------
+        base_url (str):
+            The API address, e.g. http://127.0.0.1:8000.
+        users (int):
+            Concurrent virtual users; each keeps one request in flight.
+        duration (float):
+            Measured period in seconds.
+        warmup (float):
+            Period in seconds before measurement starts; requests issued during it are not recorded.
+        mix (dict[str, float]):
+            Relative weights of the operations (see DEFAULT_MIX).
+        movies (int):
+            Size of the film id space used for details and favorites.
+        seed (int, optional):
+            Seed of the request sequence, for reproducible runs.
+
+    Returns:
+    --------
+        dict:
+            RPS, error counts and p50/p95/p99 latencies, in total and per operation.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        recorder = Recorder(measure_from=float("inf"))
+        virtual_users = [VirtualUser(client, recorder, mix, movies, random.Random(rng.random())) for _ in range(users)]
+        # Регистрация и вход не входят в измеряемый период: bcrypt намеренно медленный
+        await asyncio.gather(*(user.login(f"load-{run_id}-{index}") for index, user in enumerate(virtual_users)))
+
+        start = time.perf_counter()
+        recorder.measure_from = start + warmup
+        deadline = recorder.measure_from + duration
+        await asyncio.gather(*(user.run(deadline) for user in virtual_users))
+        measured = time.perf_counter() - recorder.measure_from
+
+    return recorder.report(measured)
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Description:
+    ------------
+        Compares a run with a baseline report and lists the regressions.
+
+    Parameters:
+    -----------
+        report (dict):
+            The current run, as returned by run_load().
+        baseline (dict):
+            A previous run.
+        max_regression (float):
+            Allowed relative degradation, e.g. 0.2 for 20% higher p95 or 20% lower RPS.
+
+    Returns:
+    --------
+        list[str]:
+            Human-readable descriptions of the regressions; empty if the run passes.
+    """
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = report["endpoints"].get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: {current['rps']} rps < baseline {base['rps']} rps")
+    return regressions
@@ -0,0 +1,138 @@
+"""
+Local stub of the Kinopoisk API for load tests.
+
+Usage:
+    python -m benchmarks.loadtest.stub_kinopoisk --port 8765 --latency 0.05 --error-rate 0.01 --payload-size 2048
+
+Serves /api/v2.1/films/search-by-keyword and /api/v2.2/films/{id} with synthetic payloads of the
+real shape, after a configurable delay and with a configurable share of 500 errors.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from functools import lru_cache
+import orjson
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+GENRES = ("драма", "комедия", "боевик", "триллер", "фантастика", "мультфильм")
+COUNTRIES = ("Россия", "США", "Франция", "Япония")
+
+
+def padded_description(kinopoisk_id: int, size: int) -> str:
+    text = f"Описание фильма {kinopoisk_id}. "
+    return (text * (size // len(text.encode()) + 1))[:max(0, size // 2)]
+
+
+def film_detail(kinopoisk_id: int, payload_size: int) -> dict:
+    return {
+        "kinopoiskId": kinopoisk_id,
+        "nameRu": f"Фильм {kinopoisk_id}",
+        "year": 1950 + kinopoisk_id % 75,
+        "description": padded_description(kinopoisk_id, payload_size),
+        "ratingKinopoisk": round(5 + kinopoisk_id % 50 / 10, 1),
+        "filmLength": 90 + kinopoisk_id % 60,
+        "posterUrl": f"https://kinopoiskapiunofficial.tech/images/posters/kp/{kinopoisk_id}.jpg",
+        "genres": [{"genre": GENRES[kinopoisk_id % len(GENRES)]}],
+        "countries": [{"country": COUNTRIES[kinopoisk_id % len(COUNTRIES)]}],
+    }
+
+
+def search_film(kinopoisk_id: int, payload_size: int) -> dict:
+    return {
+        "filmId": kinopoisk_id,
+        "nameRu": f"Фильм {kinopoisk_id}",
+        "year": str(1950 + kinopoisk_id % 75),
+        "description": padded_description(kinopoisk_id, payload_size),
+        "rating": f"{5 + kinopoisk_id % 50 / 10:.1f}",
+        "posterUrl": f"https://kinopoiskapiunofficial.tech/images/posters/kp/{kinopoisk_id}.jpg",
+    }
+
+
+def create_app(latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0, payload_size: int = 2048,
+               search_results: int = 20, movies: int = 10000) -> Starlette:
+    """
+    Description:
+    ------------
+        Builds the stub application.
+
+    Parameters:
+    -----------
+        latency (float):
+            Mean response delay in seconds.
+        jitter (float):
+            Maximum deviation from the mean delay in seconds, uniformly distributed.
+        error_rate (float):
+            Share of requests answered with HTTP 500.
+        payload_size (int):
+            Approximate size in bytes of one film object.
+        search_results (int):
+            Films per search response.
+        movies (int):
+            Size of the id space; search results are drawn from it deterministically by keyword.
+
+    Returns:
+    --------
+        Starlette:
+            The ASGI application.
+    """
+
+    @lru_cache(maxsize=4096)
+    def detail_body(kinopoisk_id: int) -> bytes:
+        return orjson.dumps(film_detail(kinopoisk_id, payload_size))
+
+    @lru_cache(maxsize=1024)
+    def search_body(keyword: str) -> bytes:
+        rng = random.Random(keyword)
+        ids = [rng.randint(1, movies) for _ in range(search_results)]
+        return orjson.dumps({
+            "keyword": keyword,
+            "pagesCount": 1,
+            "searchFilmsCountResult": len(ids),
+            "films": [search_film(kinopoisk_id, payload_size) for kinopoisk_id in ids],
+        })
+
+    async def respond(body_factory) -> Response:
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        if random.random() < error_rate:
+            return Response(b'{"message": "Internal error"}', status_code=500, media_type="application/json")
+        return Response(body_factory(), media_type="application/json")
+
+    async def search(request: Request):
+        return await respond(lambda: search_body(request.query_params.get("keyword", "")))
+
+    async def details(request: Request):
+        return await respond(lambda: detail_body(request.path_params["kinopoisk_id"]))
+
+    async def health(request: Request):
+        return Response(b"ok")
+
+    return Starlette(routes=[
+        Route("/api/v2.1/films/search-by-keyword", search),
+        Route("/api/v2.2/films/{kinopoisk_id:int}", details),
+        Route("/health", health),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response delay, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform delay deviation, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of HTTP 500 responses")
+    parser.add_argument("--payload-size", type=int, default=2048, help="Approximate bytes per film object")
+    parser.add_argument("--search-results", type=int, default=20, help="Films per search response")
+    parser.add_argument("--movies", type=int, default=10000, help="Size of the film id space")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.payload_size, args.search_results, args.movies)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
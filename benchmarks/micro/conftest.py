@@ -0,0 +1,58 @@
+import os
+import random
+import pytest
+
+# Модули приложения читают настройки при импорте
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+# Размер синтетических данных: на больших объёмах видна стоимость одного вызова
+ITEMS = int(os.environ.get("BENCHMARK_ITEMS", 10000))
+
+
+@pytest.fixture(scope="session")
+def items() -> int:
+    return ITEMS
+
+
+@pytest.fixture(scope="session")
+def raw_years(items) -> list:
+    # Как в ответах Kinopoisk: строки, числа, "null" и мусор
+    rng = random.Random(1)
+    choices = [lambda: str(rng.randint(1900, 2025)), lambda: rng.randint(1900, 2025), lambda: "null",
+               lambda: None, lambda: "1999-2003"]
+    return [rng.choice(choices)() for _ in range(items)]
+
+
+@pytest.fixture(scope="session")
+def raw_ratings(items) -> list:
+    rng = random.Random(2)
+    choices = [lambda: f"{rng.uniform(1, 10):.1f}", lambda: round(rng.uniform(1, 10), 1), lambda: "null",
+               lambda: None, lambda: "99%"]
+    return [rng.choice(choices)() for _ in range(items)]
+
+
+@pytest.fixture(scope="session")
+def search_payload(items) -> bytes:
+    import orjson
+    rng = random.Random(3)
+    return orjson.dumps({
+        "keyword": "фильм",
+        "pagesCount": 1,
+        "films": [
+            {
+                "filmId": i,
+                "nameRu": f"Фильм номер {i}" if i % 10 else None,
+                "nameEn": f"Movie {i}",
+                "year": str(rng.randint(1900, 2025)) if i % 7 else "null",
+                "description": "Описание фильма " * 8,
+                "rating": f"{rng.uniform(1, 10):.1f}" if i % 5 else "null",
+                "posterUrl": f"https://kinopoiskapiunofficial.tech/images/posters/kp/{i}.jpg",
+            } for i in range(items)
+        ],
+    })
+
+
+@pytest.fixture(scope="session")
+def favorite_rows(items) -> list[dict]:
+    return [{"kinopoisk_id": i, "title": f"Фильм номер {i}", "year": 1950 + i % 75} for i in range(items)]
@@ -0,0 +1,61 @@
+"""
+Micro-benchmarks of the hot helpers on large synthetic payloads (BENCHMARK_ITEMS, default 10000).
+
+Usage:
+    pytest benchmarks/micro --benchmark-autosave                          # store a baseline
+    pytest benchmarks/micro --benchmark-compare --benchmark-compare-fail=median:10%
+"""
+from datetime import timedelta
+from app.core.core_jwt import create_access_token, decode_access_token
+from app.core.serialization import favorite_list_adapter, movie_list_adapter, parse_payload, search_page_adapter
+from schemas import FavoriteOut, Movie, parse_rating, parse_year
+
+
+def test_parse_year(benchmark, raw_years):
+    result = benchmark(lambda: [parse_year(value) for value in raw_years])
+    assert len(result) == len(raw_years)
+
+
+def test_parse_rating(benchmark, raw_ratings):
+    result = benchmark(lambda: [parse_rating(value) for value in raw_ratings])
+    assert len(result) == len(raw_ratings)
+
+
+def test_search_page_validation(benchmark, search_payload, items):
+    # Путь search_movies: байты ответа -> список Movie за один проход
+    page = benchmark(parse_payload, search_page_adapter, search_payload)
+    assert len(page.films) == items
+
+
+def test_movie_list_serialization(benchmark, search_payload):
+    films = parse_payload(search_page_adapter, search_payload).films
+    body = benchmark(movie_list_adapter.dump_json, films)
+    assert body.startswith(b"[")
+
+
+def test_movie_construction(benchmark, items):
+    # Построение Movie по одному, как в циклах маршрутов до перехода на TypeAdapter
+    rows = [{"kinopoisk_id": i, "title": f"Фильм {i}", "year": 2000, "rating": 7.5} for i in range(items)]
+    result = benchmark(lambda: [Movie(**row) for row in rows])
+    assert len(result) == items
+
+
+def test_create_access_token(benchmark):
+    token = benchmark(create_access_token, {"id": 1}, timedelta(hours=1))
+    assert token.count(".") == 2
+
+
+def test_decode_access_token(benchmark):
+    token = create_access_token({"id": 1}, timedelta(hours=1))
+    payload = benchmark(decode_access_token, token)
+    assert payload["id"] == 1
+
+
+def test_favorite_list_serialization(benchmark, favorite_rows):
+    body = benchmark(favorite_list_adapter.dump_json, favorite_rows)
+    assert body.startswith(b"[")
+
+
+def test_favorite_out_validation(benchmark, favorite_rows):
+    result = benchmark(lambda: [FavoriteOut.model_validate(row) for row in favorite_rows])
+    assert len(result) == len(favorite_rows)
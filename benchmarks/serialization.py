@@ -0,0 +1,82 @@
+"""
+Per-item serialization cost of list responses: FastAPI response_model path vs precompiled TypeAdapter.
+
+Usage:
+    python -m benchmarks.serialization --items 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from fastapi.responses import ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from app.core.serialization import movie_list_adapter, favorite_list_adapter  # noqa: E402
+from schemas import Movie, FavoriteOut  # noqa: E402
+
+
+def make_movies(count: int) -> list[Movie]:
+    return [
+        Movie(
+            kinopoisk_id=i,
+            title=f"Фильм номер {i}",
+            year=1950 + i % 75,
+            description="Описание фильма " * 8,
+            rating=round(5 + (i % 50) / 10, 1),
+            poster_url=f"https://kinopoiskapiunofficial.tech/images/posters/kp/{i}.jpg",
+        ) for i in range(count)
+    ]
+
+
+def make_favorites(count: int) -> list[dict]:
+    return [{"kinopoisk_id": i, "title": f"Фильм номер {i}", "year": 1950 + i % 75} for i in range(count)]
+
+
+async def response_model_path(field, content) -> bytes:
+    # То, что делает FastAPI для значения, возвращённого из эндпойнта с response_model
+    value = await serialize_response(field=field, response_content=content)
+    return ORJSONResponse(value).body
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Items per response")
+    parser.add_argument("--repeat", type=int, default=50, help="Responses serialized per measurement")
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    cases = {
+        "search": (make_movies(args.items), movie_list_adapter, list[Movie]),
+        "favorites": (make_favorites(args.items), favorite_list_adapter, list[FavoriteOut]),
+    }
+
+    results = {}
+    for name, (content, adapter, response_type) in cases.items():
+        field = create_model_field(name="Response", type_=response_type, mode="serialization")
+        before = measure(lambda: loop.run_until_complete(response_model_path(field, content)), args.repeat)
+        after = measure(lambda: adapter.dump_json(content), args.repeat)
+        results[name] = {
+            "items": args.items,
+            "response_model_us_per_item": round(before / args.items * 1e6, 3),
+            "type_adapter_us_per_item": round(after / args.items * 1e6, 3),
+            "speedup": round(before / after, 1),
+        }
+
+    loop.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
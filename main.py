@@ -1,41 +1,154 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
+from app.core.cache import movie_cache
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.lifecycle import InFlightMiddleware, lifecycle
+from app.core.log import RequestIdMiddleware, setup_logging
+from app.core.metrics import MetricsMiddleware, monitor_event_loop_lag
+from app.core.posters import poster_store
+from app.core.providers import close_provider
+from app.core.profiling import ContinuousProfiler, ProfilingMiddleware
+from app.core.tracing import OtlpJsonFileExporter, TracingMiddleware, tracer
+from app.core.revocation import token_denylist
+from app.core.suggest import suggest_index
+from app.core.warming import CacheWarmer
 from app.api import user
 from app.api import movie
-from app.db.session import create_db_and_tables
-import uvicorn
+from app.api import metrics
+from app.api import admin
+from app.api import dashboard
+from app.db.crud import get_movie_titles, get_popular_kinopoisk_ids
+from app.db.session import dispose_engine, get_sessionmaker, init_db_schema
+from app.db.writebehind import favorite_writes
 
-# Инициализация FastAPI
-app = FastAPI(title="Movie Favorite API")
 
+# Запуск и остановка приложения: фоновые задачи, логирование, проверка схемы базы данных
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Логи пишутся фоновым потоком, event loop только кладёт записи в очередь
+    app.state.log_listener = setup_logging()
+    # По умолчанию только сверяем ревизию Alembic, без create_all на каждом воркере
+    # (миграции применяются через `alembic upgrade head`)
+    await init_db_schema()
+    # Фильтр отозванных токенов строится до приёма запросов, затем догружает отзывы других воркеров
+    await token_denylist.refresh(full=True)
+    app.state.denylist_task = asyncio.create_task(token_denylist.run())
+    # Отложенная запись избранного: восстановление журналов остановленных воркеров, финальный сброс — хуком остановки
+    if settings.FAVORITES_WRITE_BEHIND:
+        await favorite_writes.start()
+    # Фоновый замер задержки event loop
+    app.state.loop_lag_task = asyncio.create_task(monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL))
+    # Постоянное профилирование с низкой частотой, если включено
+    app.state.profiler = ContinuousProfiler().start() if settings.PROFILING_SAMPLE_INTERVAL > 0 else None
+    # Экспорт трасс в файл OTLP/JSON, если задан
+    if settings.TRACE_OTLP_FILE:
+        tracer.exporters.append(OtlpJsonFileExporter(settings.TRACE_OTLP_FILE))
+    # Прогрев кеша деталей фильмов в фоне в пределах доли квоты Kinopoisk API
+    app.state.cache_warmer_task = None
+    if settings.CACHE_WARM_INTERVAL > 0:
+        warmer = CacheWarmer(movie_cache, movie.refresh_movie_entry, popular_favorite_ids)
+        app.state.cache_warmer_task = asyncio.create_task(warmer.run())
+    # Индекс подсказок /search/suggest: строится в фоне и догружает новые фильмы каталога
+    app.state.suggest_task = None
+    if settings.SUGGEST_REFRESH_INTERVAL > 0:
+        app.state.suggest_task = asyncio.create_task(suggest_index.run(catalog_titles))
 
-# Настройка CORS, если приложение будет доступно из разных источников
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Можно ограничить список разрешённых источников
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    yield
 
-app.include_router(user.router, tags=["users"])
-app.include_router(movie.router, tags=["movies"])
+    # Остановка: сервер уже закрыл сокет и дождался текущих запросов, фоновые задачи прерываются
+    app.state.loop_lag_task.cancel()
+    app.state.denylist_task.cancel()
+    if app.state.cache_warmer_task is not None:
+        app.state.cache_warmer_task.cancel()
+    if app.state.suggest_task is not None:
+        app.state.suggest_task.cancel()
+    # Сброс буферов, пока база данных и клиенты ещё открыты
+    await lifecycle.run_shutdown_hooks(settings.SHUTDOWN_HOOK_TIMEOUT)
+    if app.state.profiler is not None:
+        app.state.profiler.stop()
+    # Закрываем источник данных Kinopoisk (режим record дописывает индекс записанных ответов)
+    await close_provider()
+    await poster_store.close()
+    if movie_cache.shared is not None:
+        movie_cache.shared.close()
+    await dispose_engine()
+    tracer.shutdown()
+    app.state.log_listener.stop()
 
 
-# Миграции базы данных при старте приложения (если необходимо)
-@app.on_event("startup")
-async def on_startup():
-    # Создание базы данных и таблиц (если они ещё не созданы)
-    await create_db_and_tables()
+# Самые популярные в избранном фильмы; у фоновой задачи своя сессия БД
+async def popular_favorite_ids(limit: int) -> list[int]:
+    async with get_sessionmaker()() as db:
+        return await get_popular_kinopoisk_ids(db, limit)
 
 
-# Указываем способ работы с базой данных для маршрутов (если это необходимо)
-@app.on_event("shutdown")
-async def shutdown():
-    # Код для корректного завершения работы приложения
-    pass
+# Страница названий каталога для индекса подсказок
+async def catalog_titles(after_id: int, limit: int) -> list[dict]:
+    async with get_sessionmaker()() as db:
+        return await get_movie_titles(db, after_id, limit)
 
 
-# Запуск приложения с uvicorn (если запускаете приложение через команду `python main.py`)
+def create_app() -> FastAPI:
+    """
+    Description:
+    ------------
+        Builds the FastAPI application with its middleware and routers.
+
+        Heavy resources are not created here: the database engine, the HTTP clients, the passlib
+        context and JWT are loaded on first use or in the lifespan, so importing the app is cheap.
+
+    Returns:
+    --------
+        FastAPI:
+            The configured application.
+    """
+    # Инициализация FastAPI
+    app = FastAPI(title="Movie Favorite API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+    # Настройка CORS, если приложение будет доступно из разных источников
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Можно ограничить список разрешённых источников
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Сжатие gzip/brotli по Accept-Encoding; маленькие и уже сжатые ответы пропускаются
+    app.add_middleware(CompressionMiddleware)
+
+    # Профилирование отдельного запроса по заголовку X-Profile от администратора
+    app.add_middleware(ProfilingMiddleware)
+
+    # Метрики запросов для /metrics; добавляется последним, чтобы учитывать время всех остальных middleware
+    app.add_middleware(MetricsMiddleware)
+
+    # Трассировка доли запросов (TRACE_SAMPLE_RATE): маршрут, авторизация, crud, сессия БД, Kinopoisk API
+    app.add_middleware(TracingMiddleware)
+
+    # Идентификатор запроса для логов и заголовка X-Request-ID
+    app.add_middleware(RequestIdMiddleware)
+
+    # Учёт запросов в обработке для /metrics
+    app.add_middleware(InFlightMiddleware)
+
+    app.include_router(user.router, tags=["users"])
+    app.include_router(movie.router, tags=["movies"])
+    app.include_router(dashboard.router, tags=["dashboard"])
+    app.include_router(metrics.router, tags=["metrics"])
+    app.include_router(admin.router, tags=["admin"])
+    return app
+
+
+app = create_app()
+
+
+# Запуск одного процесса для разработки; в продакшене — python -m app.server с несколькими воркерами
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import AliasChoices, BaseModel, BeforeValidator, ConfigDict, Field
+from typing import Annotated, List, Optional, Union
 
 
 # Схема для регистрации нового пользователя
@@ -62,11 +62,17 @@ class MovieDetail(MovieSearchResult):
         from_attributes = True
 
 
+# Пределы столбцов таблицы favorites (Integer — 32 бита, title — String(255)): изменение в режиме
+# отложенной записи подтверждается до записи в базу и должно быть заведомо применимо
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+FAVORITE_TITLE_MAX_LENGTH = 255
+
+
 # Схема для добавления фильма в избранное
 class FavoriteCreate(BaseModel):
-    kinopoisk_id: int
-    title: str
-    year: int
+    kinopoisk_id: int = Field(ge=1, le=INT32_MAX)
+    title: str = Field(max_length=FAVORITE_TITLE_MAX_LENGTH)
+    year: int = Field(ge=INT32_MIN, le=INT32_MAX)
 
     class Config:
         from_attributes = True
@@ -80,3 +86,159 @@ class FavoriteOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Схема подсказки /search/suggest
+class Suggestion(BaseModel):
+    kinopoisk_id: int
+    title: str
+    year: Optional[int] = None
+    rating: Optional[float] = None
+
+
+# Схема сводного ответа /me/dashboard
+class Dashboard(BaseModel):
+    profile: UserOut
+    favorites: List[FavoriteOut]
+    movies: List[MovieDetail]
+    unavailable: List[int]
+
+
+def parse_year(year: str) -> int | None:
+    """
+    Description:
+    ------------
+        Converts a string representing a movie's year to an integer or None.
+
+    Parameters:
+    -----------
+        year (str):
+            The year of the movie as a string.
+
+    Returns:
+    --------
+        int(year) | None
+
+        Returns an integer if the string can be successfully converted to a year, otherwise returns None.
+
+    Notes:
+    ------
+         If the year cannot be converted to an integer, the function returns None.
+    """
+    if year == 'null' or year is None:
+        return None
+    try:
+        return int(year)
+    except ValueError:
+        # Если не удалось преобразовать в int, возвращаем None
+        return None
+
+
+def parse_rating(rating: str) -> float | None:
+    """
+    Description:
+    ------------
+        Converts a string representing a movie's rating to a float or None.
+
+    Parameters:
+    -----------
+        rating (str):
+            The rating of the movie as a string.
+
+    Returns:
+    -------
+        float(rating) | None
+
+        Returns a float if the string can be successfully converted to a rating, otherwise returns None.
+
+    Notes:
+    ------
+         If the rating cannot be converted to a float, the function returns None.
+    """
+    if rating == 'null' or rating is None:
+        return None
+    try:
+        return float(rating)
+    except ValueError:
+        # Если не удалось преобразовать в float, возвращаем None
+        return None
+
+
+# Схемы ответов Kinopoisk API.
+# Нестрогое приведение собрано из union в режиме left_to_right: корректные значения ("2024", 8.5)
+# разбираются в pydantic-core без вызова Python, а запасной валидатор вызывается только для мусора
+# вроде "null" или "2010-2012" (parse_year/parse_rating) и возвращает значение по умолчанию.
+def _unknown_title(value):
+    return 'Unknown Title'
+
+
+def _names(key: str):
+    # [{"genre": "драма"}, ...] -> ["драма", ...]
+    def extract(items):
+        return [item[key] for item in items or []]
+    return extract
+
+
+LenientInt = Annotated[
+    Union[int, Annotated[Optional[int], BeforeValidator(parse_year)]],
+    Field(union_mode='left_to_right')
+]
+LenientFloat = Annotated[
+    Union[float, Annotated[Optional[float], BeforeValidator(parse_rating)]],
+    Field(union_mode='left_to_right')
+]
+LenientTitle = Annotated[Union[str, Annotated[str, BeforeValidator(_unknown_title)]], Field(union_mode='left_to_right')]
+
+
+# Фильм из ответа /api/v2.1/films/search-by-keyword; экземпляры сериализуются как Movie
+class KinopoiskSearchFilm(Movie):
+    model_config = ConfigDict(populate_by_name=True)
+
+    kinopoisk_id: int = Field(validation_alias='filmId')
+    title: LenientTitle = Field('Unknown Title', validation_alias='nameRu')
+    year: LenientInt = None
+    description: Optional[str] = ''
+    rating: LenientFloat = None
+    poster_url: Optional[str] = Field(None, validation_alias='posterUrl')
+
+
+# Ответ /api/v2.1/films/search-by-keyword
+class KinopoiskSearchPage(BaseModel):
+    films: Optional[List[KinopoiskSearchFilm]] = None
+
+
+# Фильм из ответа /api/v2.2/films/collections; экземпляры сериализуются как Movie
+class KinopoiskCollectionFilm(Movie):
+    model_config = ConfigDict(populate_by_name=True)
+
+    kinopoisk_id: int = Field(validation_alias='kinopoiskId')
+    title: LenientTitle = Field('Unknown Title', validation_alias='nameRu')
+    year: LenientInt = None
+    description: Optional[str] = ''
+    rating: LenientFloat = Field(None, validation_alias='ratingKinopoisk')
+    poster_url: Optional[str] = Field(None, validation_alias='posterUrl')
+
+
+# Ответ /api/v2.2/films/collections
+class KinopoiskCollectionPage(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    total_pages: int = Field(1, validation_alias='totalPages')
+    items: List[KinopoiskCollectionFilm] = []
+
+
+# Ответ /api/v2.2/films/{id}; экземпляры сериализуются как MovieDetail
+class KinopoiskFilmDetail(MovieDetail):
+    model_config = ConfigDict(populate_by_name=True)
+
+    kinopoisk_id: int = Field(validation_alias='kinopoiskId')
+    title: LenientTitle = Field(validation_alias='nameRu')
+    year: LenientInt = None
+    description: Optional[str] = ''
+    rating: LenientFloat = Field(None, validation_alias=AliasChoices('rating', 'ratingKinopoisk'))
+    countries: Annotated[List[str], BeforeValidator(_names('country'))] = []
+    genres: Annotated[List[str], BeforeValidator(_names('genre'))] = []
+    director: Optional[str] = ''
+    actors: Optional[List[str]] = []
+    duration: LenientInt = Field(None, validation_alias=AliasChoices('duration', 'filmLength'))
+    poster_url: Optional[str] = Field('', validation_alias='posterUrl')
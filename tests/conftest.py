@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.core.cache import movie_cache
+from app.core.config import settings
+from app.core.ratelimit import rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def clear_movie_cache():
+    # Кеш ответов общий для всего процесса, тесты не должны видеть чужие записи
+    movie_cache.clear()
+    yield
+    movie_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_rate_limits():
+    # Все тесты обращаются от имени одних и тех же пользователей
+    rate_limiter.clear()
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    # Токен пользователя 1, общий для тестов маршрутов с авторизацией
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": 1, "exp": expire}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
@@ -1,8 +1,6 @@
 import sys
 import os
 import pytest
-from fastapi.testclient import TestClient
-from main import app
 from app.db import crud
 from app.api.user import oauth2_scheme
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -34,11 +32,6 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-@pytest.fixture
-def client():
-    return TestClient(app)
-
-
 @pytest.fixture
 def mock_get_db(mocker):
     # Мокируем зависимость get_db, чтобы не использовать реальную базу данных
@@ -0,0 +1,90 @@
+import gzip
+import threading
+import brotli
+import pytest
+from unittest.mock import patch
+from app.core import compression
+from app.core.cache import build_entry, movie_cache
+from app.core.compression import negotiate_encoding
+
+
+@pytest.fixture
+def many_favorites():
+    return [{"kinopoisk_id": i, "title": f"Фильм {i}", "year": 2000 + i % 20} for i in range(200)]
+
+
+def test_negotiate_encoding():
+    """Тест выбора кодирования по Accept-Encoding."""
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+
+@pytest.mark.asyncio
+async def test_entry_compressed_off_event_loop():
+    """Тест: крупное тело записи кеша сжимается в потоке, мелкое не сжимается вовсе."""
+    threads = []
+    original = compression.compress
+
+    def recording_compress(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return original(*args, **kwargs)
+
+    with patch("app.core.cache.compress", recording_compress):
+        small = await build_entry(b"{}", 60)
+        large = await build_entry(b'{"films": []}' * 200, 60)
+
+    assert small.encodings == {}
+    assert set(large.encodings) == {"br", "gzip"}
+    assert threads and threading.get_ident() not in threads
+
+
+@patch("app.api.movie.get_favorite_rows_with_user_id")
+def test_large_response_is_compressed(mock_get_favorite_rows, client, auth_headers, many_favorites):
+    """Тест сжатия большого ответа gzip."""
+    mock_get_favorite_rows.return_value = many_favorites
+
+    response = client.get("/favorites", headers={**auth_headers, "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == many_favorites
+
+
+@patch("app.api.movie.get_favorite_rows_with_user_id")
+def test_small_response_is_not_compressed(mock_get_favorite_rows, client, auth_headers, many_favorites):
+    """Тест, что маленькие ответы отдаются без сжатия."""
+    mock_get_favorite_rows.return_value = many_favorites[:1]
+
+    response = client.get("/favorites", headers={**auth_headers, "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_cached_detail_is_served_precompressed(mock_get_kinopoisk_data, client, auth_headers):
+    """Тест, что повторный запрос деталей отдаётся из кеша в заранее сжатом виде."""
+    mock_get_kinopoisk_data.return_value = {
+        "kinopoiskId": 1,
+        "nameRu": "Тестовый фильм",
+        "year": 2024,
+        "description": "Очень длинное описание фильма. " * 100,
+        "genres": [{"genre": "драма"}],
+        "countries": [{"country": "Россия"}],
+    }
+
+    first = client.get("/movies/1", headers={**auth_headers, "Accept-Encoding": "br"})
+    second = client.get("/movies/1", headers={**auth_headers, "Accept-Encoding": "gzip"})
+
+    assert mock_get_kinopoisk_data.call_count == 1
+    assert first.headers["content-encoding"] == "br"
+    assert second.headers["content-encoding"] == "gzip"
+    assert first.json() == second.json()
+
+    entry = movie_cache.get("movie:1")
+    assert brotli.decompress(entry.encodings["br"]) == entry.body
+    assert gzip.decompress(entry.encodings["gzip"]) == entry.body
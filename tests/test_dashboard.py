@@ -0,0 +1,57 @@
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from app.core.providers import FakeProvider, set_provider
+from app.db.models import Base, Favorite, User
+
+FILMS = [{"kinopoiskId": kinopoisk_id, "nameRu": f"Фильм {kinopoisk_id}", "year": 2000 + kinopoisk_id}
+         for kinopoisk_id in (1, 2, 3)]
+
+
+@pytest.fixture
+def database(tmp_path):
+    # Файловая SQLite без пула: каждая сессия открывает соединение в своём event loop
+    path = tmp_path / "dashboard.sqlite3"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(id=1, username="viewer", hashed_password="x"))
+        db.add_all([Favorite(user_id=1, kinopoisk_id=kinopoisk_id, title=f"Фильм {kinopoisk_id}", year=2000)
+                    for kinopoisk_id in (1, 2, 3, 404)])
+        db.commit()
+    sync_engine.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    with patch("app.api.dashboard.get_sessionmaker", return_value=factory):
+        yield
+
+
+@pytest.fixture
+def fake_provider():
+    set_provider(FakeProvider(FILMS))
+    yield
+    set_provider(None)
+
+
+def test_dashboard(client, auth_headers, database, fake_provider):
+    """Тест сводного ответа: профиль, избранное и детали последних фильмов"""
+    response = client.get("/me/dashboard", params={"limit": 3}, headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["profile"] == {"id": 1, "username": "viewer"}
+    assert [row["kinopoisk_id"] for row in data["favorites"]] == [1, 2, 3, 404]
+    # Детали последних добавленных; недоступный фильм не ломает ответ
+    assert [movie["kinopoisk_id"] for movie in data["movies"]] == [3, 2]
+    assert data["movies"][0]["title"] == "Фильм 3"
+    assert data["unavailable"] == [404]
+
+
+def test_dashboard_requires_auth(client):
+    """Тест: без токена сводный ответ недоступен"""
+    response = client.get("/me/dashboard")
+    assert response.status_code == 401
@@ -0,0 +1,131 @@
+from unittest.mock import patch
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.core.providers import FakeProvider, set_provider
+from app.core.warming import UpstreamQuota
+from app.db.models import Base, MovieDB
+from app.ingest import Checkpoint, Ingester, SourceProgress, build_sources
+
+# Фильмы 1..45; у каждого десятого нет года, такие не сохраняются
+FILMS = [{"kinopoiskId": kinopoisk_id, "nameRu": f"Фильм {kinopoisk_id}",
+          "year": None if kinopoisk_id % 10 == 0 else 1990 + kinopoisk_id % 30, "ratingKinopoisk": 7.5}
+         for kinopoisk_id in range(1, 46)]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/catalog.sqlite3", poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    with patch("app.ingest.get_sessionmaker", return_value=factory):
+        yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+def fake_provider():
+    provider = FakeProvider(FILMS)
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+def make_ingester(sources, checkpoint, quota=None):
+    return Ingester(sources, checkpoint, concurrency=4, rate=10000, quota=quota or UpstreamQuota(limit=0),
+                    quota_share=1.0, batch_size=7)
+
+
+def test_source_progress_watermark():
+    """Тест: водяной знак продвигается только по непрерывно завершённым заданиям"""
+    progress = SourceProgress("ids:1-5", 1, 5)
+    jobs = [progress.take() for _ in range(3)]
+    progress.complete(jobs[2])
+    progress.complete(jobs[1])
+    assert progress.watermark == 0
+    progress.complete(jobs[0])
+    assert progress.watermark == 3
+
+
+@pytest.mark.asyncio
+async def test_ingest_and_resume(tmp_path, session_factory, fake_provider):
+    """Тест загрузки каталога пакетами, повторного запуска с контрольной точки и идемпотентности"""
+    checkpoint_path = tmp_path / "checkpoint.json"
+    sources = build_sources(["TOP_POPULAR_ALL"], [(40, 50)])
+    report = await make_ingester(sources, Checkpoint(checkpoint_path)).run()
+
+    # 3 страницы подборки и 11 фильмов по id, из них 5 не найдено
+    assert report["requests"] == 14
+    assert report["not_found"] == 5
+    assert report["sources"] == {"collection:TOP_POPULAR_ALL": {"watermark": 3, "end": 3},
+                                 "ids:40-50": {"watermark": 50, "end": 50}}
+    async with session_factory() as db:
+        assert await db.scalar(select(func.count()).select_from(MovieDB)) == 41
+        movie = await db.scalar(select(MovieDB).filter_by(kinopoisk_id=1))
+        assert (movie.title, movie.year, movie.rating) == ("Фильм 1", 1991, 7.5)
+
+    # Повторный запуск продолжает с контрольной точки и ничего не запрашивает
+    sources = build_sources(["TOP_POPULAR_ALL"], [(40, 50)])
+    checkpoint = Checkpoint(checkpoint_path)
+    for progress in sources:
+        checkpoint.restore(progress)
+    report = await make_ingester(sources, checkpoint).run()
+    assert report["requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ingest_stops_at_quota(tmp_path, session_factory, fake_provider):
+    """Тест: загрузка останавливается на своей доле квоты и сохраняет прогресс"""
+    checkpoint_path = tmp_path / "checkpoint.json"
+    sources = build_sources([], [(1, 45)])
+    report = await make_ingester(sources, Checkpoint(checkpoint_path), quota=UpstreamQuota(limit=10)).run()
+
+    assert report["stopped_by_quota"]
+    assert report["requests"] == 10
+    assert Checkpoint(checkpoint_path).state["ids:1-45"]["watermark"] == 10
+
+
+@pytest.mark.asyncio
+async def test_ingest_retries_failed_jobs_on_resume(tmp_path, session_factory, fake_provider):
+    """Тест: сетевые ошибки повторяются, неполученный фильм не проходит контрольную точку, квота сохраняется"""
+    checkpoint_path = tmp_path / "checkpoint.json"
+    fetch = fake_provider.fetch
+    blips = {44}
+
+    async def flaky_fetch(path, params=None):
+        if path.endswith("/42"):
+            raise httpx.ReadTimeout("timed out")
+        if path.endswith("/44") and 44 in blips:
+            blips.discard(44)
+            raise httpx.ConnectError("connection reset")
+        return await fetch(path, params)
+
+    ingester = make_ingester(build_sources([], [(40, 50)]), Checkpoint(checkpoint_path),
+                             quota=UpstreamQuota(limit=1000))
+    ingester.RETRY_DELAY = 0
+    with patch.object(fake_provider, "fetch", flaky_fetch):
+        report = await ingester.run()
+
+    # 11 фильмов, 2 повтора для 42 и 1 для 44
+    assert report["requests"] == 14
+    assert report["errors"] == 1
+    assert report["sources"]["ids:40-50"]["watermark"] == 41
+    async with session_factory() as db:
+        assert await db.scalar(select(MovieDB).filter_by(kinopoisk_id=44)) is not None
+
+    # Следующий запуск начинает с 42 и учитывает уже израсходованную квоту
+    checkpoint = Checkpoint(checkpoint_path)
+    sources = build_sources([], [(40, 50)])
+    for progress in sources:
+        checkpoint.restore(progress)
+    quota = UpstreamQuota(limit=1000)
+    checkpoint.restore_quota(quota)
+    assert quota.used_background == 14
+    report = await make_ingester(sources, checkpoint, quota=quota).run()
+    assert report["requests"] == 9
+    assert report["sources"]["ids:40-50"]["watermark"] == 50
@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.core.config import settings
+from app.core.lifecycle import Lifecycle, lifecycle
+
+
+@pytest.mark.asyncio
+async def test_shutdown_hooks_share_deadline():
+    """Тест: зависший хук не выходит за общее время хуков, следующие запускаются"""
+    state = Lifecycle()
+    calls = []
+
+    @state.on_shutdown
+    async def stuck():
+        await asyncio.sleep(10)
+
+    @state.on_shutdown
+    def flush():
+        calls.append("flush")
+
+    started = asyncio.get_running_loop().time()
+    await state.run_shutdown_hooks(0.1)
+    assert asyncio.get_running_loop().time() - started < 1
+    assert calls == ["flush"]
+
+
+@pytest.mark.asyncio
+async def test_shutdown_hooks_continue_after_error():
+    """Тест: ошибка одного хука остановки не мешает остальным"""
+    state = Lifecycle()
+    calls = []
+
+    @state.on_shutdown
+    def broken():
+        raise RuntimeError("boom")
+
+    @state.on_shutdown
+    async def flush():
+        calls.append("flush")
+
+    await state.run_shutdown_hooks(1)
+    assert calls == ["flush"]
+
+
+def test_lifespan_shutdown_sequence(monkeypatch):
+    """Тест остановки приложения: хуки сброса, закрытие постеров и пула соединений"""
+    monkeypatch.setattr(settings, "CACHE_WARM_INTERVAL", 0)
+    monkeypatch.setattr(settings, "SUGGEST_REFRESH_INTERVAL", 0)
+    hook = AsyncMock()
+    lifecycle.on_shutdown(hook)
+    try:
+        with patch("main.init_db_schema", AsyncMock()), \
+                patch("main.dispose_engine", AsyncMock()) as mock_dispose, \
+                patch("main.poster_store", AsyncMock()) as mock_posters:
+            with TestClient(app) as client:
+                assert client.get("/metrics").status_code == 200
+            hook.assert_awaited_once()
+            mock_posters.close.assert_awaited_once()
+            mock_dispose.assert_awaited_once()
+        assert lifecycle.in_flight == 0
+    finally:
+        lifecycle.remove_shutdown_hook(hook)
@@ -0,0 +1,79 @@
+import logging
+import queue
+from logging.handlers import QueueListener
+import orjson
+from fastapi.testclient import TestClient
+from main import app
+from app.core.log import (
+    LogBody,
+    JsonFormatter,
+    RequestIdFilter,
+    SamplingFilter,
+    DeferredQueueHandler,
+    parse_sample_rates,
+    request_id_var
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def test_log_body_truncated():
+    """Тест усечения тела ответа в логе."""
+    assert str(LogBody(b'{"films": []}', limit=100)) == '{"films": []}'
+    assert str(LogBody(b"x" * 1000, limit=4)) == "xxxx... [1000 bytes]"
+
+
+def test_sampling_filter():
+    """Тест сэмплирования сообщений по типу события."""
+    sampling = SamplingFilter(parse_sample_rates("upstream.body=0, upstream.request=1"))
+
+    def record(level, event):
+        return logging.makeLogRecord({"levelno": level, "event": event})
+
+    assert not sampling.filter(record(logging.INFO, "upstream.body"))
+    assert sampling.filter(record(logging.ERROR, "upstream.body"))
+    assert sampling.filter(record(logging.INFO, "upstream.request"))
+    assert sampling.filter(record(logging.INFO, "other"))
+
+
+def test_deferred_queue_handler():
+    """Тест записи JSON-строк через очередь с идентификатором запроса."""
+    log_queue = queue.SimpleQueue()
+    output = ListHandler()
+    output.setFormatter(JsonFormatter())
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    listener = QueueListener(log_queue, output)
+    logger = logging.getLogger("tests.logging")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    token = request_id_var.set("req-1")
+    listener.start()
+    try:
+        logger.info("Response status: %s", 200, extra={"event": "upstream.response", "status": 200})
+    finally:
+        listener.stop()
+        request_id_var.reset(token)
+        logger.removeHandler(handler)
+
+    [line] = output.lines
+    data = orjson.loads(line)
+    assert data["message"] == "Response status: 200"
+    assert data["request_id"] == "req-1"
+    assert data["event"] == "upstream.response"
+    assert data["status"] == 200
+
+
+def test_request_id_header():
+    """Тест заголовка X-Request-ID в ответе."""
+    client = TestClient(app)
+
+    assert client.get("/metrics", headers={"X-Request-ID": "abc"}).headers["X-Request-ID"] == "abc"
+    assert len(client.get("/metrics").headers["X-Request-ID"]) == 32
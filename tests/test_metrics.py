@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import patch
+import pytest
+from app.core.metrics import (
+    Registry,
+    HTTP_RESPONSES,
+    UPSTREAM_REQUEST_DURATION,
+    CACHE_REQUESTS,
+    EVENT_LOOP_LAG,
+    monitor_event_loop_lag
+)
+
+
+def test_registry_render():
+    """Тест текстового формата Prometheus."""
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests.", ("route",))
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    counter.inc(("/a",))
+    counter.inc(("/a",))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 2',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_count 3",
+        "latency_seconds_sum 5.55",
+    ]
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_route_metrics(mock_get_kinopoisk_data, client, auth_headers):
+    """Тест метрик маршрутов и кеша по шаблону пути."""
+    mock_get_kinopoisk_data.return_value = {"kinopoiskId": 7, "nameRu": "Фильм", "year": 2024}
+    labels = ("GET", "/movies/{kinopoisk_id}", "200")
+    before = HTTP_RESPONSES.value(labels)
+    hits_before = CACHE_REQUESTS.value(("movie", "hit"))
+
+    client.get("/movies/7", headers=auth_headers)
+    client.get("/movies/7", headers=auth_headers)
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert HTTP_RESPONSES.value(labels) == before + 2
+    assert CACHE_REQUESTS.value(("movie", "hit")) == hits_before + 1
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/movies/{kinopoisk_id}"' in response.text
+
+
+@patch("httpx.AsyncClient.get")
+def test_upstream_metrics(mock_get, client, auth_headers):
+    """Тест метрик задержки запросов к Kinopoisk API."""
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.content = b'{"films": []}'
+    labels = ("/api/v2.1/films/search-by-keyword",)
+    before = UPSTREAM_REQUEST_DURATION.count(labels)
+
+    client.get("/search", params={"query": "метрики"}, headers=auth_headers)
+
+    assert UPSTREAM_REQUEST_DURATION.count(labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag():
+    """Тест замера задержки event loop."""
+    before = EVENT_LOOP_LAG.count()
+    task = asyncio.create_task(monitor_event_loop_lag(0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert EVENT_LOOP_LAG.count() > before
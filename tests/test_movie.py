@@ -31,11 +31,6 @@ def generate_test_token():
     return token
 
 
-@pytest.fixture
-def client():
-    return TestClient(app)
-
-
 @pytest.fixture
 def mock_movie_data():
     return {
@@ -165,3 +160,103 @@ def test_remove_from_favorites_not_found(mock_get_favorites_by_user, generate_te
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Not Found"
+
+
+@patch("app.api.movie.get_favorite_rows_with_user_id")
+def test_get_favorites(mock_get_favorite_rows, generate_test_token, mock_favorite_data, client):
+    """Тест получения списка избранного через быстрый путь сериализации."""
+    mock_get_favorite_rows.return_value = [mock_favorite_data]
+
+    response = client.get("/favorites", headers={"Authorization": f"Bearer {generate_test_token}"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [mock_favorite_data]
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_search_movies_raw_payload(mock_get_kinopoisk_data, generate_test_token, client):
+    """Тест разбора сырого ответа Kinopoisk с нестрогим приведением года и рейтинга."""
+    mock_get_kinopoisk_data.return_value = (
+        '{"films": ['
+        '{"filmId": 1, "nameRu": "Фильм", "year": "2023", "rating": "8.5", "posterUrl": "https://example.com/1.jpg"},'
+        '{"filmId": 2, "nameRu": null, "year": "2010-2012", "rating": "null"}'
+        ']}'
+    ).encode()
+
+    response = client.get("/search", params={"query": "Фильм"},
+                          headers={"Authorization": f"Bearer {generate_test_token}"})
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"kinopoisk_id": 1, "title": "Фильм", "year": 2023, "description": "",
+         "rating": 8.5, "poster_url": "https://example.com/1.jpg"},
+        {"kinopoisk_id": 2, "title": "Unknown Title", "year": None, "description": "",
+         "rating": None, "poster_url": None},
+    ]
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_get_movie_details_sparse_fields(mock_get_kinopoisk_data, generate_test_token, mock_movie_details, client):
+    """Тест выборки отдельных полей деталей фильма через ?fields=."""
+    mock_get_kinopoisk_data.return_value = mock_movie_details
+    headers = {"Authorization": f"Bearer {generate_test_token}"}
+
+    full = client.get("/movies/1", headers=headers)
+    sparse = client.get("/movies/1", params={"fields": "year,title,poster_url"}, headers=headers)
+
+    assert mock_get_kinopoisk_data.call_count == 1
+    assert sparse.status_code == 200
+    assert sparse.json() == {
+        "title": full.json()["title"],
+        "year": full.json()["year"],
+        "poster_url": full.json()["poster_url"],
+    }
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_search_movies_sparse_fields(mock_get_kinopoisk_data, generate_test_token, search_movies_data, client):
+    """Тест выборки отдельных полей результатов поиска через ?fields=."""
+    mock_get_kinopoisk_data.return_value = search_movies_data
+
+    response = client.get("/search", params={"query": "Тестовый фильм", "fields": "kinopoisk_id,title"},
+                          headers={"Authorization": f"Bearer {generate_test_token}"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"kinopoisk_id": 1, "title": "Тестовый фильм"}]
+
+
+def test_get_movie_details_unknown_fields(generate_test_token, client):
+    """Тест запроса несуществующих полей."""
+    response = client.get("/movies/1", params={"fields": "title,budget"},
+                          headers={"Authorization": f"Bearer {generate_test_token}"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: budget"
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_get_movie_details_conditional(mock_get_kinopoisk_data, generate_test_token, mock_movie_details, client):
+    """Тест заголовков кеширования и ответа 304 на условный запрос без обращения к Kinopoisk API"""
+    mock_get_kinopoisk_data.return_value = mock_movie_details
+    headers = {"Authorization": f"Bearer {generate_test_token}"}
+
+    response = client.get("/movies/1", headers=headers)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    ttl = settings.MOVIE_CACHE_TTL
+    assert response.headers["Cache-Control"] == f"public, max-age={ttl}, s-maxage={ttl}"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert etag.startswith('W/"')
+
+    cached = client.get("/movies/1", headers={**headers, "If-None-Match": f'"other", {etag}'})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    # Сравнение слабое: подходит и тот же тег без W/
+    strong = client.get("/movies/1", headers={**headers, "If-None-Match": etag.removeprefix("W/")})
+    assert strong.status_code == 304
+    modified = client.get("/movies/1", headers={**headers, "If-Modified-Since": response.headers["Last-Modified"]})
+    assert modified.status_code == 304
+    assert client.get("/movies/1", headers={**headers, "If-None-Match": '"other"'}).status_code == 200
+    mock_get_kinopoisk_data.assert_called_once()
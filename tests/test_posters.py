@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import io
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.core.posters import PosterStore
+
+
+def make_png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def image_server():
+    """Локальный сервер-заглушка вместо CDN Кинопоиска."""
+    image = make_png(600, 900)
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(image)))
+            self.end_headers()
+            self.wfile.write(image)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests, image
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path):
+    poster_store = PosterStore(root=str(tmp_path / "posters"), max_bytes=10 * 1024 * 1024)
+    with patch("app.api.movie.poster_store", poster_store):
+        yield poster_store
+    asyncio.run(poster_store.close())
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_poster_proxy(mock_get_kinopoisk_data, image_server, store, auth_headers, client):
+    """Тест прокси постеров: оригинал и миниатюра скачиваются с CDN один раз."""
+    base_url, requests, image = image_server
+    mock_get_kinopoisk_data.return_value = {
+        "kinopoiskId": 1, "nameRu": "Тестовый фильм", "year": 2024, "posterUrl": f"{base_url}/posters/1.png"
+    }
+
+    original = client.get("/movies/1/poster", headers=auth_headers)
+    thumbnail = client.get("/movies/1/poster", params={"w": 150}, headers=auth_headers)
+    thumbnail_again = client.get("/movies/1/poster", params={"w": 150}, headers=auth_headers)
+
+    assert original.status_code == 200
+    assert original.content == image
+    assert original.headers["content-type"] == "image/png"
+    max_age = settings.POSTER_MAX_AGE
+    assert original.headers["cache-control"] == f"public, max-age={max_age}, s-maxage={max_age}"
+
+    assert thumbnail.status_code == 200
+    assert Image.open(io.BytesIO(thumbnail.content)).size == (154, 231)
+    assert thumbnail_again.content == thumbnail.content
+    assert thumbnail.headers["etag"] != original.headers["etag"]
+    assert requests == ["/posters/1.png"]
+    # Отправленные файлы снова могут вытесняться
+    assert not store._pinned
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_poster_range_request(mock_get_kinopoisk_data, image_server, store, auth_headers, client):
+    """Тест частичной отдачи постера по заголовку Range."""
+    base_url, requests, image = image_server
+    mock_get_kinopoisk_data.return_value = {
+        "kinopoiskId": 1, "nameRu": "Тестовый фильм", "year": 2024, "posterUrl": f"{base_url}/posters/1.png"
+    }
+
+    response = client.get("/movies/1/poster", headers={**auth_headers, "Range": "bytes=0-99"})
+
+    assert response.status_code == 206
+    assert response.content == image[:100]
+
+
+@patch("app.api.movie.get_kinopoisk_data")
+def test_poster_not_found(mock_get_kinopoisk_data, store, auth_headers, client):
+    """Тест, если у фильма нет постера."""
+    mock_get_kinopoisk_data.return_value = {"kinopoiskId": 1, "nameRu": "Тестовый фильм", "year": 2024}
+
+    response = client.get("/movies/1/poster", headers=auth_headers)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Poster not found"
+
+
+@pytest.mark.asyncio
+async def test_poster_store_evicts_least_recently_used(tmp_path):
+    """Тест вытеснения давно не используемых файлов при превышении лимита размера."""
+    store = PosterStore(root=str(tmp_path), max_bytes=250)
+    images = {f"http://cdn/{i}.png": bytes([i]) * 100 for i in range(3)}
+
+    async def fake_download(client, url):
+        return images[url], "image/png"
+
+    async def get(url):
+        path, _, _ = await store.original(url)
+        store.release(path)
+        return path
+
+    with patch("app.core.posters.download_poster", fake_download):
+        first = await get("http://cdn/0.png")
+        second = await get("http://cdn/1.png")
+        await get("http://cdn/0.png")  # 0 становится самым свежим
+        await get("http://cdn/2.png")
+        assert first.exists()
+        assert not second.exists()
+
+        # Файл, который ещё отдаётся, не вытесняется; удалённый с диска скачивается заново
+        pinned, _, _ = await store.original("http://cdn/0.png")
+        await get("http://cdn/1.png")
+        await get("http://cdn/2.png")
+        assert pinned.exists()
+        store.release(pinned)
+        await get("http://cdn/1.png")
+        assert not pinned.exists()
+        assert (await get("http://cdn/0.png")).exists()
+
+
+@pytest.mark.asyncio
+async def test_poster_store_shares_thumbnail_job(tmp_path):
+    """Тест: одновременные запросы одной миниатюры ждут одну задачу в пуле процессов."""
+    store = PosterStore(root=str(tmp_path))
+    image = make_png(600, 900)
+    jobs = []
+
+    async def fake_download(client, url):
+        return image, "image/png"
+
+    def fake_make_thumbnail(source, target, width):
+        jobs.append(width)
+        with open(target, "wb") as f:
+            f.write(image)
+        return len(image)
+
+    class InlineExecutor:
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+        def shutdown(self, **kwargs):
+            pass
+
+    store._executor = InlineExecutor()
+    with patch("app.core.posters.download_poster", fake_download), \
+            patch("app.core.posters.make_thumbnail", fake_make_thumbnail):
+        results = await asyncio.gather(*[store.thumbnail("http://cdn/1.png", 150) for _ in range(5)])
+
+    assert jobs == [150]
+    assert len({path for path, _, _ in results}) == 1
+    assert store._total == 2 * len(image)
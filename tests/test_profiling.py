@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import jwt
+import orjson
+import pytest
+from app.core.config import settings
+from app.core.profiling import StackSampler, ContinuousProfiler, to_collapsed, profile_path
+from app.core.revocation import TokenDenylist
+
+
+def make_token(user_id: int) -> dict:
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": user_id, "exp": expire}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(autouse=True)
+def profiling_settings(tmp_path):
+    with patch.object(settings, "PROFILING_DIR", str(tmp_path)), \
+            patch.object(settings, "ADMIN_USER_IDS", frozenset({1})):
+        yield tmp_path
+
+
+def busy_function(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler():
+    """Тест сэмплирования стека другого потока."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_function, args=(stop,))
+    worker.start()
+    sampler = StackSampler(worker.ident, 0.001).start()
+    time.sleep(0.05)
+    stacks = sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert stacks
+    assert all(stack[-1][0] == "busy_function" for stack in stacks)
+    assert b"busy_function (" in to_collapsed(stacks)
+
+
+def test_profile_request(client, profiling_settings):
+    """Тест профилирования запроса администратором и скачивания профиля."""
+    headers = make_token(1)
+    response = client.get("/metrics", headers={**headers, "X-Profile": "speedscope"})
+
+    assert response.status_code == 200
+    name = response.headers["X-Profile-Id"]
+    assert name.endswith(".speedscope.json")
+
+    profile = client.get(f"/admin/profiles/{name}", headers=headers)
+    assert profile.status_code == 200
+    assert orjson.loads(profile.content)["profiles"][0]["type"] == "sampled"
+    assert client.get("/admin/profiles", headers=headers).json() == [name]
+
+
+def test_profile_request_not_admin(client, profiling_settings):
+    """Тест: запросы обычных пользователей не профилируются, /admin недоступен."""
+    headers = make_token(2)
+    response = client.get("/metrics", params={"_profile": "collapsed"}, headers=headers)
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert not list(profiling_settings.iterdir())
+    assert client.get("/admin/profiles", headers=headers).status_code == 403
+
+
+def test_profile_request_revoked_token(client, profiling_settings):
+    """Тест: отозванный токен администратора не запускает профилирование."""
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": 1, "exp": expire, "jti": "revoked-admin"}, settings.JWT_SECRET_KEY,
+                       algorithm=settings.JWT_ALGORITHM)
+    with patch("app.api.dependencies.token_denylist", TokenDenylist()) as denylist:
+        denylist.add("revoked-admin")
+        response = client.get("/metrics", headers={"Authorization": f"Bearer {token}", "X-Profile": "speedscope"})
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert not list(profiling_settings.iterdir())
+
+
+def test_profile_not_found(client):
+    """Тест запроса несуществующего профиля."""
+    response = client.get("/admin/profiles/missing.collapsed", headers=make_token(1))
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Profile not found"}
+    assert profile_path("..") is None
+
+
+def test_continuous_profiler(profiling_settings):
+    """Тест периодического сохранения агрегированного профиля."""
+    profiler = ContinuousProfiler(interval=0.001, dump_interval=60).start()
+    time.sleep(0.05)
+    profiler.stop()
+
+    [dump] = profiling_settings.iterdir()
+    assert dump.name.startswith("continuous-")
+    assert "test_continuous_profiler" in dump.read_text()
@@ -0,0 +1,97 @@
+import httpx
+import orjson
+import pytest
+from app.core.httpclient import LazyHttpClient
+from app.core.providers import (
+    FILM_PATH,
+    SEARCH_PATH,
+    FakeProvider,
+    HttpProvider,
+    MovieProvider,
+    ProviderError,
+    RecordingProvider,
+    ReplayProvider,
+    request_key,
+    set_provider
+)
+
+FILM = {"kinopoiskId": 301, "nameRu": "Матрица", "year": 1999, "ratingKinopoisk": 8.5,
+        "genres": [{"genre": "фантастика"}], "countries": [{"country": "США"}]}
+
+
+@pytest.fixture
+def fake_provider():
+    provider = FakeProvider([FILM])
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+def test_request_key():
+    """Тест ключа запроса: порядок параметров не важен."""
+    assert request_key(SEARCH_PATH, {"page": 1, "keyword": "a"}) == request_key(SEARCH_PATH, {"keyword": "a", "page": 1})
+    assert request_key("/api/v2.2/films/1") == "/api/v2.2/films/1"
+
+
+def test_provider_requires_fetch():
+    """Тест: источник без fetch() нельзя создать."""
+    class IncompleteProvider(MovieProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteProvider()
+
+
+def test_routes_with_fake_provider(fake_provider, client, auth_headers):
+    """Тест маршрутов поверх провайдера в памяти."""
+    details = client.get("/movies/301", headers=auth_headers)
+    search = client.get("/search", params={"query": "матр"}, headers=auth_headers)
+    missing = client.get("/movies/302", headers=auth_headers)
+
+    assert details.json()["genres"] == ["фантастика"]
+    assert [movie["kinopoisk_id"] for movie in search.json()] == [301]
+    assert missing.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path):
+    """Тест записи ответов и их воспроизведения из memory-mapped хранилища."""
+    recorder = RecordingProvider(FakeProvider([FILM]), str(tmp_path))
+    body = await recorder.fetch(FILM_PATH.format(kinopoisk_id=301))
+    with pytest.raises(ProviderError):
+        await recorder.fetch(FILM_PATH.format(kinopoisk_id=302))
+    await recorder.close()
+
+    replay = ReplayProvider(str(tmp_path))
+    try:
+        assert await replay.fetch(FILM_PATH.format(kinopoisk_id=301)) == body
+        assert orjson.loads(body)["nameRu"] == "Матрица"
+        with pytest.raises(ProviderError) as not_found:
+            await replay.fetch(FILM_PATH.format(kinopoisk_id=302))
+        assert not_found.value.status == 404
+        with pytest.raises(ProviderError) as miss:
+            await replay.fetch(SEARCH_PATH, {"keyword": "матрица"})
+        assert miss.value.reason == "replay_miss"
+    finally:
+        await replay.close()
+
+
+@pytest.mark.asyncio
+async def test_http_provider_reuses_client():
+    """Тест: запросы к API идут через один клиент с пулом соединений, закрываемый вместе с источником."""
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, content=orjson.dumps(FILM))
+
+    provider = HttpProvider(base_url="http://kinopoisk.test", api_key="key")
+    provider.http = LazyHttpClient(transport=httpx.MockTransport(handler))
+    assert orjson.loads(await provider.fetch(FILM_PATH.format(kinopoisk_id=301))) == FILM
+    client = provider.http.get()
+    await provider.fetch(FILM_PATH.format(kinopoisk_id=302))
+    assert provider.http.get() is client
+    assert len(requests) == 2
+
+    await provider.close()
+    assert client.is_closed
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import jwt
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from main import app
+from app.core.config import settings
+from app.core.providers import FakeProvider, set_provider
+from app.core.ratelimit import FairScheduler, GcraLimiter, RateLimiter
+from app.core.resp import RespClient, RespServer
+
+
+@pytest_asyncio.fixture
+async def resp_server():
+    server = RespServer()
+    port = await server.start()
+    yield f"redis://127.0.0.1:{port}/0"
+    await server.stop()
+
+
+def test_gcra_limiter():
+    """Тест GCRA: всплеск до burst, затем отказ со временем ожидания; ключи независимы"""
+    limiter = GcraLimiter(rate=1, burst=3)
+    assert [limiter.check("1") for _ in range(3)] == [0, 0, 0]
+    retry_after = limiter.check("1")
+    assert 0.9 < retry_after <= 1
+    assert limiter.check("2") == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_limit_between_workers(resp_server):
+    """Тест: лимит через общий счётчик действует на все воркеры вместе"""
+    first = RateLimiter(rate=0.1, burst=3, shared=RespClient(resp_server))
+    second = RateLimiter(rate=0.1, burst=3, shared=RespClient(resp_server))
+
+    results = [await limiter.check("1") for limiter in (first, second, first)]
+    assert results == [0, 0, 0]
+    assert await second.check("1") > 0
+    assert await first.check("2") == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_limit_ignores_rejected_requests():
+    """Тест: как и в GCRA, отклонённые запросы не расходуют общий лимит"""
+    server = RespServer()
+    port = await server.start()
+    client = RespClient(f"redis://127.0.0.1:{port}/0")
+    try:
+        limiter = RateLimiter(rate=0.1, burst=2, shared=client)
+        assert [await limiter.check("3") for _ in range(2)] == [0, 0]
+        assert all([await limiter.check("3") > 0 for _ in range(3)])
+        assert sum(int(value) for key, (value, _) in server.data.items() if key.startswith(b"ratelimit:3:")) == 2
+    finally:
+        client.close()
+        await asyncio.sleep(0.05)
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_round_robin():
+    """Тест: свободный слот достаётся пользователям по очереди, а не по порядку запросов"""
+    scheduler = FairScheduler(concurrency=1)
+    order = []
+    gate = asyncio.Event()
+
+    async def request(user, n):
+        async with scheduler.slot(user):
+            order.append(f"{user}{n}")
+            await gate.wait()
+
+    tasks = [asyncio.create_task(request("heavy", n)) for n in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(request("light", 0)))
+    await asyncio.sleep(0)
+    assert scheduler.waiting() == 4
+
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert order == ["heavy0", "heavy1", "light0", "heavy2", "heavy3"]
+    assert scheduler.active == 0
+
+
+def test_rate_limited_route():
+    """Тест: сверх лимита маршрут отвечает 429 с Retry-After"""
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": 7, "exp": expire}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    headers = {"Authorization": f"Bearer {token}"}
+    set_provider(FakeProvider([{"kinopoiskId": 301, "nameRu": "Фильм", "year": 2000}]))
+    try:
+        with patch("app.api.dependencies.rate_limiter", RateLimiter(rate=0.5, burst=2)):
+            client = TestClient(app)
+            statuses = [client.get("/movies/301", headers=headers).status_code for _ in range(3)]
+            response = client.get("/movies/301", headers=headers)
+    finally:
+        set_provider(None)
+
+    assert statuses == [200, 200, 429]
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from main import app
+from app.core.core_jwt import create_access_token, decode_access_token
+from app.core.revocation import DENYLIST_CHECKS, BloomFilter, TokenDenylist
+from app.db.models import Base, User
+from app.db.session import get_db
+
+
+def test_bloom_filter():
+    """Тест фильтра Блума: нет ложноотрицательных, ложноположительных — около заданной доли"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for n in range(1000):
+        bloom.add(f"revoked-{n}")
+
+    assert all(f"revoked-{n}" in bloom for n in range(1000))
+    false_positives = sum(f"valid-{n}" in bloom for n in range(10000))
+    assert false_positives < 300
+
+
+@pytest.fixture
+def database(tmp_path):
+    # Файловая SQLite без пула: каждая сессия открывает соединение в своём event loop
+    path = tmp_path / "revocation.sqlite3"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add(User(id=1, username="viewer", hashed_password="x"))
+        db.commit()
+    sync_engine.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    with patch("app.core.revocation.get_sessionmaker", return_value=factory):
+        yield
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_logout_revokes_token(database):
+    """Тест выхода: токен отзывается здесь сразу, а другой воркер узнаёт о нём из таблицы"""
+    token = create_access_token({"sub": "viewer", "id": 1})
+    other_token = create_access_token({"sub": "viewer", "id": 1})
+    headers = {"Authorization": f"Bearer {token}"}
+    client = TestClient(app)
+
+    assert client.get("/search/suggest", params={"q": "ma"}, headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).status_code == 204
+    response = client.get("/search/suggest", params={"q": "ma"}, headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    assert client.post("/logout", headers=headers).status_code == 401
+    # Другие токены того же пользователя действуют
+    assert client.get("/search/suggest", params={"q": "ma"},
+                      headers={"Authorization": f"Bearer {other_token}"}).status_code == 200
+
+    # Новый воркер строит фильтр по таблице; непроверенные jti отвечаются без запросов к базе
+    worker = TokenDenylist(capacity=1000)
+    assert asyncio.run(worker.sync(full=True)) == 1
+    confirms = DENYLIST_CHECKS.value(("confirm",))
+    assert asyncio.run(worker.is_revoked(decode_access_token(token)["jti"])) is True
+    assert asyncio.run(worker.is_revoked(decode_access_token(other_token)["jti"])) is False
+    assert DENYLIST_CHECKS.value(("confirm",)) == confirms
@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.db import session
+
+
+def test_head_revision():
+    """Тест, что голова истории миграций — ревизия с таблицей отозванных токенов."""
+    assert session.get_head_revision() == "8c2e4f6a1b3d"
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_ok():
+    """Тест проверки схемы, если база на актуальной ревизии."""
+    with patch("app.db.session.get_current_revision", AsyncMock(return_value="8c2e4f6a1b3d")):
+        await session.check_schema_revision()
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_outdated():
+    """Тест проверки схемы, если миграции не применены."""
+    with patch("app.db.session.get_current_revision", AsyncMock(return_value=None)):
+        with pytest.raises(RuntimeError):
+            await session.check_schema_revision()
+
+
+@pytest.mark.asyncio
+async def test_init_db_schema_modes():
+    """Тест выбора режима подготовки схемы при старте."""
+    with patch("app.db.session.create_db_and_tables", AsyncMock()) as mock_create, \
+            patch("app.db.session.check_schema_revision", AsyncMock()) as mock_check:
+        await session.init_db_schema("create")
+        await session.init_db_schema("skip")
+        mock_create.assert_awaited_once()
+        mock_check.assert_not_awaited()
+
+    with pytest.raises(ValueError):
+        await session.init_db_schema("unknown")
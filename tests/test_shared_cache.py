@@ -0,0 +1,109 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+import pytest_asyncio
+from app.core.cache import PayloadCache, decode_entry, encode_entry, make_entry
+from app.core.metrics import CACHE_REQUESTS
+from app.core.resp import RespClient, RespServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest_asyncio.fixture
+async def resp_server():
+    server = RespServer()
+    port = await server.start()
+    yield server, f"redis://127.0.0.1:{port}/0"
+    await server.stop()
+
+
+def test_entry_codec_roundtrip():
+    """Тест сериализации записи кеша вместе со сжатыми вариантами"""
+    entry = make_entry(b'{"films": []}' * 200, 60)
+    decoded = decode_entry(encode_entry(entry))
+
+    assert decoded.body == entry.body
+    assert decoded.version == entry.version
+    assert decoded.expires_at == entry.expires_at
+    assert decoded.encodings == entry.encodings
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_between_workers(resp_server):
+    """Тест: запись, сохранённая одним воркером, читается другим через общий кеш"""
+    server, url = resp_server
+    first = PayloadCache("movie", shared=RespClient(url))
+    second = PayloadCache("movie", shared=RespClient(url))
+    hits = CACHE_REQUESTS.value(("movie", "shared_hit"))
+
+    stored = await first.store("movie:301", b'{"kinopoisk_id": 301}', 60)
+    assert b"movie:v1:movie:301" in server.data
+
+    entry = await second.fetch("movie:301")
+    assert entry.body == stored.body
+    assert entry.version == stored.version
+    assert CACHE_REQUESTS.value(("movie", "shared_hit")) == hits + 1
+    # После первого обращения запись берётся из локального кеша воркера
+    assert second.get("movie:301") is not None
+    assert await second.fetch("movie:404") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_discards_malformed_entry(resp_server):
+    """Тест: повреждённая запись общего кеша считается промахом и удаляется"""
+    server, url = resp_server
+    cache = PayloadCache("movie", shared=RespClient(url))
+    data = encode_entry(make_entry(b'{"kinopoisk_id": 301}', 60))
+    for corrupt in (data[:10], data[:-3], data + b"x"):
+        server.data[b"movie:v1:movie:301"] = (corrupt, None)
+        assert await cache.fetch("movie:301") is None
+        assert b"movie:v1:movie:301" not in server.data
+    assert cache._shared_available()
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_unavailable():
+    """Тест: при недоступном общем кеше запросы обслуживаются локальным кешем"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    cache = PayloadCache("movie", shared=RespClient(f"redis://127.0.0.1:{port}/0"))
+
+    await cache.store("movie:301", b"{}", 60)
+    assert cache.get("movie:301") is not None
+    assert await cache.fetch("movie:302") is None
+    assert not cache._shared_available()
+
+
+def test_server_prefork_workers(tmp_path):
+    """Тест запуска нескольких воркеров на одном сокете и их корректной остановки"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path}/server.sqlite3",
+        "DB_SCHEMA_MODE": "skip",
+        "DB_ECHO": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    master = subprocess.Popen([sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+                               "--workers", "2", "--graceful-timeout", "5"], cwd=ROOT, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/metrics")
+                break
+            except httpx.HTTPError:
+                assert time.monotonic() < deadline and master.poll() is None
+                time.sleep(0.2)
+        assert response.status_code == 200
+    finally:
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=20) == 0
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.db import crud, models
+from app.db.session import ALEMBIC_INI_PATH
+from app.db.sqlite import sqlite_engine_options, configure_sqlite, get_writer_queue
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.sqlite3'}"
+
+
+@pytest_asyncio.fixture
+async def sqlite_session_factory(sqlite_url):
+    engine = create_async_engine(sqlite_url, **sqlite_engine_options(sqlite_url))
+    configure_sqlite(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas(sqlite_session_factory):
+    """Тест, что соединения SQLite работают в режиме WAL с настроенными pragma."""
+    async with sqlite_session_factory() as db:
+        assert get_writer_queue(db.bind) is not None
+        assert (await db.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await db.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+        assert (await db.execute(text("PRAGMA cache_size"))).scalar() == settings.SQLITE_CACHE_SIZE
+
+
+@pytest.mark.asyncio
+async def test_sqlite_concurrent_favorites(sqlite_session_factory):
+    """Тест конкурентных добавлений и удалений избранного через crud на SQLite."""
+    async with sqlite_session_factory() as db:
+        user = models.User(username="sqliteuser", hashed_password="hashed")
+        db.add(user)
+        await db.commit()
+
+    async def add(kinopoisk_id):
+        async with sqlite_session_factory() as db:
+            await crud.create_favorite(db, user.id, kinopoisk_id, f"Movie {kinopoisk_id}", 2024)
+
+    await asyncio.gather(*(add(kinopoisk_id) for kinopoisk_id in range(1, 21)))
+
+    async with sqlite_session_factory() as db:
+        removed = await crud.remove_favorite(db, user.id, 1)
+        favorites = await crud.get_favorite_with_user_id(db, user.id)
+
+    assert removed.kinopoisk_id == 1
+    assert sorted(favorite.kinopoisk_id for favorite in favorites) == list(range(2, 21))
+
+
+@pytest_asyncio.fixture
+async def strict_session_factory(sqlite_url, monkeypatch):
+    # Без ожидания блокировки любая запись мимо очереди писателя сразу завершилась бы ошибкой
+    monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT", 0)
+    engine = create_async_engine(sqlite_url, **sqlite_engine_options(sqlite_url))
+    configure_sqlite(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add(models.User(id=1, username="sqliteuser", hashed_password="hashed"))
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_concurrent_mixed_writes(strict_session_factory):
+    """Тест: изменения избранного и отзыв токенов вперемешку не упираются в блокировку записи SQLite."""
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+
+    async def add(kinopoisk_id):
+        async with strict_session_factory() as db:
+            await crud.create_favorite(db, 1, kinopoisk_id, f"Movie {kinopoisk_id}", 2024)
+
+    async def revoke(n):
+        async with strict_session_factory() as db:
+            await crud.revoke_token(db, f"jti-{n}", 1, expires_at)
+
+    await asyncio.gather(*(add(n) for n in range(1, 11)), *(revoke(n) for n in range(1, 11)))
+    async with strict_session_factory() as db:
+        assert len(await crud.get_favorite_with_user_id(db, 1)) == 10
+        assert len(await crud.get_revoked_jtis(db)) == 10
+
+
+@pytest.mark.asyncio
+async def test_sqlite_concurrent_batch_and_single_writes(strict_session_factory):
+    """Тест: пакетные изменения отложенной записи идут через очередь писателя вместе с обычными."""
+    async def add(kinopoisk_id):
+        async with strict_session_factory() as db:
+            await crud.create_favorite(db, 1, kinopoisk_id, f"Movie {kinopoisk_id}", 2024)
+
+    async def apply(batch):
+        rows = [{"user_id": 1, "kinopoisk_id": 100 + batch * 10 + i, "title": "Batch", "year": 2024} for i in range(5)]
+        async with strict_session_factory() as db:
+            await crud.apply_favorite_changes(db, [(1, 1000 + batch)], rows)
+
+    await asyncio.gather(*(add(n) for n in range(1, 11)), *(apply(n) for n in range(1, 11)))
+    async with strict_session_factory() as db:
+        ids = {favorite.kinopoisk_id for favorite in await crud.get_favorite_with_user_id(db, 1)}
+    assert len(ids) == 60
+
+
+@pytest.mark.asyncio
+async def test_sqlite_concurrent_catalog_upserts(strict_session_factory):
+    """Тест: загрузка каталога параллельно с изменениями избранного проходит через очередь писателя."""
+    async def add(kinopoisk_id):
+        async with strict_session_factory() as db:
+            await crud.create_favorite(db, 1, kinopoisk_id, f"Movie {kinopoisk_id}", 2024)
+
+    async def upsert(page):
+        rows = [{"kinopoisk_id": page * 10 + i, "title": f"Film {i}", "year": 2000, "description": None,
+                 "rating": None, "poster_url": None} for i in range(10)]
+        async with strict_session_factory() as db:
+            await crud.upsert_movies(db, rows)
+
+    await asyncio.gather(*(add(n) for n in range(1, 11)), *(upsert(page) for page in range(10)))
+    async with strict_session_factory() as db:
+        assert len(await crud.get_movie_titles(db, after_id=0, limit=1000)) == 100
+
+
+def test_sqlite_alembic_upgrade(sqlite_url, monkeypatch):
+    """Тест применения и отката миграций Alembic на SQLite."""
+    monkeypatch.setattr(settings, "SQLALCHEMY_DATABASE_URL", sqlite_url)
+    config = Config(str(ALEMBIC_INI_PATH))
+    config.set_main_option("script_location", str(ALEMBIC_INI_PATH.parent / "alembic"))
+
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
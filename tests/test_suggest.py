@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from main import app
+from app.core.config import settings
+from app.core.suggest import SuggestIndex, fold
+from app.db.crud import get_movie_titles
+from app.db.models import Base, Favorite, MovieDB, User
+
+MOVIES = [
+    # id, kinopoisk_id, title, rating, favorites
+    (1, 301, "Матрица", 8.5, 3),
+    (2, 302, "Матрица: Перезагрузка", 7.7, 1),
+    (3, 303, "Мастер и Маргарита", 7.9, 1),
+    (4, 304, "Ёлки", 6.5, 0),
+    (5, 305, "Матрица: Революция", 7.6, 1),
+]
+
+
+def movie_rows(movies):
+    return [{"id": movie_id, "kinopoisk_id": kinopoisk_id, "title": title, "year": 2000, "rating": rating,
+             "favorites": favorites} for movie_id, kinopoisk_id, title, rating, favorites in movies]
+
+
+def rows_loader(rows):
+    async def load_rows(after_id, limit):
+        return [row for row in rows if row["id"] > after_id][:limit]
+    return load_rows
+
+
+@pytest.mark.asyncio
+async def test_suggest_index_lookup():
+    """Тест поиска по префиксу: регистр, транслит, начало слова и ранжирование"""
+    index = SuggestIndex(max_results=10)
+    assert await index.refresh(rows_loader(movie_rows(MOVIES[:4])), batch_size=2) == 4
+
+    assert fold("Ёлки-2!") == "елки 2"
+    assert index.lookup("матр", 10) == [301, 302]
+    assert index.lookup("МАТРИЦА ПЕРЕ", 10) == [302]
+    assert index.lookup("matri", 10) == [301, 302]
+    assert index.lookup("перезаг", 10) == [302]
+    assert index.lookup("елк", 10) == [304]
+    # Короткий префикс — из заранее ранжированного списка: по избранному, затем по рейтингу
+    assert index.lookup("ма", 10) == [301, 303, 302]
+    assert index.lookup("ма", 1) == [301]
+    assert index.lookup("   ", 10) == []
+
+    # Догружаются только новые строки
+    rows = movie_rows(MOVIES)
+    assert await index.refresh(rows_loader(rows)) == 1
+    assert index.lookup("матр", 10) == [301, 302, 305]
+    assert index.lookup("ма", 10) == [301, 303, 302, 305]
+    assert await index.refresh(rows_loader(rows)) == 0
+    assert len(index) == 5
+
+
+@pytest.fixture
+def database(tmp_path):
+    # Файловая SQLite без пула: каждая сессия открывает соединение в своём event loop
+    path = tmp_path / "suggest.sqlite3"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add_all([User(id=user_id, username=f"user{user_id}", hashed_password="x") for user_id in (1, 2, 3)])
+        for movie_id, kinopoisk_id, title, rating, favorites in MOVIES:
+            db.add(MovieDB(id=movie_id, kinopoisk_id=kinopoisk_id, title=title, year=2000, rating=rating))
+            db.add_all([Favorite(user_id=user_id, kinopoisk_id=kinopoisk_id, title=title, year=2000)
+                        for user_id in range(1, favorites + 1)])
+        db.commit()
+    sync_engine.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_suggest_endpoint(database):
+    """Тест /search/suggest по индексу, построенному из таблицы movies"""
+    async def load_rows(after_id, limit):
+        async with database() as db:
+            return await get_movie_titles(db, after_id, limit)
+
+    index = SuggestIndex()
+    asyncio.run(index.refresh(load_rows))
+    assert index.lookup("matr", 10) == [301, 302, 305]
+
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": 1, "exp": expire}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    client = TestClient(app)
+    with patch("app.api.movie.suggest_index", index):
+        response = client.get("/search/suggest", params={"q": "Матрица", "limit": 2},
+                              headers={"Authorization": f"Bearer {token}"})
+        assert client.get("/search/suggest", params={"q": "матрица"}).status_code == 401
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"kinopoisk_id": 301, "title": "Матрица", "year": 2000, "rating": 8.5},
+        {"kinopoisk_id": 302, "title": "Матрица: Перезагрузка", "year": 2000, "rating": 7.7},
+    ]
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+import orjson
+import pytest
+from app.core.config import settings
+from app.core.tracing import (
+    NOOP_SPAN,
+    OtlpJsonFileExporter,
+    Tracer,
+    current_span,
+    span,
+    traced,
+    tracer
+)
+
+
+@traced()
+async def traced_function():
+    return current_span.get().name
+
+
+def test_span_without_trace():
+    """Тест: вне трассировки span ничего не создаёт."""
+    assert span("kinopoisk.get") is NOOP_SPAN
+
+
+@pytest.mark.asyncio
+async def test_traced_decorator():
+    """Тест вложенных spans и их экспорта."""
+    exported = []
+    test_tracer = Tracer(sample_rate=1.0, exporters=[])
+    test_tracer.exporters.append(type("Exporter", (), {"export": lambda self, spans: exported.append(spans)})())
+    root = test_tracer.start_trace("GET /favorites")
+    with root:
+        assert await traced_function() == "test_tracing.traced_function"
+    test_tracer.export(root)
+
+    [[exported_root, child]] = exported
+    assert exported_root is root
+    assert child.parent_id == root.span_id
+    assert child.trace_id == root.trace_id
+
+
+@patch("httpx.AsyncClient.get")
+def test_request_trace(mock_get, client, auth_headers):
+    """Тест трассы запроса: маршрут, авторизация и запрос к Kinopoisk API."""
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.content = '{"kinopoiskId": 7, "nameRu": "Фильм", "year": 2024}'.encode()
+
+    with patch.object(tracer, "sample_rate", 1.0), patch.object(settings, "ADMIN_USER_IDS", frozenset({1})):
+        response = client.get("/movies/7", headers=auth_headers)
+        trace_id = response.headers["X-Trace-Id"]
+        traces = client.get("/admin/traces", headers=auth_headers).json()
+        spans = client.get(f"/admin/traces/{trace_id}", headers=auth_headers).json()
+
+    assert any(trace["trace_id"] == trace_id and trace["name"] == "GET /movies/{kinopoisk_id}" for trace in traces)
+    names = {item["name"]: item for item in spans}
+    assert names["GET /movies/{kinopoisk_id}"]["attributes"]["http.status_code"] == 200
+    assert "auth.get_current_user" in names
+    assert names["kinopoisk.get"]["attributes"] == {
+        "endpoint": "/api/v2.2/films/{id}", "provider": "http", "http.status_code": 200
+    }
+
+
+def test_otlp_file_exporter(tmp_path):
+    """Тест записи трассы в формате OTLP/JSON."""
+    path = tmp_path / "traces.jsonl"
+    test_tracer = Tracer(sample_rate=1.0, exporters=[OtlpJsonFileExporter(str(path))])
+    root = test_tracer.start_trace("GET /search")
+    with root:
+        with span("kinopoisk.get", endpoint="/api/v2.1/films/search-by-keyword"):
+            pass
+    test_tracer.export(root)
+    test_tracer.shutdown()
+
+    [line] = path.read_bytes().splitlines()
+    [otlp_root, otlp_child] = orjson.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp_root["name"] == "GET /search"
+    assert otlp_child["parentSpanId"] == otlp_root["spanId"]
+    assert otlp_child["attributes"] == [
+        {"key": "endpoint", "value": {"stringValue": "/api/v2.1/films/search-by-keyword"}}
+    ]
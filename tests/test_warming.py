@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+from app.api.movie import refresh_movie_entry
+from app.core.cache import PayloadCache
+from app.core.resp import RespClient, RespServer
+from app.core.config import settings
+from app.core.providers import FakeProvider, set_provider
+from app.core.warming import CacheWarmer, HotKeys, UpstreamQuota, parse_hours
+
+FILMS = [{"kinopoiskId": kinopoisk_id, "nameRu": f"Фильм {kinopoisk_id}", "year": 2000}
+         for kinopoisk_id in (301, 302, 303)]
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_WARM_RATE", 1000)
+    provider = FakeProvider(FILMS)
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+def make_warmer(cache, popular, quota=None, hot=None):
+    async def popular_ids(limit):
+        return popular[:limit]
+
+    async def refresh(kinopoisk_id):
+        entry = await refresh_movie_entry(kinopoisk_id)
+        cache.set(f"movie:{kinopoisk_id}", entry.body, settings.MOVIE_CACHE_TTL)
+
+    return CacheWarmer(cache, refresh, popular_ids, quota or UpstreamQuota(limit=0), hot or HotKeys())
+
+
+def test_parse_hours():
+    """Тест разбора часов низкой нагрузки, включая переход через полночь"""
+    assert parse_hours("2-6") == {2, 3, 4, 5}
+    assert parse_hours("22-2,13") == {22, 23, 0, 1, 13}
+    assert parse_hours("") == set(range(24))
+
+
+def test_upstream_quota_share():
+    """Тест: фоновые запросы не превышают свою долю квоты и не забирают её остаток"""
+    quota = UpstreamQuota(limit=10)
+    quota.record(background=True)
+    assert quota.allows(0.2)
+    quota.record(background=True)
+    assert not quota.allows(0.2)
+
+    quota = UpstreamQuota(limit=10)
+    for _ in range(10):
+        quota.record()
+    assert not quota.allows(1.0)
+
+
+@pytest.mark.asyncio
+async def test_warm_popular_and_hot(fake_provider):
+    """Тест прогрева деталей популярных в избранном и часто запрашиваемых фильмов"""
+    cache = PayloadCache("warm-test")
+    hot = HotKeys()
+    hot.touch(303)
+    warmer = make_warmer(cache, [301, 404], hot=hot)
+    warmer.off_peak_hours = frozenset()
+
+    assert await warmer.warm_once() == 3
+    assert "movie:301" in cache and "movie:303" in cache
+    assert "movie:404" not in cache
+    # Уже закешированные фильмы повторно не запрашиваются
+    assert await warmer.warm_once() == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_expiring_off_peak(fake_provider):
+    """Тест обновления истекающих записей в часы низкой нагрузки"""
+    cache = PayloadCache("warm-test")
+    cache.set("movie:302", b"{}", 1)
+    warmer = make_warmer(cache, [])
+
+    warmer.off_peak_hours = frozenset()
+    assert await warmer.warm_once() == 0
+
+    warmer.off_peak_hours = frozenset(range(24))
+    assert await warmer.warm_once() == 1
+    assert cache.get("movie:302").expires_at > time.time() + 60
+
+
+@pytest.mark.asyncio
+async def test_warm_stops_at_quota_share(fake_provider, monkeypatch):
+    """Тест: прогрев останавливается, исчерпав свою долю квоты; каждый запрос учитывается один раз"""
+    cache = PayloadCache("warm-test")
+    quota = UpstreamQuota(limit=10)
+    monkeypatch.setattr("app.api.movie.upstream_quota", quota)
+    warmer = make_warmer(cache, [301, 302, 303], quota=quota)
+
+    assert await warmer.warm_once() == 1
+    assert quota.used_background == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_skips_entries_in_shared_cache(fake_provider):
+    """Тест: воркер не прогревает фильмы, которые другой воркер уже положил в общий кеш"""
+    server = RespServer()
+    url = f"redis://127.0.0.1:{await server.start()}/0"
+    try:
+        first = PayloadCache("warm-test", shared=RespClient(url))
+        second = PayloadCache("warm-test", shared=RespClient(url))
+        assert await make_shared_warmer(first, [301, 302]).warm_once() == 2
+
+        warmer = make_shared_warmer(second, [301, 302])
+        warmer.off_peak_hours = frozenset()
+        assert await warmer.warm_once() == 0
+        assert "movie:301" in second
+        first.shared.close()
+        second.shared.close()
+        # Сервер успевает закрыть свои концы соединений до остановки event loop
+        await asyncio.sleep(0.05)
+    finally:
+        await server.stop()
+
+
+def make_shared_warmer(cache, popular):
+    # Как в приложении: прогретые детали сохраняются и в общий кеш
+    async def popular_ids(limit):
+        return popular[:limit]
+
+    async def refresh(kinopoisk_id):
+        entry = await refresh_movie_entry(kinopoisk_id)
+        await cache.store(f"movie:{kinopoisk_id}", entry.body, settings.MOVIE_CACHE_TTL)
+
+    return CacheWarmer(cache, refresh, popular_ids, UpstreamQuota(limit=0), HotKeys())
@@ -0,0 +1,199 @@
+import fcntl
+import os
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+import jwt
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from main import app
+from app.core.config import settings
+from app.db.crud import get_favorite_rows_with_user_id
+from app.db.models import Base, Favorite, User
+from app.db.session import get_db
+from app.db.sqlite import configure_sqlite
+from app.db.writebehind import FavoriteWriteBehind
+
+
+@pytest.fixture
+def database(tmp_path):
+    # Файловая SQLite без пула: каждая сессия открывает соединение в своём event loop
+    path = tmp_path / "favorites.sqlite3"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with Session(sync_engine) as db:
+        db.add_all([User(id=user_id, username=f"user{user_id}", hashed_password="x") for user_id in (1, 2)])
+        db.add(Favorite(user_id=1, kinopoisk_id=303, title="Мастер и Маргарита", year=1994))
+        db.commit()
+    sync_engine.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    # Как в приложении: внешние ключи проверяются, коммиты идут через очередь писателя
+    configure_sqlite(engine)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    with patch("app.db.writebehind.get_sessionmaker", return_value=factory):
+        yield factory
+
+
+async def stored_ids(factory, user_id):
+    async with factory() as db:
+        return [row["kinopoisk_id"] for row in await get_favorite_rows_with_user_id(db, user_id)]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_coalesces_and_flushes(database, tmp_path):
+    """Тест отложенной записи: чтение своих изменений, схлопывание добавления с удалением, пакетный сброс"""
+    writes = FavoriteWriteBehind(directory=tmp_path / "log", flush_interval=60)
+    await writes.start()
+    try:
+        await writes.add(1, 301, "Матрица", 1999)
+        await writes.add(1, 302, "Ёлки", 2010)
+        await writes.remove(1, {"kinopoisk_id": 303, "title": "Мастер и Маргарита", "year": 1994})
+        await writes.remove(1, {"kinopoisk_id": 301, "title": "Матрица", "year": 1999})
+        assert len(writes) == 3
+        assert len(writes.path.read_bytes().splitlines()) == 4
+
+        async with database() as db:
+            rows = await get_favorite_rows_with_user_id(db, 1)
+            assert await writes.get(db, 1, 303) is None
+        assert writes.merge(rows, writes.overlay(1)) == [{"kinopoisk_id": 302, "title": "Ёлки", "year": 2010}]
+        assert writes.merge(rows, writes.overlay(2)) == rows
+
+        # 301 добавлен и удалён до сброса: в базу пишутся только удаление 303 и добавление 302
+        assert await writes.flush() == 3
+        assert await stored_ids(database, 1) == [302]
+        assert len(writes) == 0
+        assert writes.path.read_bytes() == b""
+    finally:
+        await writes.close()
+    assert not writes.path.exists()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_recovers_orphan_log(database, tmp_path):
+    """Тест восстановления: изменения из журнала остановленного воркера применяются новым"""
+    directory = tmp_path / "log"
+    directory.mkdir()
+    orphan = directory / "favorites-999999.log"
+    ops = [
+        {"op": "add", "user_id": 2, "kinopoisk_id": 301, "title": "Матрица", "year": 1999},
+        {"op": "add", "user_id": 2, "kinopoisk_id": 302, "title": "Ёлки", "year": 2010},
+        {"op": "remove", "user_id": 2, "kinopoisk_id": 301, "title": "Матрица", "year": 1999},
+    ]
+    # Последняя строка не дописана: такое изменение не было подтверждено
+    orphan.write_bytes(b"".join(orjson.dumps(op) + b"\n" for op in ops) + b'{"op": "add", "user')
+
+    writes = FavoriteWriteBehind(directory=directory, flush_interval=60)
+    await writes.start()
+    try:
+        assert not orphan.exists()
+        assert writes.lookup(2, 301)["op"] == "remove"
+        assert len(writes.path.read_bytes().splitlines()) == 2
+        await writes.flush()
+    finally:
+        await writes.close()
+    assert await stored_ids(database, 2) == [302]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_skips_log_replaced_before_lock(database, tmp_path):
+    """Тест: журнал, заменённый живым воркером между open и flock, не воспроизводится и не удаляется"""
+    directory = tmp_path / "log"
+    directory.mkdir()
+    live = directory / "favorites-999999.log"
+    stale = {"op": "add", "user_id": 2, "kinopoisk_id": 301, "title": "Матрица", "year": 1999}
+    current = {**stale, "op": "remove"}
+    live.write_bytes(orjson.dumps(stale) + b"\n")
+    real_flock = fcntl.flock
+    holders = []
+
+    def replacing_flock(fd, operation):
+        # Живой воркер сжимает журнал: новый файл заблокирован и подменяет старый
+        if not holders:
+            tmp = directory / "favorites-999999.tmp"
+            holder = open(tmp, "ab")
+            real_flock(holder.fileno(), fcntl.LOCK_EX)
+            holder.write(orjson.dumps(current) + b"\n")
+            holder.flush()
+            os.replace(tmp, live)
+            holders.append(holder)
+        return real_flock(fd, operation)
+
+    writes = FavoriteWriteBehind(directory=directory, flush_interval=60)
+    with patch("app.db.writebehind.fcntl.flock", replacing_flock):
+        await writes.start()
+    try:
+        assert writes.lookup(2, 301) is None
+        assert live.read_bytes() == orjson.dumps(current) + b"\n"
+    finally:
+        await writes.close()
+        holders[0].close()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_rejects_only_bad_changes(database, tmp_path):
+    """Тест: изменение, отклонённое базой, откладывается в rejected.log и не задерживает остальные"""
+    writes = FavoriteWriteBehind(directory=tmp_path / "log", flush_interval=60)
+    await writes.start()
+    try:
+        # Несериализуемое изменение отклоняется только в своём запросе
+        with pytest.raises(TypeError):
+            await writes.add(2, 2 ** 64, "Слишком большой id", 2000)
+        await writes.add(99, 301, "Матрица", 1999)
+        await writes.add(2, 302, "Ёлки", 2010)
+        await writes.add(2, 303, "Мастер и Маргарита", 1994)
+
+        assert await writes.flush() == 2
+        assert len(writes) == 0
+        assert await stored_ids(database, 2) == [302, 303]
+        rejected = (tmp_path / "log" / "rejected.log").read_bytes().splitlines()
+        assert [orjson.loads(line)["user_id"] for line in rejected] == [99]
+    finally:
+        await writes.close()
+
+
+def test_favorites_endpoints_write_behind(database, tmp_path, monkeypatch):
+    """Тест маршрутов избранного в режиме отложенной записи: ответы до сброса, сброс при остановке"""
+    monkeypatch.setattr(settings, "FAVORITES_WRITE_BEHIND", True)
+    monkeypatch.setattr(settings, "CACHE_WARM_INTERVAL", 0)
+    monkeypatch.setattr(settings, "SUGGEST_REFRESH_INTERVAL", 0)
+    writes = FavoriteWriteBehind(directory=tmp_path / "log", flush_interval=60)
+
+    async def override_get_db():
+        async with database() as db:
+            yield db
+
+    expire = datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_TIME)
+    token = jwt.encode({"id": 2, "exp": expire}, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    headers = {"Authorization": f"Bearer {token}"}
+    movie = {"kinopoisk_id": 301, "title": "Матрица", "year": 1999}
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with patch("main.favorite_writes", writes), patch("app.api.movie.favorite_writes", writes), \
+                patch("main.init_db_schema", AsyncMock()), patch("main.dispose_engine", AsyncMock()), \
+                patch("main.poster_store", AsyncMock()), \
+                patch("app.core.revocation.get_sessionmaker", return_value=database):
+            with TestClient(app) as client:
+                assert client.post("/movies/favorites", json=movie, headers=headers).json() == movie
+                assert client.post("/movies/favorites", json=movie, headers=headers).status_code == 400
+                assert client.get("/favorites", headers=headers).json() == [movie]
+                assert client.delete("/movies/favorites/301", headers=headers).json() == movie
+                assert client.delete("/movies/favorites/301", headers=headers).status_code == 404
+                assert client.post("/movies/favorites", json=movie, headers=headers).status_code == 200
+                # Значения, которые база не примет, отклоняются до подтверждения
+                for invalid in ({**movie, "title": "x" * 256}, {**movie, "kinopoisk_id": 2 ** 31}):
+                    assert client.post("/movies/favorites", json=invalid, headers=headers).status_code == 422
+                # В базе ничего нет до сброса
+                with Session(create_engine(f"sqlite:///{tmp_path / 'favorites.sqlite3'}")) as db:
+                    assert db.scalars(select(Favorite).filter(Favorite.user_id == 2)).all() == []
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    # Остановка сбросила изменения в базу
+    with Session(create_engine(f"sqlite:///{tmp_path / 'favorites.sqlite3'}")) as db:
+        assert [favorite.kinopoisk_id for favorite in db.scalars(select(Favorite).filter(Favorite.user_id == 2))] == [301]